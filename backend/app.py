@@ -1,62 +1,47 @@
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException
-from fastapi.responses import StreamingResponse, JSONResponse, FileResponse
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Header, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import Response, StreamingResponse, JSONResponse, FileResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-import io
 import uuid
+import time
+import json
+import asyncio
+import hmac
+import threading
 from config import Config
-from utils.image_processor import ImageProcessor
+from utils import metrics
+from utils.jobs import JobRegistry, create_shared_jobs, valid_job_id
+from utils.profiler import ProfileCapture
+from utils.admission import AdmissionController, AdmissionRejected, MemoryEstimator, MB, conversion_lane
+from utils import deadline as deadline_planner
+from utils.media_store import create_media_store, MediaStoreError
+from utils.cost_model import StyleCostModel
+from utils.fair_share import client_identity
+from utils.results import ResultStore, content_digest, result_key, parse_range, etag_matches, iter_file
+from utils.timing import StageTimer
+from utils.progress import ProgressChannel, report_stage
+from utils.cancellation import CancelToken, ConversionCancelled, check_cancelled
+from utils.live import LiveSession, LiveFrameError
+from utils.image_processor import ImageProcessor, fit_within
 from utils.video_processor import VideoProcessor
-from utils.style_loader import StyleLoader
+from utils.model_provisioning import ModelProvisioner
+from utils.style_loader import StylerUnavailable, READY, PENDING, LOADING, SERVABLE
+from utils.shards import ShardRouter, create_style_loader
 from pathlib import Path
 from fastapi.staticfiles import StaticFiles
-import sys
-import subprocess
-import gc
+from starlette.concurrency import run_in_threadpool
 import traceback
 import numpy as np
-import cv2
-from PIL import Image
 
-# Download models on startup
+# Download missing models (runs in the background model loader)
 def ensure_models_downloaded():
-    pretrained_dir = Path(__file__).parent / "pretrained"
-    pretrained_dir.mkdir(exist_ok=True)
-    
-    required_models = [
-        "shinkai.pth", "hayao.pth", "hosoda.pth", "paprika.pth",
-        "candy.pth", "mosaic.pth", "udnie.pth", "rain_princess.pth"
-    ]
-    
-    missing_models = []
-    for model in required_models:
-        model_path = pretrained_dir / model
-        if not model_path.exists() or model_path.stat().st_size == 0:
-            missing_models.append(model)
-    
-    if missing_models:
-        print("=" * 70)
-        print(f"⚠️  Missing models: {', '.join(missing_models)}")
-        print("📥 Downloading...")
-        print("=" * 70)
-        
-        try:
-            result = subprocess.run(
-                [sys.executable, "download_models.py"],
-                capture_output=True,
-                text=True,
-                check=True,
-                timeout=600  # 10 minute timeout
-            )
-            print(result.stdout)
-            print("✅ Models downloaded!")
-        except Exception as e:
-            print(f"❌ Download failed: {e}")
-            print("⚠️  Some styles may not work")
+    """Fetch missing or corrupt model files in parallel and verify them"""
+    results = ModelProvisioner().provision()
+    failed = [name for name, result in results.items() if result["status"] == "failed"]
+    if failed:
+        print(f"⚠️  Models unavailable: {', '.join(failed)}; some styles may not work")
     else:
         print("✅ All models present")
 
-ensure_models_downloaded()
-
 app = FastAPI(title="AI Photo Style Converter API")
 
 app.add_middleware(
@@ -65,25 +50,101 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Job-ID", "X-Result-ID", "X-Video-Settings", "ETag", "Content-Location",
+                    "Content-Range"],
 )
 
-# Initialize with error handling
-try:
-    style_loader = StyleLoader()
-    print(f"✅ StyleLoader initialized with {len(style_loader.models)} models")
-except Exception as e:
-    print(f"⚠️ StyleLoader initialization warning: {e}")
-    style_loader = StyleLoader()
+# OpenCV styles are ready now; torch models load in the background after startup
+# (in this process, or in inference shard processes when INFERENCE_SHARDS is set)
+style_loader = create_style_loader()
 
-media_storage = {}
+media_store = create_media_store()
+job_registry = JobRegistry(shared=create_shared_jobs())
+profile_capture = ProfileCapture()
+admission = AdmissionController()
+result_store = ResultStore()
+cost_model = StyleCostModel()
 static_dir = Path(__file__).parent / "static"
 
+metrics.MEDIA_STORE_ENTRIES.set_function(lambda: len(media_store))
+metrics.MEDIA_STORE_BYTES.set_function(media_store.total_bytes)
+metrics.RESULT_STORE_ENTRIES.set_function(lambda: len(result_store))
+metrics.RESULT_STORE_BYTES.set_function(result_store.total_bytes)
+
+def load_models_in_background():
+    """Download missing models, then import torch and load them"""
+    started = time.perf_counter()
+    try:
+        ensure_models_downloaded()
+        style_loader.load_models()
+    except Exception as e:
+        print(f"❌ Model loading failed: {e}")
+        traceback.print_exc()
+    print(f"✅ Model loading finished in {time.perf_counter() - started:.1f}s: {style_loader.family_status}")
+    calibrate_costs(Config.NEURAL_STYLES + Config.CARTOON_STYLES)
+
+def calibrate_costs(styles):
+    """Time the servable styles the saved cost model does not cover yet"""
+    styles = [style for style in styles if not cost_model.has(style)]
+    if not Config.COST_CALIBRATION or not styles:
+        return
+    started = time.perf_counter()
+    try:
+        calibrated = cost_model.calibrate(style_loader, styles)
+        cost_model.save()
+    except Exception as e:
+        print(f"⚠️  Cost calibration failed: {e}")
+        return
+    if calibrated:
+        print(f"📏 Calibrated {len(calibrated)} styles in {time.perf_counter() - started:.1f}s")
+
+@app.on_event("startup")
+async def start_model_loader():
+    cost_model.load()
+    threading.Thread(target=calibrate_costs, args=(Config.OPENCV_STYLES,), name="cost-calibration",
+                     daemon=True).start()
+    if style_loader.lite:
+        style_loader.load_models()
+        return
+    threading.Thread(target=load_models_in_background, name="model-loader", daemon=True).start()
+
+@app.on_event("shutdown")
+async def stop_style_loader():
+    style_loader.close()
+    try:
+        cost_model.save()
+    except OSError as e:
+        print(f"⚠️  Could not save the cost model: {e}")
+
 # ========== API ROUTES ==========
 
 @app.get("/api")
 async def api_root():
     return {"message": "AI Photo Style Converter API", "status": "running"}
 
+@app.get("/ready")
+async def ready(family: str = None):
+    """
+    Readiness: which style families can take requests
+    
+    OpenCV styles are ready as soon as the server accepts connections, so the
+    plain probe returns 200 immediately. Pass ?family=neural (or anime) to wait
+    for a torch family; that returns 503 until it is loaded and warmed up.
+    """
+    families = dict(style_loader.family_status)
+    if family is not None and family not in families:
+        raise HTTPException(400, f"Unknown family: {family}")
+    body = {
+        "ready": families[family or "opencv"] == READY,
+        "loading": any(status in (PENDING, LOADING) for status in families.values()),
+        "lite": style_loader.lite,
+        "families": families,
+        "styles": [style for style in Config.ALL_STYLES if style_loader.style_status(style) in SERVABLE],
+    }
+    if isinstance(style_loader, ShardRouter):
+        body["shards"] = style_loader.shard_status()
+    return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
 @app.get("/api/styles")
 async def get_styles():
     """Return available styles"""
@@ -91,9 +152,62 @@ async def get_styles():
         "styles": Config.ALL_STYLES,
         "opencv_styles": Config.OPENCV_STYLES,
         "neural_styles": Config.NEURAL_STYLES,
-        "cartoon_styles": Config.CARTOON_STYLES
+        "cartoon_styles": Config.CARTOON_STYLES,
+        "tiers": list(Config.STYLE_TIERS),
+        "costs": cost_model.snapshot()
     }
 
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics"""
+    # Store gauges are computed at scrape time with blocking I/O (Redis, disk scans)
+    body = await run_in_threadpool(metrics.registry.render)
+    return PlainTextResponse(body, media_type=metrics.CONTENT_TYPE)
+
+def job_headers(job, timer):
+    """Response headers identifying the job and its stage timings"""
+    headers = {"X-Job-ID": job.job_id}
+    if timer:
+        job.timings = timer.as_dict()
+        headers["Server-Timing"] = timer.server_timing()
+    return headers
+
+def video_settings_header(settings):
+    """Compact X-Video-Settings value for a budgeted video job"""
+    width, height = settings['inference_size']
+    return (f"budget={settings['time_budget']}, elapsed={settings['elapsed_seconds']}, "
+            f"met={int(settings['met_budget'])}, scale={settings['scale']}, size={width}x{height}, "
+            f"fps={settings['fps']}, frames={settings['frames']}")
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Return a conversion job record (of this or, with a shared media store, any worker)"""
+    try:
+        record = await run_in_threadpool(job_registry.lookup, job_id)
+    except MediaStoreError as e:
+        print(f"❌ Media store error: {e}")
+        raise HTTPException(503, "Media store unavailable, try again", headers={"Retry-After": "5"})
+    if record is None:
+        raise HTTPException(404, "Job not found")
+    return record
+
+@app.delete("/api/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """
+    Cancel a conversion: a queued one leaves the queue, a running one stops
+    before its next frame or stage
+    """
+    try:
+        record = await run_in_threadpool(job_registry.cancel, job_id, 'delete')
+    except MediaStoreError as e:
+        print(f"❌ Media store error: {e}")
+        raise HTTPException(503, "Media store unavailable, try again", headers={"Retry-After": "5"})
+    if record is None:
+        raise HTTPException(404, "Job not found")
+    if not record["cancelling"]:
+        raise HTTPException(409, f"Job already finished ({record['status']})")
+    return {"job_id": job_id, "status": "cancelling", "was": record["status"]}
+
 @app.post("/api/upload")
 async def upload_image(file: UploadFile = File(...)):
     """Upload image or video"""
@@ -112,11 +226,7 @@ async def upload_image(file: UploadFile = File(...)):
         media_id = str(uuid.uuid4())
         is_video = VideoProcessor.is_video(file.filename)
         
-        media_storage[media_id] = {
-            'data': contents,
-            'filename': file.filename,
-            'is_video': is_video
-        }
+        await run_in_threadpool(store_upload, media_id, contents, file.filename, is_video)
         
         print(f"✅ Upload: {file.filename} → {media_id}")
         
@@ -128,123 +238,501 @@ async def upload_image(file: UploadFile = File(...)):
     
     except HTTPException:
         raise
+    except MediaStoreError as e:
+        print(f"❌ Media store error: {e}")
+        raise HTTPException(503, "Media store unavailable, try again", headers={"Retry-After": "5"})
     except Exception as e:
         print(f"❌ Upload error: {e}")
         raise HTTPException(500, f"Upload failed: {str(e)}")
 
+def store_upload(media_id, contents, filename, is_video):
+    """Probe and hash the upload and put it in the media store (runs in the threadpool)"""
+    media_store.put(media_id, {
+        'data': contents,
+        'filename': filename,
+        'is_video': is_video,
+        'probe': probe_media(contents, filename, is_video),
+        'sha256': content_digest(contents)
+    })
+
+def probe_media(data, filename, is_video):
+    """Read dimensions and frame count from the file header"""
+    try:
+        if is_video:
+            width, height, frames, _ = VideoProcessor.probe(data, filename)
+        else:
+            (width, height), frames = ImageProcessor.probe(data), 1
+        if width <= 0 or height <= 0:
+            return None
+        return {'width': width, 'height': height, 'frames': max(frames, 1)}
+    except Exception as e:
+        print(f"⚠️  Could not probe {filename}: {e}")
+        return None
+
+def estimate_memory(media_info, style):
+    """Estimated peak memory of converting this media with this style"""
+    probe = media_info.get('probe')
+    if probe is None:
+        # Unknown dimensions: assume a 1080p clip or a 12MP photo
+        probe = ({'width': 1920, 'height': 1080, 'frames': Config.MAX_VIDEO_FRAMES}
+                 if media_info['is_video'] else {'width': 4000, 'height': 3000, 'frames': 1})
+    return MemoryEstimator.estimate(
+        style, probe['width'], probe['height'], probe['frames'],
+        input_bytes=len(media_info['data']), is_video=media_info['is_video']
+    )
+
+def estimate_style_seconds(media_info, style, scale=None):
+    """
+    Expected styling time from the probed size and the style's cost per
+    megapixel (None when unknown); `scale` is the fast tier's inference scale
+    """
+    probe = media_info.get('probe')
+    if probe is None:
+        return None
+    width, height = fit_within((probe['width'], probe['height']), Config.MAX_IMAGE_SIZE)
+    megapixels = width * height / 1e6 * (scale or 1.0) ** 2
+    if media_info['is_video']:
+        return cost_model.estimate_seconds(style, 'video', megapixels, min(probe['frames'], Config.MAX_VIDEO_FRAMES))
+    return cost_model.estimate_seconds(style, 'image', megapixels)
+
+def conversion_result_id(media_info, style, fmt, profile_name, time_budget=None, tier=None):
+    """Stable ID of the result this conversion produces"""
+    if tier == 'fast':
+        # Fast results are upsampled from a lower resolution; like budgeted ones they stay separate
+        return result_key(media_info['sha256'], style, 'fast', Config.FAST_TIER_SCALE, Config.GUIDED_RADIUS,
+                          Config.GUIDED_EPS, conversion_result_id(media_info, style, fmt, profile_name))
+    if media_info['is_video'] and time_budget:
+        # Budgeted results may be reduced; they never stand in for full ones
+        return result_key(media_info['sha256'], style, 'budget', time_budget,
+                          conversion_result_id(media_info, style, fmt, profile_name))
+    if media_info['is_video']:
+        # Videos keep their container; output format and profile do not apply
+        if VideoProcessor.is_gif(media_info['filename']):
+            return result_key(media_info['sha256'], style, 'gif', Config.MAX_VIDEO_FRAMES,
+                              Config.GIF_PALETTE, Config.GIF_FRAME_DELTA)
+        return result_key(media_info['sha256'], style, 'video', Config.MAX_VIDEO_FRAMES)
+    return result_key(media_info['sha256'], style, fmt, profile_name)
+
+def result_response(result, headers=None, if_none_match=None, range_header=None, if_range=None):
+    """Serve a stored result from disk with conditional GET and single-range support"""
+    headers = {
+        "ETag": result.etag,
+        "Cache-Control": "private, no-cache",
+        "Accept-Ranges": "bytes",
+        "Content-Location": f"/api/results/{result.result_id}",
+        "X-Result-ID": result.result_id,
+        **(headers or {}),
+    }
+    
+    if etag_matches(if_none_match, result.etag):
+        return Response(status_code=304, headers=headers)
+    
+    # If-Range must be a strong match, otherwise the whole (changed) result is sent
+    if range_header and (if_range is None or if_range.strip() == result.etag):
+        try:
+            byte_range = parse_range(range_header, result.size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{result.size}"})
+        if byte_range:
+            start, end = byte_range
+            return StreamingResponse(
+                iter_file(result.path, start, end - start + 1),
+                status_code=206,
+                media_type=result.media_type,
+                headers={
+                    **headers,
+                    "Content-Range": f"bytes {start}-{end}/{result.size}",
+                    "Content-Length": str(end - start + 1),
+                }
+            )
+    
+    return FileResponse(result.path, media_type=result.media_type, filename=result.filename, headers=headers)
+
+@app.get("/api/results/{result_id}")
+async def get_result(
+    result_id: str,
+    if_none_match: str = Header(None),
+    range_header: str = Header(None, alias="range"),
+    if_range: str = Header(None)
+):
+    """Download a finished result (ETag / If-None-Match / Range)"""
+    result = result_store.get(result_id)
+    if result is None:
+        raise HTTPException(404, "Result not found")
+    return result_response(result, None, if_none_match, range_header, if_range)
+
 @app.post("/api/convert")
 async def convert_style(
+    request: Request,
     media_id: str = Form(...),
-    style: str = Form(...)
+    style: str = Form(...),
+    output_format: str = Form(None),
+    encoder_profile: str = Form(None),
+    time_budget: float = Form(None),
+    tier: str = Form(None),
+    job_id: str = Form(None),
+    accept: str = Header(None)
 ):
-    """Apply style to media"""
+    """
+    Apply style to media
+
+    The job ID is returned in X-Job-ID; pass your own `job_id` (a UUID) to
+    know it before the response, e.g. to DELETE the job while it is queued.
+    """
+    cancel = CancelToken()
+    watcher = asyncio.create_task(watch_disconnect(request, cancel)) if Config.CANCEL_ON_DISCONNECT else None
+    try:
+        return await start_conversion(media_id, style, output_format, encoder_profile, time_budget, accept,
+                                      client=request_client(request), cancel=cancel, tier=tier, job_id=job_id)
+    finally:
+        if watcher:
+            watcher.cancel()
+
+async def watch_disconnect(request, cancel):
+    """Cancel `cancel` once the client of `request` has gone away"""
+    while not cancel.cancelled:
+        if await request.is_disconnected():
+            cancel.cancel('disconnect')
+            return
+        await asyncio.sleep(Config.DISCONNECT_POLL_SECONDS)
+
+async def until_cancelled(awaitable, cancel):
+    """Await `awaitable`, abandoning it with ConversionCancelled once `cancel` is cancelled"""
+    loop = asyncio.get_running_loop()
+    task = asyncio.ensure_future(awaitable)
+    unregister = cancel.on_cancel(lambda: loop.call_soon_threadsafe(task.cancel))
+    try:
+        return await task
+    except asyncio.CancelledError:
+        if cancel.cancelled and task.cancelled():
+            raise ConversionCancelled(cancel.reason, 'queued')
+        raise
+    finally:
+        unregister()
+
+def record_cancellation(e, style, avoided_seconds):
+    """Count a cancelled conversion and the work it no longer does"""
+    print(f"🛑 Cancelled {style} at {e.stage} ({e.reason}); ~{avoided_seconds:.1f}s of work avoided")
+    metrics.CONVERSIONS_CANCELLED.inc(reason=e.reason, stage=e.stage)
+    metrics.CANCELLED_WORK_AVOIDED.inc(avoided_seconds, reason=e.reason)
+
+def request_client(connection):
+    """(client id, weight) of a Request or WebSocket for fair-share scheduling"""
+    return client_identity(connection.headers.get("x-api-key"),
+                           connection.client.host if connection.client else None,
+                           connection.headers.get("x-forwarded-for"))
+
+async def start_conversion(media_id, style, output_format=None, encoder_profile=None, time_budget=None,
+                           accept=None, progress=None, client=None, cancel=None, tier=None, job_id=None):
+    """
+    Validate a conversion request and run it (or serve its stored result)
+    
+    `progress` (a ProgressChannel) receives the stages and styled frames of
+    the run; see GET /api/convert/events. `client` ((id, weight), see
+    utils.fair_share.client_identity) is charged for the run and queued
+    fairly against other clients. Cancelling `cancel` (a CancelToken, as
+    does DELETE /api/jobs/{job_id}) stops the run with a 409. The 'fast'
+    `tier` styles neural and anime styles at FAST_TIER_SCALE.
+    
+    The job is registered (under `job_id` when given) before the conversion
+    queues, and `progress` gets its ID first, so it can be cancelled while
+    it waits for admission.
+    """
+    received = time.monotonic()
+    cancel = cancel or CancelToken()
     print(f"\n{'='*70}")
     print(f"🎨 CONVERT REQUEST")
     print(f"Media ID: {media_id}")
     print(f"Style: {style}")
     print(f"{'='*70}\n")
     
-    if media_id not in media_storage:
+    try:
+        media_info = await run_in_threadpool(media_store.get, media_id)
+    except MediaStoreError as e:
+        print(f"❌ Media store error: {e}")
+        raise HTTPException(503, "Media store unavailable, try again", headers={"Retry-After": "5"})
+    if media_info is None:
         print(f"❌ Media not found: {media_id}")
         raise HTTPException(404, "Media not found. Please re-upload.")
     
     if style not in Config.ALL_STYLES:
         raise HTTPException(400, f"Invalid style: {style}")
+    if job_id is not None and not valid_job_id(job_id):
+        raise HTTPException(400, "job_id must be a UUID")
+    
+    try:
+        fmt = ImageProcessor.negotiate_format(accept, output_format)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    profile_name = encoder_profile or Config.DEFAULT_ENCODER_PROFILE
+    if profile_name not in Config.ENCODER_PROFILES[fmt]:
+        raise HTTPException(400, f"Invalid encoder profile: {profile_name}")
+    
+    if time_budget is not None and not time_budget > 0:
+        raise HTTPException(400, "time_budget must be a positive number of seconds")
+    
+    tier = tier or Config.DEFAULT_STYLE_TIER
+    if tier not in Config.STYLE_TIERS:
+        raise HTTPException(400, f"Invalid tier: {tier}")
+    
+    # The budget only applies to videos; a full-quality stored result always fits it
+    budget = time_budget if media_info['is_video'] else None
+    # OpenCV styles are fast at full size, and a budget picks its own scale
+    if style in Config.OPENCV_STYLES or budget:
+        tier = 'full'
+    result_id = conversion_result_id(media_info, style, fmt, profile_name)
+    cached = result_store.get(result_id)
+    if cached is None and budget:
+        result_id = conversion_result_id(media_info, style, fmt, profile_name, budget)
+        cached = result_store.get(result_id)
+    if cached is None and tier == 'fast':
+        result_id = conversion_result_id(media_info, style, fmt, profile_name, tier=tier)
+        cached = result_store.get(result_id)
+    if cached is not None:
+        print(f"♻️  Serving stored result {result_id}")
+        metrics.RESULT_CACHE_HITS.inc(style=style, media_type='video' if media_info['is_video'] else 'image')
+        return result_response(cached, None if media_info['is_video'] else {"Vary": "Accept"})
+    
+    style_status = style_loader.style_status(style)
+    if style_status in (PENDING, LOADING):
+        raise HTTPException(503, f"Style '{style}' is still loading", headers={"Retry-After": "5"})
+    if style_status not in SERVABLE:
+        raise HTTPException(503, f"Style '{style}' is not available on this server")
+    
+    memory_estimate = estimate_memory(media_info, style)
+    scale = Config.FAST_TIER_SCALE if tier == 'fast' else None
+    seconds_estimate = estimate_style_seconds(media_info, style, scale)
+    if budget and seconds_estimate is not None:
+        seconds_estimate = min(seconds_estimate, budget)
+    
+    kind = 'video' if media_info['is_video'] else 'image'
+    try:
+        job = await run_in_threadpool(job_registry.create, media_id, style, kind, job_id, cancel)
+    except ValueError as e:
+        raise HTTPException(409, str(e))
+    job.meta['memory_estimate_mb'] = round(memory_estimate / MB, 1)
+    job.meta['tier'] = tier
+    if seconds_estimate is not None:
+        job.meta['style_estimate_seconds'] = round(seconds_estimate, 2)
+    
+    if progress:
+        progress.emit('job', job_id=job.job_id, estimate_seconds=job.meta.get('style_estimate_seconds'))
+        progress.estimate = seconds_estimate
+        progress.set_stage('queued')
+    try:
+        client_id, weight = client or (None, 1.0)
+        reservation = await until_cancelled(admission.acquire(
+            memory_estimate, conversion_lane(style, media_info['is_video']), seconds_estimate, client_id, weight
+        ), cancel)
+    except AdmissionRejected as e:
+        print(f"🚦 Rejected {style} (~{memory_estimate // MB}MB, {e.status_code}): {e.message}")
+        finish_queued_job(job, 'rejected', e.message)
+        headers = {"X-Job-ID": job.job_id}
+        if e.retry_after:
+            headers["Retry-After"] = str(e.retry_after)
+        raise HTTPException(e.status_code, e.message, headers=headers)
+    except ConversionCancelled as e:
+        record_cancellation(e, style, seconds_estimate or 0.0)
+        finish_queued_job(job, 'cancelled', 'Conversion cancelled')
+        raise HTTPException(409, "Conversion cancelled", headers={"X-Job-ID": job.job_id})
+    except BaseException:
+        finish_queued_job(job, 'error', 'Conversion failed')
+        raise
     
-    media_info = media_storage[media_id]
+    try:
+        return await run_in_threadpool(
+            run_conversion, job, media_info, style, fmt, profile_name, result_id,
+            received + budget if budget else None, budget, progress, seconds_estimate, cancel, scale
+        )
+    finally:
+        admission.release(reservation)
+
+def finish_queued_job(job, status, error):
+    """End a job that never started; the other workers learn of it in the background"""
+    job.finish(status, error)
+    asyncio.get_running_loop().run_in_executor(None, job_registry.update, job)
+
+def run_conversion(job, media_info, style, fmt, profile_name, result_id,
+                   deadline=None, time_budget=None, progress=None, seconds_estimate=None, cancel=None, scale=None):
+    """
+    Decode, style and encode one upload for `job` (runs in a worker thread)
+    
+    Videos with a deadline (time.monotonic()) are styled within it, see
+    utils.deadline.style_within_budget. Stages and styled frames are
+    reported to `progress` when given. Styling times feed the cost model,
+    whose estimate for this job is `seconds_estimate`. Once `cancel` is
+    cancelled the run stops before its next frame or stage; the styling and
+    encoding it skips are counted as work avoided. A `scale` (the fast tier)
+    styles at that fraction of the size, see StyleLoader.apply_style_low_res.
+    """
     media_data = media_info['data']
     is_video = media_info['is_video']
     filename = media_info['filename']
     
+    kind = 'video' if is_video else 'image'
+    status = 'error'
+    started = time.perf_counter()
+    metrics.IN_FLIGHT.inc()
+    
+    job.start()
+    job_registry.update(job)
+    timer = StageTimer() if Config.STAGE_TIMING else None
+    # Bound inside the try, so the finally undoes exactly what was set up
+    timer_token = progress_token = cancel_token = profile_session = None
+    style_started = None
+    encode_left = 0.0  # expected encoding seconds, once the frames are known
+    
     try:
+        if timer:
+            timer_token = timer.activate()
+        if progress:
+            progress_token = progress.activate()
+        if cancel:
+            cancel_token = cancel.activate()
+        session = profile_capture.claim(style, job.job_id)
+        if session:
+            session.start()
+            profile_session = session
+        
         if is_video:
             print(f"📹 Processing video: {filename}")
+            check_cancelled('decode')
+            report_stage('decode')
             
+            gif_timing = {}
             if VideoProcessor.is_gif(filename):
-                frames, fps = VideoProcessor.extract_gif_frames(media_data)
+                frames, fps, gif_timing = VideoProcessor.extract_gif_frames(
+                    media_data, max_size=Config.MAX_IMAGE_SIZE, max_frames=Config.MAX_VIDEO_FRAMES
+                )
             else:
-                frames, fps = VideoProcessor.extract_frames(media_data)
+                frames, fps = VideoProcessor.extract_frames(
+                    media_data, max_frames=Config.MAX_VIDEO_FRAMES, max_size=Config.MAX_IMAGE_SIZE
+                )
             
-            print(f"📊 {len(frames)} frames @ {fps}fps")
+            print(f"📊 {len(frames)} frames @ {fps:.2f}fps")
             
-            # Limit frames
-            max_frames = 100
-            if len(frames) > max_frames:
-                print(f"⚠️  Limiting to {max_frames} frames")
-                frames = frames[:max_frames]
+            output_format = 'gif' if VideoProcessor.is_gif(filename) else 'mp4'
+            if frames:
+                height, width = np.asarray(frames[0]).shape[:2]
+                encode_left = deadline_planner.encode_estimate(output_format, len(frames), width * height / 1e6)
+            check_cancelled('style')
+            report_stage('style', total=len(frames))
+            style_started = time.perf_counter()
             
-            # Process frames
-            styled_frames = []
-            for i, frame in enumerate(frames):
-                if i % 10 == 0:
-                    print(f"⏳ Frame {i+1}/{len(frames)}")
-                
-                try:
-                    # Frame is already numpy array from OpenCV
-                    # Apply style (handles conversion internally)
-                    styled_result = style_loader.apply_style(frame, style)
-                    
-                    # Convert PIL result back to numpy for video encoding
-                    if isinstance(styled_result, Image.Image):
-                        styled_frame = np.array(styled_result)
-                        styled_frame = cv2.cvtColor(styled_frame, cv2.COLOR_RGB2BGR)
-                    else:
-                        styled_frame = styled_result
-                    
-                    styled_frames.append(styled_frame)
-                    
-                except Exception as e:
-                    print(f"❌ Frame {i} failed: {e}")
-                    styled_frames.append(frame)
-                
-                if i % 20 == 0:
-                    gc.collect()
+            # Process frames (RGB in, RGB out; OpenCV styles run on the whole stack)
+            if deadline is not None and frames:
+                styled_frames, fps, durations, settings = deadline_planner.style_within_budget(
+                    style_loader, frames, style, fps, deadline, time_budget, gif_timing.get('durations'),
+                    output_format
+                )
+                if gif_timing:
+                    gif_timing['durations'] = durations
+                job.meta['video_settings'] = settings
+                # Only the probe frames run at full size
+                width, height = settings['output_size']
+                cost_model.record(style, 'video', settings['probe_ms_per_frame'] / 1000, width * height / 1e6)
+            else:
+                frame_count = len(frames)
+                height, width = np.asarray(frames[0]).shape[:2] if frames else (0, 0)
+                styled_frames = style_loader.style_frames(frames, style, scale)
+                cost_model.record(style, 'video', time.perf_counter() - style_started,
+                                  width * height / 1e6 * (scale or 1.0) ** 2, frame_count)
             
-            output_format = 'gif' if VideoProcessor.is_gif(filename) else 'mp4'
-            video_bytes = VideoProcessor.create_video(styled_frames, fps, output_format)
+            check_cancelled('encode')
+            report_stage('encode')
+            encode_left = 0.0
+            encode_started = time.perf_counter()
+            video_bytes = VideoProcessor.create_video(styled_frames, fps, output_format, **gif_timing)
+            if styled_frames:
+                height, width = np.asarray(styled_frames[0]).shape[:2]
+                deadline_planner.record_encode(output_format, time.perf_counter() - encode_started,
+                                               len(styled_frames), width * height / 1e6)
             
             if not video_bytes:
                 raise Exception("Video creation failed")
             
             print(f"✅ Video processed")
             
+            settings = job.meta.get('video_settings')
+            if settings is not None:
+                finished = time.monotonic()
+                settings['elapsed_seconds'] = round(finished - (deadline - time_budget), 3)
+                settings['met_budget'] = finished <= deadline
+            
+            elapsed = time.perf_counter() - started
+            metrics.VIDEO_FRAMES_TOTAL.inc(len(styled_frames), style=style)
+            if elapsed > 0:
+                metrics.VIDEO_FPS.observe(len(styled_frames) / elapsed, style=style)
+            
             del frames, styled_frames
-            gc.collect()
             
             media_type = 'image/gif' if output_format == 'gif' else 'video/mp4'
-            return StreamingResponse(
-                io.BytesIO(video_bytes),
-                media_type=media_type,
-                headers={"Content-Disposition": f"attachment; filename=styled_{style}.{output_format}"}
-            )
+            result = result_store.put(result_id, video_bytes, media_type, f"styled_{style}.{output_format}", job.job_id)
+            job.meta['result_id'] = result_id
+            del video_bytes
+            
+            status = 'ok'
+            headers = job_headers(job, timer)
+            if settings is not None:
+                headers["X-Video-Settings"] = video_settings_header(settings)
+            return result_response(result, headers)
         
         else:
             # Process image
             print(f"🖼️  Processing image: {filename}")
+            check_cancelled('decode')
+            report_stage('decode')
             
             # Load as PIL Image
             img = ImageProcessor.load_image(media_data, Config.MAX_IMAGE_SIZE)
             print(f"📊 Image size: {img.size}")  # ✅ FIXED: Use .size instead of .shape
             
             # Apply style (returns PIL Image)
-            styled_img = style_loader.apply_style(img, style)
+            check_cancelled('style')
+            report_stage('style', total=1)
+            style_started = time.perf_counter()
+            if scale is None:
+                styled_img = style_loader.apply_style(img, style)
+            else:
+                styled_img = style_loader.apply_style_low_res(img, style, scale)
+            cost_model.record(style, 'image', time.perf_counter() - style_started,
+                              img.size[0] * img.size[1] / 1e6 * (scale or 1.0) ** 2)
             
             # Convert to bytes
-            img_bytes = ImageProcessor.image_to_bytes(styled_img)
+            check_cancelled('encode')
+            report_stage('encode')
+            img_bytes = ImageProcessor.image_to_bytes(
+                styled_img, fmt, profile_name, grayscale=style in Config.GRAYSCALE_STYLES
+            )
+            job.meta['output_format'] = fmt
+            job.meta['encoder_profile'] = profile_name
             
             print(f"✅ Image processed: {len(img_bytes)} bytes")
             
             del img, styled_img
-            gc.collect()
             
-            return StreamingResponse(
-                io.BytesIO(img_bytes),
-                media_type="image/jpeg",
-                headers={"Content-Disposition": f"attachment; filename=styled_{style}.jpg"}
+            result = result_store.put(
+                result_id, img_bytes, ImageProcessor.output_mime(fmt),
+                f"styled_{style}.{ImageProcessor.output_extension(fmt)}", job.job_id
             )
+            job.meta['result_id'] = result_id
+            del img_bytes
+            
+            status = 'ok'
+            return result_response(result, {"Vary": "Accept", **job_headers(job, timer)})
     
     except HTTPException:
         raise
+    except ConversionCancelled as e:
+        status = 'cancelled'
+        styling_left = seconds_estimate or 0.0
+        if style_started is not None:
+            styling_left = max(styling_left - (time.perf_counter() - style_started), 0.0)
+        record_cancellation(e, style, styling_left + encode_left)
+        raise HTTPException(409, "Conversion cancelled", headers={"X-Job-ID": job.job_id})
+    except StylerUnavailable as e:
+        print(f"❌ {e}")
+        raise HTTPException(503, f"Style '{style}' is restarting; try again shortly", headers={"Retry-After": "5"})
     except Exception as e:
         error_msg = str(e)
         print(f"\n{'='*70}")
@@ -254,25 +742,370 @@ async def convert_style(
         traceback.print_exc()
         print(f"{'='*70}\n")
         
-        gc.collect()
-        
         if "Model for" in error_msg and "not loaded" in error_msg:
             raise HTTPException(500, f"Style '{style}' unavailable. Model file missing.")
         elif "memory" in error_msg.lower():
             raise HTTPException(500, "Out of memory. Try smaller file.")
         else:
             raise HTTPException(500, f"Processing failed: {error_msg}")
+    
+    finally:
+        if cancel_token is not None:
+            CancelToken.deactivate(cancel_token)
+        if progress_token is not None:
+            ProgressChannel.deactivate(progress_token)
+        if profile_session:
+            try:
+                job.meta['profile'] = profile_session.stop()
+            except Exception as e:
+                print(f"⚠️  Could not save profile: {e}")
+        if timer_token is not None:
+            StageTimer.deactivate(timer_token)
+            job.timings = timer.as_dict()
+        job.finish(status, {'ok': None, 'cancelled': 'Conversion cancelled'}.get(status, 'Conversion failed'))
+        job_registry.update(job)
+        metrics.IN_FLIGHT.dec()
+        metrics.CONVERSIONS_TOTAL.inc(style=style, media_type=kind, status=status)
+        if status == 'ok':
+            metrics.CONVERSION_LATENCY.observe(time.perf_counter() - started, style=style, media_type=kind)
+            
+# ========== PROGRESS STREAMS ==========
+
+# Conversions started by progress streams; `cancel` stops one when its
+# client goes away (CANCEL_ON_DISCONNECT)
+stream_tasks = set()
+
+def start_stream(channel, media_id, style, output_format=None, encoder_profile=None, time_budget=None,
+                 client=None, cancel=None, tier=None, job_id=None):
+    """Run a conversion in the background; its result or error ends the channel's events"""
+    async def run():
+        try:
+            response = await start_conversion(media_id, style, output_format, encoder_profile, time_budget,
+                                              progress=channel, client=client, cancel=cancel, tier=tier,
+                                              job_id=job_id)
+        except HTTPException as e:
+            channel.emit('error', status=e.status_code, detail=e.detail,
+                         retry_after=(e.headers or {}).get("Retry-After"))
+            return
+        except Exception as e:
+            traceback.print_exc()
+            channel.emit('error', status=500, detail=f"Processing failed: {e}")
+            return
+        result_id = response.headers["X-Result-ID"]
+        result = result_store.get(result_id)
+        channel.emit(
+            'result',
+            result_id=result_id,
+            url=f"/api/results/{result_id}",
+            job_id=response.headers.get("X-Job-ID"),
+            media_type=result.media_type if result else response.media_type,
+            size=result.size if result else None,
+            video_settings=response.headers.get("X-Video-Settings"),
+        )
+    
+    task = asyncio.create_task(run())
+    stream_tasks.add(task)
+    task.add_done_callback(stream_tasks.discard)
+    return task
+
+def stream_closed(cancel, finished):
+    """A progress stream ended; cancel its conversion if the client left before the last event"""
+    if not finished and Config.CANCEL_ON_DISCONNECT:
+        cancel.cancel('disconnect')
+
+async def sse_events(channel, cancel):
+    metrics.PROGRESS_STREAMS.inc()
+    finished = False
+    try:
+        async for item in channel.events():
+            if item is None:
+                yield ": keepalive\n\n"
+                continue
+            event, data = item
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        finished = True
+    finally:
+        stream_closed(cancel, finished)
+        metrics.PROGRESS_STREAMS.dec()
+
+@app.get("/api/convert/events")
+async def convert_events(
+    request: Request,
+    media_id: str,
+    style: str,
+    output_format: str = None,
+    encoder_profile: str = None,
+    time_budget: float = None,
+    tier: str = None,
+    job_id: str = None
+):
+    """
+    Apply style to media, streaming progress as Server-Sent Events
+    
+    Events: job (job_id, sent before the conversion queues), progress (stage, done, total), preview (frame and
+    a low-resolution JPEG data URL of a styled frame), then result (result_id
+    and url of GET /api/results/{result_id}) or error (status, detail).
+    Closing the stream early cancels the conversion.
+    """
+    channel = ProgressChannel()
+    cancel = CancelToken()
+    start_stream(channel, media_id, style, output_format, encoder_profile, time_budget, request_client(request),
+                 cancel, tier, job_id)
+    return StreamingResponse(
+        sse_events(channel, cancel),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.websocket("/api/convert/ws")
+async def convert_socket(websocket: WebSocket):
+    """
+    The events of GET /api/convert/events over a WebSocket
+    
+    The client sends one JSON request ({"media_id", "style", ...}); each event
+    comes back as a JSON message with its name in "type". Closing the socket
+    early cancels the conversion.
+    """
+    await websocket.accept()
+    metrics.PROGRESS_STREAMS.inc()
+    cancel = CancelToken()
+    finished = True
+    try:
+        request = await websocket.receive_json()
+        try:
+            time_budget = request.get('time_budget')
+            time_budget = None if time_budget is None else float(time_budget)
+        except (TypeError, ValueError):
+            await websocket.send_json({"type": "error", "status": 400, "detail": "time_budget must be a number"})
+            await websocket.close()
+            return
+        
+        channel = ProgressChannel()
+        start_stream(channel, request.get('media_id'), request.get('style'), request.get('output_format'),
+                     request.get('encoder_profile'), time_budget, request_client(websocket), cancel,
+                     request.get('tier'), request.get('job_id'))
+        finished = False
+        async for item in channel.events():
+            if item is not None:
+                event, data = item
+                await websocket.send_json({"type": event, **data})
+        finished = True
+        await websocket.close()
+    except (WebSocketDisconnect, ValueError):
+        pass
+    finally:
+        stream_closed(cancel, finished)
+        metrics.PROGRESS_STREAMS.dec()
+
+# ========== LIVE WEBCAM ==========
+
+live_sessions = set()
+
+def live_style_error(style):
+    """Why a style cannot be used live, or None"""
+    status = style_loader.style_status(style)
+    if status in (PENDING, LOADING):
+        return f"Style '{style}' is still loading"
+    if status not in SERVABLE:
+        return f"Style '{style}' is not available on this server"
+    return None
+
+def configure_live(session, request):
+    """Apply a {"style", "fps", "max_size"} message; raises ValueError"""
+    if not isinstance(request, dict):
+        raise ValueError("Expected a JSON object")
+    style = request.get('style')
+    if style is not None:
+        error = live_style_error(str(style).lower())
+        if error:
+            raise ValueError(error)
+    fps = request.get('fps')
+    max_size = request.get('max_size')
+    try:
+        session.configure(style, None if fps is None else float(fps), None if max_size is None else int(max_size))
+    except TypeError:
+        raise ValueError("fps and max_size must be numbers")
+
+@app.websocket("/api/live")
+async def live_stylize(websocket: WebSocket):
+    """
+    Live webcam stylization
+    
+    The client sends a JSON message ({"style", "fps", "max_size"}), then
+    webcam frames as binary JPEG messages; each styled frame comes back as a
+    binary JPEG. Only the newest frame waits while one is being styled:
+    older ones are dropped. JSON messages change the settings mid-stream,
+    and the server sends {"type": "stats"} every LIVE_STATS_INTERVAL seconds.
+    Each frame is admitted like an image conversion (its lane and the memory
+    budget), but is not charged to the client's conversion-time budget:
+    LIVE_MAX_SESSIONS bounds the streams instead.
+    """
+    await websocket.accept()
+    if len(live_sessions) >= Config.LIVE_MAX_SESSIONS:
+        await websocket.send_json({"type": "error", "detail": "Too many live sessions, try again later"})
+        await websocket.close(code=1013)
+        return
+    
+    try:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
+        if message.get("text") is None:
+            raise ValueError("The first message must be a JSON object with a style")
+        request = json.loads(message["text"])
+        if not isinstance(request, dict) or not request.get('style'):
+            raise ValueError("The first message must be a JSON object with a style")
+        error = live_style_error(str(request['style']).lower())
+        if error:
+            raise ValueError(error)
+        session = LiveSession(style_loader, request['style'])
+        configure_live(session, request)
+    except WebSocketDisconnect:
+        return
+    except ValueError as e:
+        await websocket.send_json({"type": "error", "detail": str(e)})
+        await websocket.close(code=1008)
+        return
+    
+    live_sessions.add(session)
+    metrics.LIVE_SESSIONS.inc()
+    pending = {"frame": None, "config": None}
+    arrived = asyncio.Event()
+    
+    async def receive():
+        # Keeps only the newest frame and settings; returns when the client leaves
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("bytes") is not None:
+                if pending["frame"] is not None:
+                    session.drop()
+                pending["frame"] = message["bytes"]
+            elif message.get("text"):
+                pending["config"] = message["text"]
+            arrived.set()
+    
+    receiver = asyncio.create_task(receive())
+    print(f"🎥 Live session started: {session.style}")
+    try:
+        await websocket.send_json({"type": "ready", **session.stats()})
+        last_stats = time.monotonic()
+        while True:
+            waiter = asyncio.create_task(arrived.wait())
+            await asyncio.wait({waiter, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if receiver.done():
+                waiter.cancel()
+                break
+            arrived.clear()
+            
+            # Settings are applied between frames, never while one is styled
+            if pending["config"] is not None:
+                text, pending["config"] = pending["config"], None
+                try:
+                    configure_live(session, json.loads(text))
+                    await websocket.send_json({"type": "stats", **session.stats()})
+                except ValueError as e:
+                    await websocket.send_json({"type": "error", "detail": str(e)})
             
+            frame, pending["frame"] = pending["frame"], None
+            if frame is None:
+                continue
+            admit = asyncio.create_task(admission.acquire(
+                session.memory_estimate(len(frame)), conversion_lane(session.style, False), session.frame_seconds
+            ))
+            await asyncio.wait({admit, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if not admit.done():
+                admit.cancel()
+                break
+            try:
+                reservation = admit.result()
+            except AdmissionRejected as e:
+                session.drop()
+                await websocket.send_json({"type": "error", "detail": e.message, "retry_after": e.retry_after})
+                continue
+            try:
+                styled = await run_in_threadpool(session.process, frame)
+            except LiveFrameError as e:
+                await websocket.send_json({"type": "error", "detail": str(e)})
+                continue
+            except Exception as e:
+                print(f"❌ Live frame failed ({session.style}): {e}")
+                await websocket.send_json({"type": "error", "detail": f"Processing failed: {e}"})
+                continue
+            finally:
+                admission.release(reservation)
+            await websocket.send_bytes(styled)
+            
+            if time.monotonic() - last_stats >= Config.LIVE_STATS_INTERVAL:
+                last_stats = time.monotonic()
+                await websocket.send_json({"type": "stats", **session.stats()})
+    except (WebSocketDisconnect, RuntimeError):
+        # Client went away mid-send
+        pass
+    finally:
+        receiver.cancel()
+        live_sessions.discard(session)
+        metrics.LIVE_SESSIONS.dec()
+        print(f"🎥 Live session ended: {session.stats()}")
+
 @app.delete("/api/delete/{media_id}")
 async def delete_media(media_id: str):
     """Delete media"""
-    if media_id in media_storage:
-        del media_storage[media_id]
-        gc.collect()
+    try:
+        deleted = await run_in_threadpool(media_store.delete, media_id)
+    except MediaStoreError as e:
+        print(f"❌ Media store error: {e}")
+        raise HTTPException(503, "Media store unavailable, try again", headers={"Retry-After": "5"})
+    if deleted:
         print(f"🗑️  Deleted: {media_id}")
         return {"message": "Media deleted"}
     raise HTTPException(404, "Media not found")
 
+# ========== ADMIN ==========
+
+def require_admin(token):
+    if not Config.ADMIN_TOKEN or not token or not hmac.compare_digest(token, Config.ADMIN_TOKEN):
+        raise HTTPException(403, "Admin token required")
+
+@app.post("/api/admin/profile")
+async def arm_profiling(
+    style: str = Form(...),
+    count: int = Form(1),
+    torch_trace: bool = Form(True),
+    x_admin_token: str = Header(None)
+):
+    """Profile the next `count` conversions of a style"""
+    require_admin(x_admin_token)
+    if style not in Config.ALL_STYLES:
+        raise HTTPException(400, f"Invalid style: {style}")
+    if not 1 <= count <= 50:
+        raise HTTPException(400, "count must be between 1 and 50")
+    profile_capture.arm(style, count, torch_trace)
+    return profile_capture.status()
+
+@app.get("/api/admin/profile")
+async def profiling_status(x_admin_token: str = Header(None)):
+    """Armed styles and saved traces"""
+    require_admin(x_admin_token)
+    return profile_capture.status()
+
+@app.delete("/api/admin/profile")
+async def disarm_profiling(style: str = None, x_admin_token: str = Header(None)):
+    """Stop profiling (one style or all)"""
+    require_admin(x_admin_token)
+    profile_capture.disarm(style)
+    return profile_capture.status()
+
+@app.get("/api/admin/profiles/{name}")
+async def download_profile(name: str, x_admin_token: str = Header(None)):
+    """Download a saved trace"""
+    require_admin(x_admin_token)
+    path = profile_capture.trace_path(name)
+    if path is None:
+        raise HTTPException(404, "Trace not found")
+    return FileResponse(path, filename=name)
+
 # ========== FRONTEND ==========
 
 app.mount("/static", StaticFiles(directory=str(static_dir)), name="static")
@@ -0,0 +1,383 @@
+"""
+Benchmark runner
+
+Usage (from the backend directory):
+    python benchmark.py run --out bench.json
+    python benchmark.py run --styles sepia,candy --sizes 256,512 --inputs image
+    python benchmark.py encode --sizes 512 --out encode.json
+    python benchmark.py decode --sizes 1024,2048,4000 --out decode.json
+    python benchmark.py sampler --seconds 10,60,300 --out sampler.json
+    python benchmark.py batch --sizes 256,512 --frames 32 --out batch.json
+    python benchmark.py gif --sizes 256,512 --out gif.json
+    python benchmark.py live --styles sepia,cartoon --fps 15 --out live.json
+    python benchmark.py tensors --sizes 256,512 --out tensors.json
+    python benchmark.py calibrate --styles all
+    python benchmark.py tiers --styles candy,shinkai --scales 0.75,0.5,0.35 --out tiers.json
+    python benchmark.py schedule --videos 3 --images 40 --out schedule.json
+    python benchmark.py fairness --flood 100 --out fairness.json
+    python benchmark.py compare baseline.json bench.json --threshold 0.1
+"""
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import Config
+from benchmarks.report import save_report, load_report, compare_reports, format_comparison
+
+
+def parse_list(value, cast=str):
+    return [cast(item.strip()) for item in value.split(",") if item.strip()]
+
+
+def cmd_run(args):
+    from utils.style_loader import StyleLoader
+    from benchmarks.pipeline import run_suite, INPUT_TYPES
+
+    styles = Config.ALL_STYLES if args.styles == "all" else parse_list(args.styles)
+    unknown = [style for style in styles if style not in Config.ALL_STYLES]
+    if unknown:
+        print(f"❌ Unknown styles: {', '.join(unknown)}")
+        return 2
+
+    input_types = INPUT_TYPES if args.inputs == "all" else parse_list(args.inputs)
+    resolutions = parse_list(args.sizes, int)
+
+    style_loader = StyleLoader()
+    style_loader.load_models()
+    results = run_suite(
+        style_loader, styles, resolutions, input_types,
+        repeat=args.repeat, warmup=args.warmup, frame_count=args.frames
+    )
+
+    settings = {
+        "styles": styles,
+        "resolutions": resolutions,
+        "inputs": input_types,
+        "repeat": args.repeat,
+        "warmup": args.warmup,
+        "frames": args.frames,
+    }
+    save_report(args.out, "pipeline", results, settings)
+    print(f"\n📄 Wrote {len(results)} results to {args.out}")
+    return 0
+
+
+def cmd_encode(args):
+    from benchmarks.encoding import run_encoding_suite, DEFAULT_STYLES
+
+    styles = DEFAULT_STYLES if args.styles == "default" else parse_list(args.styles)
+    resolutions = parse_list(args.sizes, int)
+    results = run_encoding_suite(styles, resolutions, repeat=args.repeat)
+    save_report(args.out, "encoding", results, {"styles": styles, "resolutions": resolutions, "repeat": args.repeat})
+    print(f"\n📄 Wrote {len(results)} results to {args.out}")
+    return 0
+
+
+def cmd_sampler(args):
+    from benchmarks.decode import run_sampler_suite
+
+    seconds = parse_list(args.seconds, int)
+    results = run_sampler_suite(seconds, resolution=args.size, repeat=args.repeat)
+    settings = {"seconds": seconds, "resolution": args.size, "repeat": args.repeat,
+                "max_frames": Config.MAX_VIDEO_FRAMES, "min_fps": Config.VIDEO_MIN_FPS}
+    save_report(args.out, "sampler", results, settings)
+    print(f"\n📄 Wrote {len(results)} results to {args.out}")
+    return 0
+
+
+def cmd_gif(args):
+    from benchmarks.encoding import run_gif_suite, DEFAULT_STYLES
+
+    styles = DEFAULT_STYLES if args.styles == "default" else parse_list(args.styles)
+    resolutions = parse_list(args.sizes, int)
+    results = run_gif_suite(styles, resolutions, frame_count=args.frames, repeat=args.repeat)
+    settings = {"styles": styles, "resolutions": resolutions, "frames": args.frames, "repeat": args.repeat}
+    save_report(args.out, "gif", results, settings)
+    print(f"\n📄 Wrote {len(results)} results to {args.out}")
+    return 0
+
+
+def cmd_decode(args):
+    from benchmarks.decode import run_decode_suite
+
+    resolutions = parse_list(args.sizes, int)
+    results = run_decode_suite(resolutions, args.max_size, repeat=args.repeat, frame_count=args.frames)
+    settings = {"resolutions": resolutions, "max_size": args.max_size or Config.MAX_IMAGE_SIZE,
+                "repeat": args.repeat, "frames": args.frames}
+    save_report(args.out, "decode", results, settings)
+    print(f"\n📄 Wrote {len(results)} results to {args.out}")
+    return 0
+
+
+def cmd_batch(args):
+    from benchmarks.batch import run_batch_suite
+
+    styles = Config.OPENCV_STYLES if args.styles == "all" else parse_list(args.styles)
+    unknown = [style for style in styles if style not in Config.OPENCV_STYLES]
+    if unknown:
+        print(f"❌ Not OpenCV styles: {', '.join(unknown)}")
+        return 2
+
+    resolutions = parse_list(args.sizes, int)
+    results = run_batch_suite(styles, resolutions, frame_count=args.frames, repeat=args.repeat)
+    settings = {"styles": styles, "resolutions": resolutions, "frames": args.frames,
+                "repeat": args.repeat, "workers": Config.OPENCV_WORKERS}
+    save_report(args.out, "batch", results, settings)
+    print(f"\n📄 Wrote {len(results)} results to {args.out}")
+    return 0
+
+
+def cmd_live(args):
+    from benchmarks.live import run_live_suite
+
+    styles = Config.OPENCV_STYLES if args.styles == "all" else parse_list(args.styles)
+    unknown = [style for style in styles if style not in Config.ALL_STYLES]
+    if unknown:
+        print(f"❌ Unknown styles: {', '.join(unknown)}")
+        return 2
+
+    camera = tuple(parse_list(args.camera.replace("x", ","), int))
+    results = run_live_suite(styles, camera, frame_count=args.frames, target_fps=args.fps, repeat=args.repeat)
+    settings = {"styles": styles, "camera": list(camera), "frames": args.frames, "target_fps": args.fps,
+                "max_size": Config.LIVE_MAX_SIZE, "repeat": args.repeat}
+    save_report(args.out, "live", results, settings)
+    print(f"\n📄 Wrote {len(results)} results to {args.out}")
+    return 0
+
+
+def cmd_tensors(args):
+    from benchmarks.tensor_io import run_tensor_io_suite, FAMILIES
+
+    families = list(FAMILIES) if args.families == "all" else parse_list(args.families)
+    unknown = [family for family in families if family not in FAMILIES]
+    if unknown:
+        print(f"❌ Unknown families: {', '.join(unknown)}")
+        return 2
+
+    resolutions = parse_list(args.sizes, int)
+    results = run_tensor_io_suite(resolutions, families, repeat=args.repeat, with_models=not args.no_models)
+    settings = {"families": families, "resolutions": resolutions, "repeat": args.repeat,
+                "shape_buckets": Config.SHAPE_BUCKETS}
+    save_report(args.out, "tensors", results, settings)
+    print(f"\n📄 Wrote {len(results)} results to {args.out}")
+    return 0
+
+
+def cmd_schedule(args):
+    from benchmarks.scheduling import run_scheduling_suite
+
+    unknown = [style for style in (args.image_style, args.video_style) if style not in Config.ALL_STYLES]
+    if unknown:
+        print(f"❌ Unknown styles: {', '.join(unknown)}")
+        return 2
+
+    results = run_scheduling_suite(args.image_style, args.video_style, args.videos, args.images, args.interval,
+                                   args.size, args.frames, args.budget_mb)
+    settings = {"image_style": args.image_style, "video_style": args.video_style, "videos": args.videos,
+                "images": args.images, "interval": args.interval, "resolution": args.size, "frames": args.frames,
+                "lane_concurrency": Config.LANE_CONCURRENCY,
+                "memory_budget_mb": args.budget_mb or Config.MEMORY_BUDGET_MB}
+    save_report(args.out, "schedule", results, settings)
+    print(f"\n📄 Wrote {len(results)} results to {args.out}")
+    return 0
+
+
+def cmd_fairness(args):
+    from benchmarks.scheduling import run_fairness_suite
+
+    unknown = [style for style in (args.flood_style, args.light_style) if style not in Config.OPENCV_STYLES]
+    if unknown:
+        print(f"❌ Not OpenCV styles: {', '.join(unknown)}")
+        return 2
+
+    results = run_fairness_suite(args.flood_style, args.light_style, args.flood, args.light, args.interval,
+                                 args.size)
+    settings = {"flood_style": args.flood_style, "light_style": args.light_style, "flood": args.flood,
+                "light": args.light, "interval": args.interval, "resolution": args.size,
+                "lane_concurrency": Config.LANE_CONCURRENCY}
+    save_report(args.out, "fairness", results, settings)
+    print(f"\n📄 Wrote {len(results)} results to {args.out}")
+    return 0
+
+
+def cmd_calibrate(args):
+    from utils.style_loader import StyleLoader
+    from utils.cost_model import StyleCostModel
+
+    styles = Config.ALL_STYLES if args.styles == "all" else parse_list(args.styles)
+    unknown = [style for style in styles if style not in Config.ALL_STYLES]
+    if unknown:
+        print(f"❌ Unknown styles: {', '.join(unknown)}")
+        return 2
+
+    style_loader = StyleLoader()
+    style_loader.load_models()
+    # Estimates for styles not calibrated now are kept
+    cost_model = StyleCostModel(args.out)
+    cost_model.load()
+    calibrated = cost_model.calibrate(style_loader, styles, size=args.size, repeat=args.repeat)
+    cost_model.save()
+    skipped = [style for style in styles if style not in calibrated]
+    if skipped:
+        print(f"⊘ Not servable here: {', '.join(skipped)}")
+    print(f"\n📄 Wrote {len(calibrated)} style costs to {cost_model.path}")
+    return 0
+
+
+def cmd_tiers(args):
+    from utils.style_loader import StyleLoader
+    from benchmarks.tiers import run_tier_suite
+
+    styles = Config.NEURAL_STYLES + Config.CARTOON_STYLES if args.styles == "all" else parse_list(args.styles)
+    unknown = [style for style in styles if style not in Config.ALL_STYLES]
+    if unknown:
+        print(f"❌ Unknown styles: {', '.join(unknown)}")
+        return 2
+
+    scales = parse_list(args.scales, float)
+    style_loader = StyleLoader()
+    style_loader.load_models()
+    results = run_tier_suite(style_loader, styles, scales, args.size, args.images, args.repeat)
+    settings = {"styles": styles, "scales": scales, "resolution": args.size, "images": args.images,
+                "repeat": args.repeat, "guided_radius": Config.GUIDED_RADIUS, "guided_eps": Config.GUIDED_EPS}
+    save_report(args.out, "tiers", results, settings)
+    print(f"\n📄 Wrote {len(results)} results to {args.out}")
+    return 0
+
+
+def cmd_compare(args):
+    baseline = load_report(args.baseline)
+    candidate = load_report(args.candidate)
+    rows = compare_reports(baseline, candidate, args.threshold, args.min_delta_ms)
+    print(format_comparison(rows))
+
+    regressions = [row for row in rows if row["regression"]]
+    print(f"\n{len(rows)} metrics compared, {len(regressions)} regressions above {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AI Photo Style Converter benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Benchmark styles x resolutions x input types")
+    run.add_argument("--styles", default="all", help="Comma-separated styles or 'all'")
+    run.add_argument("--sizes", default="256,512,1024", help="Comma-separated long-side resolutions")
+    run.add_argument("--inputs", default="all", help="Comma-separated of image,video,gif or 'all'")
+    run.add_argument("--repeat", type=int, default=3)
+    run.add_argument("--warmup", type=int, default=1)
+    run.add_argument("--frames", type=int, default=8, help="Frames per synthetic clip")
+    run.add_argument("--out", default="bench.json")
+    run.set_defaults(func=cmd_run)
+
+    encode = sub.add_parser("encode", help="Bytes and encode time per output format and encoder profile")
+    encode.add_argument("--styles", default="default", help="Comma-separated OpenCV styles")
+    encode.add_argument("--sizes", default="512", help="Comma-separated long-side resolutions")
+    encode.add_argument("--repeat", type=int, default=5)
+    encode.add_argument("--out", default="encode.json")
+    encode.set_defaults(func=cmd_encode)
+
+    sampler = sub.add_parser("sampler", help="Decode work on long clips: read-everything vs. grab/seek sampler")
+    sampler.add_argument("--seconds", default="10,60,300", help="Comma-separated clip lengths (30 fps)")
+    sampler.add_argument("--size", type=int, default=640, help="Clip long side")
+    sampler.add_argument("--repeat", type=int, default=3)
+    sampler.add_argument("--out", default="sampler.json")
+    sampler.set_defaults(func=cmd_sampler)
+
+    gif = sub.add_parser("gif", help="GIF bytes and encode time per palette / frame-delta setting")
+    gif.add_argument("--styles", default="default", help="Comma-separated OpenCV styles")
+    gif.add_argument("--sizes", default="256,512", help="Comma-separated long-side resolutions")
+    gif.add_argument("--frames", type=int, default=24, help="Frames per synthetic clip")
+    gif.add_argument("--repeat", type=int, default=3)
+    gif.add_argument("--out", default="gif.json")
+    gif.set_defaults(func=cmd_gif)
+
+    decode = sub.add_parser("decode", help="Full-resolution vs. reduced decode of oversized uploads")
+    decode.add_argument("--sizes", default="1024,2048,4000,6000", help="Comma-separated long-side resolutions")
+    decode.add_argument("--max-size", type=int, default=None, help="Target long side (default MAX_IMAGE_SIZE)")
+    decode.add_argument("--repeat", type=int, default=5)
+    decode.add_argument("--frames", type=int, default=8, help="Frames per synthetic clip")
+    decode.add_argument("--out", default="decode.json")
+    decode.set_defaults(func=cmd_decode)
+
+    batch = sub.add_parser("batch", help="Per-frame loop vs. whole-stack batch for OpenCV video styles")
+    batch.add_argument("--styles", default="all", help="Comma-separated OpenCV styles or 'all'")
+    batch.add_argument("--sizes", default="256,512", help="Comma-separated long-side resolutions")
+    batch.add_argument("--frames", type=int, default=16, help="Frames per synthetic clip")
+    batch.add_argument("--repeat", type=int, default=3)
+    batch.add_argument("--out", default="batch.json")
+    batch.set_defaults(func=cmd_batch)
+
+    live = sub.add_parser("live", help="Upload/convert round trip vs. live session frame time and adapted size")
+    live.add_argument("--styles", default="all", help="Comma-separated styles or 'all' (OpenCV)")
+    live.add_argument("--camera", default="1280x720", help="Webcam frame size")
+    live.add_argument("--frames", type=int, default=60, help="Frames streamed to the adaptive session")
+    live.add_argument("--fps", type=float, default=None, help="Target frame rate (default LIVE_TARGET_FPS)")
+    live.add_argument("--repeat", type=int, default=5)
+    live.add_argument("--out", default="live.json")
+    live.set_defaults(func=cmd_live)
+
+    tensors = sub.add_parser("tensors", help="Torch pre/post-processing: torchvision + copies vs. pooled TensorIO")
+    tensors.add_argument("--families", default="all", help="Comma-separated: neural, anime, or 'all'")
+    tensors.add_argument("--sizes", default="256,512", help="Comma-separated long-side resolutions")
+    tensors.add_argument("--repeat", type=int, default=20)
+    tensors.add_argument("--no-models", action="store_true", help="Skip the whole-stylize() comparison")
+    tensors.add_argument("--out", default="tensors.json")
+    tensors.set_defaults(func=cmd_tensors)
+
+    schedule = sub.add_parser("schedule", help="Quick image latency under concurrent videos: one FIFO queue vs. lanes")
+    schedule.add_argument("--image-style", default="sepia")
+    schedule.add_argument("--video-style", default="cartoon")
+    schedule.add_argument("--videos", type=int, default=3, help="Video conversions submitted at the start")
+    schedule.add_argument("--images", type=int, default=40, help="Image conversions submitted after them")
+    schedule.add_argument("--interval", type=float, default=0.25, help="Seconds between image submissions")
+    schedule.add_argument("--size", type=int, default=512, help="Long side of the images and clips")
+    schedule.add_argument("--frames", type=int, default=48, help="Frames per synthetic clip")
+    schedule.add_argument("--budget-mb", type=int, default=None, help="Memory budget (default MEMORY_BUDGET_MB)")
+    schedule.add_argument("--out", default="schedule.json")
+    schedule.set_defaults(func=cmd_schedule)
+
+    fairness = sub.add_parser("fairness",
+                              help="One client's latency while another floods: arrival order vs. fair queuing")
+    fairness.add_argument("--flood-style", default="cartoon", help="OpenCV style of the flooding client's images")
+    fairness.add_argument("--light-style", default="sepia", help="OpenCV style of the light client's images")
+    fairness.add_argument("--flood", type=int, default=100, help="Images the flooding client submits at once")
+    fairness.add_argument("--light", type=int, default=20, help="Images the light client submits")
+    fairness.add_argument("--interval", type=float, default=0.25, help="Seconds between the light client's images")
+    fairness.add_argument("--size", type=int, default=512, help="Long side of the images")
+    fairness.add_argument("--out", default="fairness.json")
+    fairness.set_defaults(func=cmd_fairness)
+
+    calibrate = sub.add_parser("calibrate", help="Measure each style's ms per megapixel into the server's cost model")
+    calibrate.add_argument("--styles", default="all", help="Comma-separated styles or 'all'")
+    calibrate.add_argument("--size", type=int, default=None,
+                           help="Calibration image long side (default COST_CALIBRATION_SIZE)")
+    calibrate.add_argument("--repeat", type=int, default=None,
+                           help="Timed runs per style (default COST_CALIBRATION_REPEAT)")
+    calibrate.add_argument("--out", default=None, help="Cost model file (default COST_MODEL_PATH)")
+    calibrate.set_defaults(func=cmd_calibrate)
+
+    tiers = sub.add_parser("tiers", help="Fast tier quality/latency: low-resolution inference + guided upsampling")
+    tiers.add_argument("--styles", default="all", help="Comma-separated styles or 'all' (neural and anime)")
+    tiers.add_argument("--scales", default="0.75,0.5,0.35,0.25", help="Comma-separated inference scales")
+    tiers.add_argument("--size", type=int, default=512, help="Long side of the test images")
+    tiers.add_argument("--images", type=int, default=2, help="Synthetic test images per style")
+    tiers.add_argument("--repeat", type=int, default=2, help="Timed runs per image")
+    tiers.add_argument("--out", default="tiers.json")
+    tiers.set_defaults(func=cmd_tiers)
+
+    compare = sub.add_parser("compare", help="Flag regressions between two reports")
+    compare.add_argument("baseline")
+    compare.add_argument("candidate")
+    compare.add_argument("--threshold", type=float, default=0.10, help="Relative slowdown that counts as a regression")
+    compare.add_argument("--min-delta-ms", type=float, default=0.5, help="Ignore absolute changes below this")
+    compare.set_defaults(func=cmd_compare)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+import numpy as np
+from PIL import Image
+from config import Config
+from benchmarks.decode import measure
+from benchmarks.synthetic import make_frame
+
+
+def make_frames(resolution, frame_count):
+    """Synthetic RGB clip frames, as the video decoders return them"""
+    width, height = resolution, resolution * 3 // 4
+    return [Image.fromarray(make_frame(width, height, seed=1, t=i / max(frame_count, 1)))
+            for i in range(frame_count)]
+
+
+def per_frame(style_loader, style, frames):
+    """The pre-batch video loop: apply_style on each frame"""
+    return [np.asarray(style_loader.apply_style(frame, style).convert('RGB')) for frame in frames]
+
+
+def run_batch_suite(styles, resolutions, frame_count=16, repeat=3):
+    """Per-frame loop vs. whole-stack batch for the OpenCV styles"""
+    from utils.style_loader import StyleLoader
+
+    style_loader = StyleLoader(lite=True)
+    results = []
+    for resolution in resolutions:
+        frames = make_frames(resolution, frame_count)
+        for style in styles:
+            methods = {
+                "per_frame": lambda style=style: per_frame(style_loader, style, frames),
+                # style_frames releases its input list, so hand it a copy
+                "batch": lambda style=style: style_loader.style_frames(list(frames), style),
+            }
+            for method, function in methods.items():
+                _, total = measure(function, repeat)
+                fps = frame_count / (total["median_ms"] / 1000.0) if total["median_ms"] else 0.0
+                results.append({
+                    "status": "ok",
+                    "style": style,
+                    "resolution": resolution,
+                    "method": method,
+                    "frames": frame_count,
+                    "workers": Config.OPENCV_WORKERS,
+                    "fps": round(fps, 1),
+                    "total": total,
+                })
+                print(f"✓ {style:16s} {resolution:5d}px {method:9s} {total['median_ms']:9.2f} ms "
+                      f"{fps:8.1f} fps")
+    return results
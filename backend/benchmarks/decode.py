@@ -0,0 +1,160 @@
+import io
+import time
+import numpy as np
+from PIL import Image
+from config import Config
+from utils.image_processor import ImageProcessor
+from utils.video_processor import VideoProcessor
+from benchmarks.pipeline import summarize
+from benchmarks.synthetic import make_image_bytes, make_video_bytes, make_long_video_bytes
+
+IMAGE_FORMATS = ["JPEG", "PNG"]
+
+
+def legacy_load_image(image_bytes, max_size):
+    """Full-resolution decode followed by a LANCZOS thumbnail (pre-draft path)"""
+    img = Image.open(io.BytesIO(image_bytes))
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    if max(img.size) > max_size:
+        img.thumbnail((max_size, max_size), Image.LANCZOS)
+    return img
+
+
+def measure(function, repeat):
+    """Run function repeat times; returns (last result, timing summary)"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    return result, summarize(samples)
+
+
+def image_cases(resolution, max_size):
+    for fmt in IMAGE_FORMATS:
+        payload = make_image_bytes(resolution, fmt)
+        yield fmt.lower(), payload, {
+            "full": lambda payload=payload: legacy_load_image(payload, max_size),
+            "reduced": lambda payload=payload: ImageProcessor.load_image(payload, max_size),
+        }
+
+
+def video_cases(resolution, max_size, frame_count):
+    for output_format in ("mp4", "gif"):
+        payload = make_video_bytes(resolution, frame_count, output_format=output_format)
+        if output_format == 'gif':
+            extract = VideoProcessor.extract_gif_frames
+        else:
+            extract = VideoProcessor.extract_frames
+        yield output_format, payload, {
+            "full": lambda payload=payload, extract=extract: extract(payload),
+            "reduced": lambda payload=payload, extract=extract: extract(payload, max_size=max_size),
+        }
+
+
+def run_decode_suite(resolutions, max_size=None, repeat=5, frame_count=8):
+    """Full-resolution decode vs. reduced decode for images and clips"""
+    max_size = max_size or Config.MAX_IMAGE_SIZE
+    results = []
+    for resolution in resolutions:
+        cases = list(image_cases(resolution, max_size)) + list(video_cases(resolution, max_size, frame_count))
+        for fmt, payload, methods in cases:
+            for method, function in methods.items():
+                result, total = measure(function, repeat)
+                frames = result[0] if isinstance(result, tuple) else [result]
+                held = sum(np.asarray(frame).nbytes for frame in frames)
+                results.append({
+                    "status": "ok",
+                    "format": fmt,
+                    "resolution": resolution,
+                    "method": method,
+                    "input_bytes": len(payload),
+                    "frames": len(frames),
+                    "decoded_size": list(frames[0].size),
+                    "decoded_bytes": held,
+                    "total": total,
+                })
+                print(f"✓ {resolution:5d}px {fmt:4s} {method:7s} {total['median_ms']:8.2f} ms "
+                      f"{held / 1024 / 1024:7.1f} MB held")
+    return results
+
+
+def legacy_extract_frames(video_bytes, max_size, max_frames=150, keep=None):
+    """Every frame read and converted, every Nth kept, then trimmed to `keep` (pre-sampler path)"""
+    import os
+    import tempfile
+    import cv2
+
+    keep = keep or Config.MAX_VIDEO_FRAMES
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as tmp:
+        tmp.write(video_bytes)
+        tmp_path = tmp.name
+    try:
+        cap = cv2.VideoCapture(tmp_path)
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        frame_skip = frame_count // max_frames if frame_count > max_frames else 1
+        frames = []
+        frame_idx = 0
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if frame_idx % frame_skip == 0:
+                frame = VideoProcessor._shrink(frame, max_size)
+                frames.append(Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)))
+            frame_idx += 1
+        cap.release()
+        return frames[:keep], fps / frame_skip, {"retrieved": frame_idx, "grabbed": 0, "seeked": 0, "seeks": 0}
+    finally:
+        os.unlink(tmp_path)
+
+
+def sampled(payload, max_size, min_fps):
+    """extract_frames with VIDEO_MIN_FPS set to min_fps; returns (frames, fps, stats)"""
+    saved = Config.VIDEO_MIN_FPS
+    Config.VIDEO_MIN_FPS = min_fps
+    try:
+        stats = {}
+        frames, fps = VideoProcessor.extract_frames(
+            payload, max_frames=Config.MAX_VIDEO_FRAMES, max_size=max_size, stats=stats
+        )
+        return frames, fps, stats
+    finally:
+        Config.VIDEO_MIN_FPS = saved
+
+
+def run_sampler_suite(seconds_list, resolution=640, max_size=None, repeat=3, fps=30):
+    """Decode work for long clips: read-everything vs. the grab/seek sampler"""
+    max_size = max_size or Config.MAX_IMAGE_SIZE
+    results = []
+    for seconds in seconds_list:
+        payload = make_long_video_bytes(resolution, seconds, fps)
+        methods = {
+            "legacy": lambda payload=payload: legacy_extract_frames(payload, max_size),
+            # default: evenly over the clip, but not below VIDEO_MIN_FPS
+            "sampler": lambda payload=payload: sampled(payload, max_size, Config.VIDEO_MIN_FPS),
+            # evenly over the whole clip at any frame rate (long gaps, seeks)
+            "sampler_even": lambda payload=payload: sampled(payload, max_size, 0),
+        }
+        for method, function in methods.items():
+            (frames, output_fps, stats), total = measure(function, repeat)
+            results.append({
+                "status": "ok",
+                "format": "mp4",
+                "resolution": resolution,
+                "input": f"{seconds}s",
+                "method": method,
+                "input_bytes": len(payload),
+                "source_frames": int(seconds * fps),
+                "frames": len(frames),
+                "output_fps": round(output_fps, 2),
+                "retrieved": stats["retrieved"],
+                "grabbed": stats["grabbed"],
+                "seeks": stats["seeks"],
+                "total": total,
+            })
+            print(f"✓ {seconds:4d}s {method:12s} {total['median_ms']:9.1f} ms  styled {len(frames):3d} "
+                  f"retrieved {stats['retrieved']:5d} grabbed {stats['grabbed']:5d} seeks {stats['seeks']:3d}")
+    return results
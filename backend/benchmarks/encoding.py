@@ -0,0 +1,122 @@
+import os
+import tempfile
+import time
+import cv2
+import numpy as np
+from config import Config
+from models.opencv_styles import OpenCVStyler
+from utils.image_processor import ImageProcessor
+from utils.video_processor import VideoProcessor
+from benchmarks.pipeline import summarize
+from benchmarks.synthetic import make_frame, frame_size
+
+# Representative outputs: a color style and a grayscale sketch style
+DEFAULT_STYLES = ["cartoon", "watercolor", "pencil_sketch", "emboss"]
+
+
+def styled_sample(style, resolution):
+    """Style a synthetic frame with an OpenCV style to get a realistic encoder input"""
+    width, height = frame_size(resolution)
+    frame = make_frame(width, height)
+    return getattr(OpenCVStyler, style)(frame[:, :, ::-1].copy())
+
+
+def run_encoding_suite(styles, resolutions, repeat=5):
+    """Bytes and encode time for every format x encoder profile"""
+    results = []
+    for resolution in resolutions:
+        for style in styles:
+            img = styled_sample(style, resolution)
+            grayscale = style in Config.GRAYSCALE_STYLES
+            for fmt, profiles in Config.ENCODER_PROFILES.items():
+                for profile in profiles:
+                    samples = []
+                    for _ in range(repeat):
+                        start = time.perf_counter()
+                        data = ImageProcessor.image_to_bytes(img, fmt, profile, grayscale=grayscale)
+                        samples.append((time.perf_counter() - start) * 1000.0)
+                    results.append({
+                        "status": "ok",
+                        "style": style,
+                        "resolution": resolution,
+                        "format": fmt,
+                        "profile": profile,
+                        "grayscale": grayscale and fmt != 'webp',
+                        "output_bytes": len(data),
+                        "total": summarize(samples),
+                    })
+                    print(f"✓ {resolution:5d}px {style:14s} {fmt:4s} {profile:8s} "
+                          f"{len(data) / 1024:8.1f} KB {results[-1]['total']['median_ms']:7.2f} ms")
+    return results
+
+
+GIF_METHODS = {
+    "per_frame": {"palette": "per_frame", "delta": False},
+    "global": {"palette": "global", "delta": False},
+    "global_delta": {"palette": "global", "delta": True},
+}
+
+
+def legacy_gif(frames, duration_ms):
+    """imageio.mimsave through a temp file with per-frame quantization (pre in-memory path)"""
+    import imageio
+
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.gif') as tmp:
+        tmp_path = tmp.name
+    try:
+        imageio.mimsave(tmp_path, [np.asarray(frame) for frame in frames], duration=duration_ms, loop=0)
+        with open(tmp_path, 'rb') as f:
+            return f.read()
+    finally:
+        os.unlink(tmp_path)
+
+
+def gif_clip(resolution, frame_count, motion):
+    """
+    Synthetic clip: "full" moves the whole frame, "partial" moves one
+    object over a still background (the common case for short GIFs)
+    """
+    width, height = frame_size(resolution)
+    if motion == "full":
+        return [make_frame(width, height, seed=1, t=i / frame_count) for i in range(frame_count)]
+    background = make_frame(width, height, seed=1)
+    frames = []
+    for i in range(frame_count):
+        frame = background.copy()
+        x = int(width * (0.2 + 0.6 * i / frame_count))
+        cv2.circle(frame, (x, height // 2), max(height // 8, 2), (250, 40, 40), -1)
+        frames.append(frame)
+    return frames
+
+
+def run_gif_suite(styles, resolutions, frame_count=24, repeat=3):
+    """Bytes and encode time of styled GIFs per palette / delta setting"""
+    results = []
+    for resolution in resolutions:
+        for motion in ("full", "partial"):
+            clip = np.ascontiguousarray(np.stack(gif_clip(resolution, frame_count, motion))[:, :, :, ::-1])
+            for style in styles:
+                frames = list(OpenCVStyler.apply_batch(style, clip))
+                durations = [100] * len(frames)
+                methods = {"legacy": lambda: legacy_gif(frames, 100)}
+                for method, options in GIF_METHODS.items():
+                    methods[method] = lambda options=options: VideoProcessor.encode_gif(frames, durations, **options)
+                for method, function in methods.items():
+                    samples = []
+                    for _ in range(repeat):
+                        start = time.perf_counter()
+                        data = function()
+                        samples.append((time.perf_counter() - start) * 1000.0)
+                    results.append({
+                        "status": "ok",
+                        "style": style,
+                        "resolution": resolution,
+                        "input": motion,
+                        "method": method,
+                        "frames": frame_count,
+                        "output_bytes": len(data),
+                        "total": summarize(samples),
+                    })
+                    print(f"✓ {resolution:5d}px {motion:7s} {style:14s} {method:12s} "
+                          f"{len(data) / 1024:8.1f} KB {results[-1]['total']['median_ms']:8.2f} ms")
+    return results
@@ -0,0 +1,70 @@
+import cv2
+from config import Config
+from utils.image_processor import ImageProcessor
+from benchmarks.decode import measure
+from benchmarks.synthetic import make_frame
+
+
+def camera_frames(width, height, count, quality=80):
+    """JPEG webcam frames as the browser sends them (canvas.toBlob)"""
+    frames = []
+    for i in range(count):
+        rgb = make_frame(width, height, seed=1, t=i / max(count, 1))
+        frames.append(cv2.imencode(".jpg", cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR),
+                                   [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes())
+    return frames
+
+
+def round_trip(style_loader, style, data):
+    """Per-frame work of the capture -> upload -> convert path (HTTP overhead not included)"""
+    img = ImageProcessor.load_image(data, Config.MAX_IMAGE_SIZE)
+    styled = style_loader.apply_style(img, style)
+    return ImageProcessor.image_to_bytes(styled, "jpeg", grayscale=style in Config.GRAYSCALE_STYLES)
+
+
+def run_live_suite(styles, camera=(1280, 720), frame_count=60, target_fps=None, repeat=3):
+    """
+    Frame time of the upload/convert round trip vs. a live session at the
+    full LIVE_MAX_SIZE side, and the side and frame rate the live session
+    settles at when adapting to target_fps
+    """
+    from utils.style_loader import StyleLoader
+    from utils.live import LiveSession
+
+    style_loader = StyleLoader()
+    style_loader.load_models()
+    target_fps = target_fps or Config.LIVE_TARGET_FPS
+    frames = camera_frames(camera[0], camera[1], frame_count)
+    results = []
+    for style in styles:
+        if style_loader.style_status(style) not in ("warming", "ready"):
+            print(f"⊘ {style:16s} not available")
+            results.append({"status": "skipped", "style": style})
+            continue
+
+        _, legacy = measure(lambda: round_trip(style_loader, style, frames[0]), repeat)
+
+        # Fixed side: an effectively unlimited target keeps the session at LIVE_MAX_SIZE
+        fixed = LiveSession(style_loader, style, target_fps=1e-3)
+        fixed.process(frames[0])
+        _, full = measure(lambda: fixed.process(frames[1]), repeat)
+
+        adaptive = LiveSession(style_loader, style, target_fps=target_fps)
+        for data in frames:
+            adaptive.process(data)
+        settled = adaptive.frame_seconds
+        results.append({
+            "status": "ok",
+            "style": style,
+            "camera": list(camera),
+            "round_trip": legacy,
+            "live_full": full,
+            "live_full_side": fixed.side,
+            "target_fps": adaptive.target_fps,
+            "settled_side": adaptive.side,
+            "settled_ms": round(settled * 1000, 2),
+            "settled_fps": round(1 / settled, 1) if settled else None,
+        })
+        print(f"✓ {style:16s} round trip {legacy['median_ms']:8.2f} ms   live@{fixed.side} "
+              f"{full['median_ms']:8.2f} ms   adaptive {adaptive.side}px {1 / settled:6.1f} fps")
+    return results
@@ -0,0 +1,138 @@
+import numpy as np
+from config import Config
+from utils.image_processor import ImageProcessor
+from utils.video_processor import VideoProcessor
+from utils.timing import StageTimer
+from benchmarks.synthetic import make_image_bytes, make_video_bytes
+
+INPUT_TYPES = ["image", "video", "gif"]
+
+
+def style_family(style):
+    """Return the family a style belongs to"""
+    if style in Config.OPENCV_STYLES:
+        return "opencv"
+    if style in Config.NEURAL_STYLES:
+        return "neural"
+    if style in Config.CARTOON_STYLES:
+        return "anime"
+    return "unknown"
+
+
+def summarize(samples):
+    """Reduce a list of millisecond samples to summary statistics"""
+    values = np.asarray(samples, dtype=np.float64)
+    return {
+        "median_ms": round(float(np.median(values)), 3),
+        "mean_ms": round(float(values.mean()), 3),
+        "min_ms": round(float(values.min()), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+    }
+
+
+def run_image(style_loader, style, payload):
+    """Run the /api/convert image path"""
+    img = ImageProcessor.load_image(payload, Config.MAX_IMAGE_SIZE)
+    styled = style_loader.apply_style(img, style)
+    output = ImageProcessor.image_to_bytes(styled)
+    return len(output), 1
+
+
+def run_video(style_loader, style, payload, output_format):
+    """Run the /api/convert video path"""
+    gif_timing = {}
+    if output_format == 'gif':
+        frames, fps, gif_timing = VideoProcessor.extract_gif_frames(
+            payload, max_size=Config.MAX_IMAGE_SIZE, max_frames=Config.MAX_VIDEO_FRAMES
+        )
+    else:
+        frames, fps = VideoProcessor.extract_frames(
+            payload, max_frames=Config.MAX_VIDEO_FRAMES, max_size=Config.MAX_IMAGE_SIZE
+        )
+
+    frame_count = len(frames)
+    styled_frames = style_loader.style_frames(frames, style)
+
+    output = VideoProcessor.create_video(styled_frames, fps, output_format, **gif_timing)
+    return len(output or b""), frame_count
+
+
+def run_once(style_loader, style, input_type, payload):
+    """Run one conversion under a StageTimer; returns (timer, output bytes, frames)"""
+    timer = StageTimer()
+    token = timer.activate()
+    try:
+        if input_type == "image":
+            output_bytes, frames = run_image(style_loader, style, payload)
+        else:
+            output_format = 'gif' if input_type == 'gif' else 'mp4'
+            output_bytes, frames = run_video(style_loader, style, payload, output_format)
+    finally:
+        StageTimer.deactivate(token)
+    return timer, output_bytes, frames
+
+
+def make_payload(input_type, resolution, frame_count):
+    """Generate the synthetic upload for one input type"""
+    if input_type == "image":
+        return make_image_bytes(resolution)
+    if input_type == "gif":
+        return make_video_bytes(resolution, frame_count, output_format='gif')
+    return make_video_bytes(resolution, frame_count, output_format='mp4')
+
+
+def is_style_available(style_loader, style):
+    """Check whether a style can run on this host"""
+    if style in Config.OPENCV_STYLES:
+        return True
+    models = style_loader.models
+    return style in models['neural'] or style in models['anime']
+
+
+def run_suite(style_loader, styles, resolutions, input_types, repeat=3, warmup=1, frame_count=8):
+    """Benchmark every style x resolution x input type combination"""
+    results = []
+    for input_type in input_types:
+        for resolution in resolutions:
+            payload = make_payload(input_type, resolution, frame_count)
+            for style in styles:
+                entry = {
+                    "style": style,
+                    "family": style_family(style),
+                    "input": input_type,
+                    "resolution": resolution,
+                    "input_bytes": len(payload),
+                }
+
+                if not is_style_available(style_loader, style):
+                    entry.update(status="skipped", reason="model not loaded")
+                    results.append(entry)
+                    print(f"⊘ {input_type:5s} {resolution:5d}px {style}: model not loaded")
+                    continue
+
+                samples = {}
+                totals = []
+                try:
+                    for i in range(warmup + repeat):
+                        timer, output_bytes, frames = run_once(style_loader, style, input_type, payload)
+                        if i < warmup:
+                            continue
+                        for name, stats in timer.as_dict().items():
+                            samples.setdefault(name, []).append(stats["ms"])
+                        totals.append(timer.total_ms())
+                except Exception as e:
+                    entry.update(status="error", reason=str(e))
+                    results.append(entry)
+                    print(f"✗ {input_type:5s} {resolution:5d}px {style}: {e}")
+                    continue
+
+                entry.update(
+                    status="ok",
+                    frames=frames,
+                    output_bytes=output_bytes,
+                    stages={name: summarize(values) for name, values in samples.items()},
+                    total=summarize(totals),
+                )
+                results.append(entry)
+                print(f"✓ {input_type:5s} {resolution:5d}px {style}: {entry['total']['median_ms']:.1f} ms")
+    return results
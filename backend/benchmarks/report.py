@@ -0,0 +1,117 @@
+import json
+import platform
+import sys
+from datetime import datetime, timezone
+
+
+def environment():
+    """Describe the host a benchmark ran on"""
+    import cv2
+    import numpy as np
+
+    try:
+        import torch
+        torch_version = torch.__version__
+        torch_threads = torch.get_num_threads()
+    except ImportError:
+        torch_version = None
+        torch_threads = None
+
+    return {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "torch": torch_version,
+        "torch_threads": torch_threads,
+        "opencv_threads": cv2.getNumThreads(),
+    }
+
+
+def save_report(path, suite, results, settings):
+    """Write benchmark results as JSON"""
+    report = {
+        "suite": suite,
+        "meta": environment(),
+        "settings": settings,
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def load_report(path):
+    """Read a benchmark report written by save_report"""
+    with open(path) as f:
+        return json.load(f)
+
+
+def result_key(entry):
+    """Identify a result row independently of metric values"""
+    return tuple(
+        (name, entry[name]) for name in sorted(entry)
+        if name in ("suite_case", "style", "input", "resolution", "format", "profile", "method", "frames_total")
+    )
+
+
+def _metric_pairs(entry):
+    """Yield (metric name, median ms) for a result row"""
+    if "total" in entry:
+        yield "total", entry["total"]["median_ms"]
+    for stage, stats in entry.get("stages", {}).items():
+        yield stage, stats["median_ms"]
+
+
+def compare_reports(baseline, candidate, threshold=0.10, min_delta_ms=0.5):
+    """
+    Compare two reports and flag regressions
+
+    A metric regresses when the candidate median is more than `threshold`
+    (fraction) slower than the baseline and the absolute difference exceeds
+    `min_delta_ms`, which keeps sub-millisecond noise out of the report.
+    """
+    base_rows = {result_key(entry): entry for entry in baseline["results"] if entry.get("status") == "ok"}
+    rows = []
+
+    for entry in candidate["results"]:
+        if entry.get("status") != "ok":
+            continue
+        base = base_rows.get(result_key(entry))
+        if base is None:
+            continue
+
+        base_metrics = dict(_metric_pairs(base))
+        for metric, value in _metric_pairs(entry):
+            if metric not in base_metrics:
+                continue
+            before = base_metrics[metric]
+            delta = value - before
+            ratio = (value / before - 1.0) if before > 0 else 0.0
+            rows.append({
+                "key": dict(result_key(entry)),
+                "metric": metric,
+                "baseline_ms": before,
+                "candidate_ms": value,
+                "change": round(ratio, 4),
+                "regression": ratio > threshold and delta > min_delta_ms,
+                "improvement": ratio < -threshold and -delta > min_delta_ms,
+            })
+    return rows
+
+
+def format_comparison(rows):
+    """Render comparison rows as a plain-text table"""
+    lines = []
+    for row in rows:
+        if not (row["regression"] or row["improvement"]):
+            continue
+        label = ", ".join(f"{k}={v}" for k, v in row["key"].items())
+        marker = "❌ REGRESSION" if row["regression"] else "✅ faster"
+        lines.append(
+            f"{marker:14s} {label} [{row['metric']}] "
+            f"{row['baseline_ms']:.2f} → {row['candidate_ms']:.2f} ms ({row['change']:+.1%})"
+        )
+    return "\n".join(lines) if lines else "No significant changes."
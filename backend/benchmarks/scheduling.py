@@ -0,0 +1,148 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from config import Config
+from utils.admission import AdmissionController, MemoryEstimator, MB, conversion_lane
+from utils.fair_share import ClientBudgets
+from benchmarks.pipeline import run_image, run_video, summarize
+from benchmarks.synthetic import make_image_bytes, make_video_bytes, frame_size
+
+# Before lanes every conversion shared one FIFO queue, limited by memory only
+FIFO_LANES = {"fifo": (10 ** 6, 10 ** 6)}
+
+
+def fifo_lane(style, is_video):
+    return "fifo"
+
+
+async def mixed_load(style_loader, admission, lane_of, jobs, per_client=True):
+    """
+    Run (start offset, kind, style, payload, memory estimate[, client]) jobs;
+    returns [(kind, latency s, queue wait s, client)]. Without per_client
+    admission does not see the clients.
+    """
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=len(jobs))
+    started = time.monotonic()
+
+    async def run(offset, kind, style, payload, nbytes, client=None):
+        await asyncio.sleep(max(0.0, offset - (time.monotonic() - started)))
+        submitted = time.monotonic()
+        reservation = await admission.acquire(nbytes, lane_of(style, kind == "video"),
+                                              client=client if per_client else None)
+        admitted = time.monotonic()
+        try:
+            if kind == "video":
+                await loop.run_in_executor(executor, run_video, style_loader, style, payload, "mp4")
+            else:
+                await loop.run_in_executor(executor, run_image, style_loader, style, payload)
+        finally:
+            admission.release(reservation)
+        return kind, time.monotonic() - submitted, admitted - submitted, client
+
+    try:
+        return await asyncio.gather(*(run(*job) for job in jobs))
+    finally:
+        executor.shutdown()
+
+
+def run_scheduling_suite(image_style="sepia", video_style="cartoon", videos=3, images=40, interval=0.25,
+                         resolution=512, frame_count=48, budget_mb=None):
+    """
+    Latency of quick image conversions arriving every `interval` seconds while
+    `videos` video conversions run, with one shared FIFO queue vs. lanes; a
+    small budget_mb makes videos wait for memory, as under a real backlog
+    """
+    from utils.style_loader import StyleLoader
+
+    style_loader = StyleLoader()
+    if image_style not in Config.OPENCV_STYLES or video_style not in Config.OPENCV_STYLES:
+        style_loader.load_models()
+    for style in (image_style, video_style):
+        if style_loader.style_status(style) not in ("warming", "ready"):
+            print(f"⊘ {style} not available; skipping")
+            return []
+
+    width, height = frame_size(resolution)
+    image = make_image_bytes(resolution)
+    video = make_video_bytes(resolution, frame_count)
+    frames = min(frame_count, Config.MAX_VIDEO_FRAMES)
+    jobs = [(0.05 * i, "video", video_style, video,
+             MemoryEstimator.estimate(video_style, width, height, frames, len(video), is_video=True))
+            for i in range(videos)]
+    jobs += [(0.5 + interval * i, "image", image_style, image,
+              MemoryEstimator.estimate(image_style, width, height, 1, len(image)))
+             for i in range(images)]
+    run_image(style_loader, image_style, image)  # warm up both paths
+    run_video(style_loader, video_style, video, "mp4")
+
+    results = []
+    for method, lanes, lane_of in (("fifo", FIFO_LANES, fifo_lane), ("lanes", None, conversion_lane)):
+        admission = AdmissionController((budget_mb or Config.MEMORY_BUDGET_MB) * MB, max_queued=10 ** 6,
+                                        queue_timeout=3600, lanes=lanes)
+        outcomes = asyncio.run(mixed_load(style_loader, admission, lane_of, jobs))
+        for kind, style in (("image", image_style), ("video", video_style)):
+            latencies = [latency * 1000 for outcome, latency, _, _ in outcomes if outcome == kind]
+            waits = [wait * 1000 for outcome, _, wait, _ in outcomes if outcome == kind]
+            total = dict(summarize(latencies), max_ms=round(float(np.max(latencies)), 3))
+            results.append({
+                "status": "ok",
+                "suite_case": "scheduling/mixed",
+                "style": style,
+                "input": kind,
+                "resolution": resolution,
+                "method": method,
+                "jobs": len(latencies),
+                "total": total,
+                "queue_wait": summarize(waits),
+            })
+            print(f"✓ {method:5s} {kind:5s} {style:10s} x{len(latencies):3d}  p50 {total['median_ms']:9.1f} ms  "
+                  f"p95 {total['p95_ms']:9.1f} ms  max {total['max_ms']:9.1f} ms  "
+                  f"queued p95 {results[-1]['queue_wait']['p95_ms']:9.1f} ms")
+    return results
+
+
+def run_fairness_suite(flood_style="cartoon", light_style="sepia", flood=100, light=20, interval=0.25,
+                       resolution=512):
+    """
+    Latency of a light client's images (one every `interval` seconds) while
+    another client submits `flood` images at once, in arrival order vs.
+    fair queuing by client (client budgets off, so only the order differs)
+    """
+    from utils.style_loader import StyleLoader
+
+    style_loader = StyleLoader()
+    width, height = frame_size(resolution)
+    image = make_image_bytes(resolution)
+    jobs = [(0.0, "image", flood_style, image, MemoryEstimator.estimate(flood_style, width, height, 1, len(image)),
+             "flood") for _ in range(flood)]
+    jobs += [(0.1 + interval * i, "image", light_style, image,
+              MemoryEstimator.estimate(light_style, width, height, 1, len(image)), "light")
+             for i in range(light)]
+    run_image(style_loader, flood_style, image)
+    run_image(style_loader, light_style, image)
+
+    results = []
+    for method in ("arrival", "fair"):
+        admission = AdmissionController(max_queued=10 ** 6, queue_timeout=3600,
+                                        client_budgets=ClientBudgets(capacity=0), client_max_queued=10 ** 6)
+        outcomes = asyncio.run(mixed_load(style_loader, admission, conversion_lane, jobs, method == "fair"))
+        for client, style in (("flood", flood_style), ("light", light_style)):
+            mine = [(latency, wait) for _, latency, wait, who in outcomes if who == client]
+            latencies = [latency * 1000 for latency, _ in mine]
+            total = dict(summarize(latencies), max_ms=round(float(np.max(latencies)), 3))
+            results.append({
+                "status": "ok",
+                "suite_case": f"fairness/{client}",
+                "style": style,
+                "input": "image",
+                "resolution": resolution,
+                "method": method,
+                "jobs": len(latencies),
+                "total": total,
+                "queue_wait": summarize([wait * 1000 for _, wait in mine]),
+            })
+            print(f"✓ {method:7s} {client:5s} {style:10s} x{len(latencies):3d}  p50 {total['median_ms']:9.1f} ms  "
+                  f"p95 {total['p95_ms']:9.1f} ms  max {total['max_ms']:9.1f} ms")
+    return results
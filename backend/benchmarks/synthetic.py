@@ -0,0 +1,92 @@
+import io
+import os
+import tempfile
+import cv2
+import numpy as np
+from PIL import Image
+
+
+def make_frame(width, height, seed=0, t=0.0):
+    """Build a deterministic RGB test frame (gradients, shapes, texture)"""
+    rng = np.random.default_rng(seed)
+    ys, xs = np.mgrid[0:height, 0:width].astype(np.float32)
+    xs /= max(width - 1, 1)
+    ys /= max(height - 1, 1)
+
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[:, :, 0] = (255 * xs).astype(np.uint8)
+    frame[:, :, 1] = (255 * ys).astype(np.uint8)
+    frame[:, :, 2] = (127 + 127 * np.sin(8 * np.pi * (xs + ys + t))).astype(np.uint8)
+
+    # A few solid shapes give the stylers real edges to work on
+    for _ in range(6):
+        cx = int(rng.integers(0, width))
+        cy = int(rng.integers(0, height))
+        radius = int(rng.integers(max(min(width, height) // 20, 2), max(min(width, height) // 5, 3)))
+        color = tuple(int(c) for c in rng.integers(0, 256, 3))
+        dx = int(t * width * 0.1)
+        cv2.circle(frame, ((cx + dx) % width, cy), radius, color, -1)
+
+    noise = rng.integers(0, 16, frame.shape, dtype=np.uint8)
+    return cv2.add(frame, noise)
+
+
+def frame_size(resolution, aspect=4 / 3):
+    """Return (width, height) with the long side equal to resolution"""
+    return resolution, max(int(round(resolution / aspect)), 2)
+
+
+def make_image_bytes(resolution, fmt='JPEG', seed=0):
+    """Encode a synthetic image like a client upload"""
+    width, height = frame_size(resolution)
+    frame = make_frame(width, height, seed)
+    buffer = io.BytesIO()
+    Image.fromarray(frame).save(buffer, format=fmt, quality=92)
+    return buffer.getvalue()
+
+
+def make_long_video_bytes(resolution, seconds, fps=30, seed=0):
+    """Encode a long mp4 clip without holding all of its frames (30 distinct frames, cycled)"""
+    width, height = frame_size(resolution)
+    cycle = [make_frame(width, height, seed, t=i / 30)[:, :, ::-1].copy() for i in range(30)]
+
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as tmp:
+        tmp_path = tmp.name
+    try:
+        writer = cv2.VideoWriter(tmp_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+        for i in range(int(seconds * fps)):
+            writer.write(cycle[i % len(cycle)])
+        writer.release()
+        with open(tmp_path, 'rb') as f:
+            return f.read()
+    finally:
+        os.unlink(tmp_path)
+
+
+def make_video_bytes(resolution, frame_count=8, fps=24, output_format='mp4', seed=0):
+    """Encode a synthetic clip (mp4 or gif) like a client upload"""
+    width, height = frame_size(resolution)
+    frames = [make_frame(width, height, seed, t=i / max(frame_count, 1)) for i in range(frame_count)]
+
+    with tempfile.NamedTemporaryFile(delete=False, suffix=f'.{output_format}') as tmp:
+        tmp_path = tmp.name
+
+    try:
+        if output_format == 'gif':
+            pil_frames = [Image.fromarray(frame) for frame in frames]
+            pil_frames[0].save(
+                tmp_path, save_all=True, append_images=pil_frames[1:],
+                duration=int(1000 / fps), loop=0
+            )
+        else:
+            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+            out = cv2.VideoWriter(tmp_path, fourcc, fps, (width, height))
+            for frame in frames:
+                out.write(cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
+            out.release()
+
+        with open(tmp_path, 'rb') as f:
+            return f.read()
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
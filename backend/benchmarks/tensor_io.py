@@ -0,0 +1,200 @@
+import contextlib
+import io
+import os
+import tracemalloc
+import numpy as np
+from PIL import Image
+from config import Config
+from benchmarks.decode import measure
+from benchmarks.synthetic import make_frame
+
+LARGE_ALLOCATION = 64 * 1024  # smaller tensors are scalars and views' bookkeeping
+
+# (input scale, offset) to the model and (scale, offset, BGR->RGB) from it, as in the stylers
+FAMILIES = {
+    "neural": ((1.0, 0.0), (1.0, 0.0, False)),
+    "anime": ((2 / 255, -1.0), (127.5, 127.5, True)),
+}
+
+
+def legacy_preprocess(img, family):
+    """The torchvision path the stylers used before TensorIO"""
+    from torchvision import transforms
+    from models.shape_buckets import pad_to_bucket
+
+    if family == "neural":
+        transform = transforms.Compose([
+            transforms.ToTensor(),
+            transforms.Lambda(lambda x: x.mul(255))
+        ])
+        img_tensor = transform(img).unsqueeze(0)
+    else:
+        img_tensor = transforms.ToTensor()(img).unsqueeze(0)
+        img_tensor = img_tensor * 2 - 1
+    return pad_to_bucket(img_tensor)
+
+
+def legacy_postprocess(output, size, family):
+    import torch
+    from models.shape_buckets import crop_to
+
+    if family == "neural":
+        output = crop_to(output, size).cpu().squeeze(0).clamp(0, 255)
+        output = output.numpy().transpose(1, 2, 0).astype(np.uint8)
+        return Image.fromarray(output)
+    output = crop_to(output, size).cpu()[0]
+    output = output[[2, 1, 0], :, :]
+    output = output.float() * 0.5 + 0.5
+    output = torch.clamp(output, 0, 1)
+    output_np = output.permute(1, 2, 0).numpy()
+    output_np = (output_np * 255).astype(np.uint8)
+    return Image.fromarray(output_np, 'RGB')
+
+
+def legacy_frame(frame):
+    """PIL image apply_style built from a BGR array before the stylers took views"""
+    return Image.fromarray(frame[:, :, ::-1].astype('uint8'), 'RGB')
+
+
+def make_tensor_io(family):
+    from models.tensor_io import TensorIO
+
+    (scale, offset), (out_scale, out_offset, swap) = FAMILIES[family]
+    return TensorIO(scale, offset, out_scale, out_offset, swap)
+
+
+def count_allocations(function):
+    """(torch tensors >= 64 KiB allocated and freed, their MB, peak numpy MB) over one call"""
+    from torch.profiler import profile, ProfilerActivity
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    # The profiler only reports large CPU allocations as their frees, so count those
+    with contextlib.redirect_stderr(io.StringIO()), profile(activities=[ProfilerActivity.CPU],
+                                                            profile_memory=True) as prof:
+        function()
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    freed = [-event.cpu_memory_usage for event in prof.events()
+             if event.name == "[memory]" and event.cpu_memory_usage <= -LARGE_ALLOCATION]
+    return len(freed), round(sum(freed) / 1e6, 2), round(peak / 1e6, 2)
+
+
+def pre_post_cases(family, resolution):
+    """Pre- and postprocessing around a stand-in model output, per input kind and method"""
+    import torch
+
+    width, height = resolution, resolution * 3 // 4
+    frame = np.ascontiguousarray(make_frame(width, height, seed=1, t=0.0)[:, :, ::-1])  # BGR, as OpenCV decodes
+    image = Image.fromarray(np.ascontiguousarray(frame[:, :, ::-1]))
+    tensor_io = make_tensor_io(family)
+    padded, _ = legacy_preprocess(image, family)
+    # The model's output stands in for inference; each call works on a fresh copy of it
+    low, high = (0.0, 255.0) if family == "neural" else (-1.0, 1.0)
+    template = torch.rand(padded.shape) * (high - low) + low
+
+    def legacy(img):
+        _, size = legacy_preprocess(img, family)
+        return legacy_postprocess(template.clone(), size, family)
+
+    def fused(pixels):
+        tensor, size = tensor_io.to_tensor(pixels)
+        tensor_io.release(tensor)
+        return tensor_io.to_image(template.clone(), size)
+
+    return {
+        "image": {
+            "legacy": lambda: legacy(image),
+            "fused": lambda: fused(np.asarray(image)),
+        },
+        "frame": {
+            "legacy": lambda: legacy(legacy_frame(frame)),
+            "fused": lambda: fused(frame[:, :, ::-1]),
+        },
+    }
+
+
+def end_to_end_cases(family, resolution):
+    """Whole stylize() of the family's first downloaded model vs. the legacy pre/post around it"""
+    import torch
+
+    paths = Config.NEURAL_MODEL_PATHS if family == "neural" else Config.ANIME_MODEL_PATHS
+    style, path = next(((style, path) for style, path in paths.items() if os.path.exists(path)), (None, None))
+    if style is None:
+        return None, {}
+    if family == "neural":
+        from models.neural_style import NeuralStyler
+        styler = NeuralStyler(path)
+    else:
+        from models.cartoon_transformer import CartoonGANStyler
+        styler = CartoonGANStyler(path, style)
+
+    width, height = resolution, resolution * 3 // 4
+    image = Image.fromarray(make_frame(width, height, seed=1, t=0.0))
+
+    def legacy():
+        img_tensor, size = legacy_preprocess(image, family)
+        with torch.no_grad():
+            output = styler.model(img_tensor)
+        return legacy_postprocess(output, size, family)
+
+    return style, {"legacy": legacy, "fused": lambda: styler.stylize(image)}
+
+
+def run_tensor_io_suite(resolutions, families=("neural", "anime"), repeat=20, with_models=True):
+    """Latency and allocations of tensor pre/post: torchvision + copies vs. TensorIO"""
+    import torch
+
+    results = []
+    for family in families:
+        for resolution in resolutions:
+            cases = pre_post_cases(family, resolution)
+            for input_kind, methods in cases.items():
+                outputs = {}
+                for method, function in methods.items():
+                    function()  # first call allocates the pooled buffers
+                    outputs[method], total = measure(function, repeat)
+                    tensors, tensor_mb, numpy_mb = count_allocations(function)
+                    results.append({
+                        "status": "ok",
+                        "suite_case": f"{family}/pre_post",
+                        "family": family,
+                        "resolution": resolution,
+                        "input": input_kind,
+                        "stage": "pre_post",
+                        "method": method,
+                        "total": total,
+                        "tensor_allocations": tensors,
+                        "tensor_alloc_mb": tensor_mb,
+                        "numpy_peak_mb": numpy_mb,
+                    })
+                    print(f"✓ {family:6s} {resolution:5d}px {input_kind:5s} {method:6s} "
+                          f"{total['median_ms']:8.2f} ms  {tensors:2d} tensors {tensor_mb:7.2f} MB  "
+                          f"numpy peak {numpy_mb:6.2f} MB")
+                diff = np.abs(np.asarray(outputs["legacy"], dtype=np.int16) - np.asarray(outputs["fused"]))
+                results[-1]["max_diff"] = int(diff.max())
+
+            # stylize() thumbnails larger inputs first, which the legacy path here does not
+            if not with_models or resolution > 512:
+                continue
+            style, methods = end_to_end_cases(family, resolution)
+            if style is None:
+                print(f"⊘ {family:6s} no model downloaded; skipping stylize()")
+                continue
+            with torch.no_grad():
+                for method, function in methods.items():
+                    function()
+                    _, total = measure(function, max(3, repeat // 4))
+                    results.append({
+                        "status": "ok",
+                        "suite_case": f"{family}/stylize",
+                        "family": family,
+                        "style": style,
+                        "resolution": resolution,
+                        "input": "image",
+                        "stage": "stylize",
+                        "method": method,
+                        "total": total,
+                    })
+                    print(f"✓ {style:6s} {resolution:5d}px stylize {method:6s} {total['median_ms']:8.2f} ms")
+    return results
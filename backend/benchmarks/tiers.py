@@ -0,0 +1,115 @@
+import time
+import cv2
+import numpy as np
+from PIL import Image
+from utils.guided_filter import guided_upsample
+from utils.style_loader import SERVABLE
+from benchmarks.pipeline import summarize
+from benchmarks.synthetic import make_frame, frame_size
+
+
+def psnr(output, reference):
+    mse = np.mean((np.asarray(output, dtype=np.float64) - reference) ** 2)
+    return float("inf") if mse == 0 else float(10 * np.log10(255 ** 2 / mse))
+
+
+def ssim(output, reference):
+    """Mean SSIM of the luminance (11x11 Gaussian window, sigma 1.5)"""
+    a, b = (cv2.cvtColor(np.asarray(image), cv2.COLOR_RGB2GRAY).astype(np.float64) for image in (output, reference))
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+
+    def blur(image):
+        return cv2.GaussianBlur(image, (11, 11), 1.5)
+
+    mean_a, mean_b = blur(a), blur(b)
+    var_a = blur(a * a) - mean_a ** 2
+    var_b = blur(b * b) - mean_b ** 2
+    cov = blur(a * b) - mean_a * mean_b
+    ssim_map = ((2 * mean_a * mean_b + c1) * (2 * cov + c2)) / ((mean_a ** 2 + mean_b ** 2 + c1) * (var_a + var_b + c2))
+    return float(ssim_map.mean())
+
+
+def style_low_res(style_loader, rgb, style, scale):
+    """(styled low-resolution RGB, its resized input, ms) as StyleLoader.apply_style_low_res runs it"""
+    height, width = rgb.shape[:2]
+    started = time.perf_counter()
+    low = cv2.resize(rgb, (max(1, round(width * scale)), max(1, round(height * scale))), interpolation=cv2.INTER_AREA)
+    styled = np.asarray(style_loader.apply_style(Image.fromarray(low), style).convert('RGB'))
+    return styled, low, (time.perf_counter() - started) * 1000
+
+
+def upsample(method, rgb, low, styled):
+    if method == "guided":
+        return guided_upsample(rgb, low, styled)
+    return cv2.resize(styled, (rgb.shape[1], rgb.shape[0]), interpolation=cv2.INTER_LINEAR)
+
+
+def run_tier_suite(style_loader, styles, scales, resolution=512, images=2, repeat=2):
+    """
+    Quality/latency curve of the fast tier: each style at full resolution vs.
+    at each scale, upsampled with the guided filter or bilinearly; quality
+    (PSNR, SSIM) is measured against the full-resolution output
+    """
+    width, height = frame_size(resolution)
+    inputs = [make_frame(width, height, seed) for seed in range(images)]
+    results = []
+    for style in styles:
+        if style_loader.style_status(style) not in SERVABLE:
+            print(f"⊘ {style} not available; skipping")
+            continue
+        style_loader.apply_style(Image.fromarray(inputs[0]), style)
+        references, full_ms = [], []
+        for rgb in inputs:
+            for _ in range(repeat):
+                started = time.perf_counter()
+                reference = np.asarray(style_loader.apply_style(Image.fromarray(rgb), style).convert('RGB'))
+                full_ms.append((time.perf_counter() - started) * 1000)
+            references.append(reference)
+        full = summarize(full_ms)
+        results.append({
+            "status": "ok",
+            "suite_case": "tiers/full",
+            "style": style,
+            "input": "image",
+            "resolution": resolution,
+            "method": "full",
+            "scale": 1.0,
+            "total": full,
+            "psnr": None,
+            "ssim": 1.0,
+            "speedup": 1.0,
+        })
+        print(f"✓ {style:14s} full          {full['median_ms']:9.1f} ms")
+
+        outputs = {}
+        for scale in scales:
+            samples = {"guided": ([], [], []), "bilinear": ([], [], [])}  # (ms, psnr, ssim)
+            for rgb, reference in zip(inputs, references):
+                for _ in range(repeat):
+                    styled, low, inference_ms = style_low_res(style_loader, rgb, style, scale)
+                    for method, (ms, _, _) in samples.items():
+                        started = time.perf_counter()
+                        outputs[method] = upsample(method, rgb, low, styled)
+                        ms.append(inference_ms + (time.perf_counter() - started) * 1000)
+                for method, (_, psnrs, ssims) in samples.items():
+                    psnrs.append(psnr(outputs[method], reference))
+                    ssims.append(ssim(outputs[method], reference))
+            for method, (ms, psnrs, ssims) in samples.items():
+                total = summarize(ms)
+                results.append({
+                    "status": "ok",
+                    "suite_case": f"tiers/{method}",
+                    "style": style,
+                    "input": "image",
+                    "resolution": resolution,
+                    "method": method,
+                    "scale": scale,
+                    "total": total,
+                    "psnr": round(float(np.mean(psnrs)), 2),
+                    "ssim": round(float(np.mean(ssims)), 4),
+                    "speedup": round(full["median_ms"] / total["median_ms"], 2),
+                })
+                print(f"✓ {style:14s} {method:8s} x{scale:4.2f} {total['median_ms']:9.1f} ms  "
+                      f"{results[-1]['speedup']:5.2f}x  PSNR {results[-1]['psnr']:6.2f} dB  "
+                      f"SSIM {results[-1]['ssim']:.4f}")
+    return results
@@ -69,3 +69,174 @@ class Config:
         "hosoda": os.path.join(MODELS_DIR, "hosoda.pth"),
         "paprika": os.path.join(MODELS_DIR, "paprika.pth"),
     }
+    
+    # Observability
+    STAGE_TIMING = os.getenv("STAGE_TIMING", "1") == "1"  # Server-Timing header + per-job stage timings
+    MAX_JOB_RECORDS = int(os.getenv("MAX_JOB_RECORDS", 200))
+    
+    # Admin endpoints (profiling) are disabled unless a token is set
+    ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+    
+    # Memory admission control
+    MEMORY_BUDGET_MB = int(os.getenv("MEMORY_BUDGET_MB", 2048))
+    MAX_QUEUED_JOBS = int(os.getenv("MAX_QUEUED_JOBS", 16))
+    QUEUE_TIMEOUT_SECONDS = float(os.getenv("QUEUE_TIMEOUT_SECONDS", 60))
+    # Scheduling lanes: OpenCV images, neural/anime images and videos each run
+    # at most this many jobs at once and queue the rest separately, so a quick
+    # image never waits behind a long video
+    LANE_CONCURRENCY = {
+        "instant": int(os.getenv("LANE_INSTANT_CONCURRENCY", 4)),
+        "model": int(os.getenv("LANE_MODEL_CONCURRENCY", 2)),
+        "video": int(os.getenv("LANE_VIDEO_CONCURRENCY", 1)),
+    }
+    LANE_MAX_QUEUED = {
+        "instant": int(os.getenv("LANE_INSTANT_MAX_QUEUED", 64)),
+        "model": int(os.getenv("LANE_MODEL_MAX_QUEUED", MAX_QUEUED_JOBS)),
+        "video": int(os.getenv("LANE_VIDEO_MAX_QUEUED", 8)),
+    }
+    # Per-client fair share: clients (an API key listed in CLIENT_WEIGHTS, else
+    # the IP address) take turns in each lane's queue in proportion to their
+    # weight, and each may use CLIENT_CPU_SECONDS of conversion time (times its
+    # weight) per CLIENT_BUDGET_WINDOW seconds; beyond that, or with
+    # CLIENT_MAX_QUEUED jobs waiting in a lane, requests get 429 + Retry-After
+    CLIENT_CPU_SECONDS = float(os.getenv("CLIENT_CPU_SECONDS", 300))  # 0: no budget
+    CLIENT_BUDGET_WINDOW = float(os.getenv("CLIENT_BUDGET_WINDOW", 600))
+    CLIENT_MAX_QUEUED = int(os.getenv("CLIENT_MAX_QUEUED", 8))
+    CLIENT_WEIGHTS = {  # "key-a=4,key-b=2"
+        key.strip(): float(weight) for key, weight in
+        (item.split("=", 1) for item in os.getenv("CLIENT_WEIGHTS", "").split(",") if "=" in item)
+    }
+    TRUST_FORWARDED_FOR = os.getenv("TRUST_FORWARDED_FOR", "0") == "1"  # behind a proxy that sets X-Forwarded-For
+    # Peak working set per inference pixel (measured on CPU, see utils/admission.py)
+    MEMORY_BYTES_PER_PIXEL = {"opencv": 80, "neural": 1200, "anime": 2400}
+    MAX_VIDEO_FRAMES = 100    # frames styled per video
+    # Long videos are sampled evenly over their duration, but never below this
+    # frame rate (then only the first MAX_VIDEO_FRAMES / VIDEO_MIN_FPS seconds are styled)
+    VIDEO_MIN_FPS = float(os.getenv("VIDEO_MIN_FPS", 8))
+    
+    # Output encoding (negotiated from the Accept header or the output_format form field)
+    DEFAULT_OUTPUT_FORMAT = "jpeg"
+    DEFAULT_ENCODER_PROFILE = "quality"  # JPEG q95, the historical default
+    ENCODER_PROFILES = {
+        "jpeg": {
+            "quality": {"quality": 95},
+            "balanced": {"quality": 85},
+            "fast": {"quality": 80, "optimize": False},
+            "small": {"quality": 70, "optimize": True, "progressive": True},
+        },
+        "webp": {
+            "quality": {"quality": 90, "method": 4},
+            "balanced": {"quality": 80, "method": 4},
+            "fast": {"quality": 80, "method": 0},
+            "small": {"quality": 70, "method": 6},
+        },
+        "png": {
+            "quality": {"compress_level": 6},
+            "balanced": {"compress_level": 3},
+            "fast": {"compress_level": 1},
+            "small": {"compress_level": 9, "optimize": True},
+        },
+    }
+    # Styles whose output is grayscale; encoded single-channel where the format allows
+    GRAYSCALE_STYLES = {"pencil_sketch", "charcoal_sketch", "rough_paper", "emboss"}
+    
+    # Torch inputs are padded up to these sides (per dimension) and the output
+    # cropped, so models only ever see a few shapes; SHAPE_BUCKETS="" disables
+    SHAPE_BUCKETS = sorted(int(side) for side in os.getenv("SHAPE_BUCKETS", "256,384,512").split(",") if side.strip())
+    MODEL_WARMUP = os.getenv("MODEL_WARMUP", "1") == "1"  # run each model once per bucket shape after loading
+    
+    # Model provisioning (download_models.py and the background loader)
+    MODEL_MANIFEST = os.path.join(MODELS_DIR, "manifest.json")  # checksums and Google Drive IDs
+    MODEL_MIRROR_URL = os.getenv("MODEL_MIRROR_URL", "")  # files fetched from {mirror}/{name} before Google Drive
+    MODEL_SOURCE_DIR = os.getenv("MODEL_SOURCE_DIR", "")  # local directory (e.g. a mounted volume) tried first
+    MODEL_DOWNLOAD_WORKERS = int(os.getenv("MODEL_DOWNLOAD_WORKERS", 4))
+    MODEL_DOWNLOAD_TIMEOUT = float(os.getenv("MODEL_DOWNLOAD_TIMEOUT", 60))  # seconds without data
+    MODEL_DOWNLOAD_RETRIES = int(os.getenv("MODEL_DOWNLOAD_RETRIES", 3))  # per source, resuming each time
+    
+    # time_budget on /api/convert (videos): the first frames are styled at full
+    # size to measure cost, then the rest at a lower scale and, if even
+    # BUDGET_MIN_SCALE is too slow, with frames dropped down to BUDGET_MIN_FPS
+    BUDGET_PROBE_FRAMES = int(os.getenv("BUDGET_PROBE_FRAMES", 3))
+    BUDGET_CHUNK_FRAMES = int(os.getenv("BUDGET_CHUNK_FRAMES", 10))
+    BUDGET_MIN_SCALE = float(os.getenv("BUDGET_MIN_SCALE", 0.25))
+    BUDGET_MIN_FPS = float(os.getenv("BUDGET_MIN_FPS", 4))
+    
+    # Fast tier (tier=fast): neural and anime styles run at FAST_TIER_SCALE of
+    # the size (a quarter of the pixels at 0.5) and are upsampled with a guided
+    # filter over GUIDED_RADIUS low-resolution pixels, led by the full-size input
+    STYLE_TIERS = ("full", "fast")
+    DEFAULT_STYLE_TIER = os.getenv("DEFAULT_STYLE_TIER", "full")
+    FAST_TIER_SCALE = float(os.getenv("FAST_TIER_SCALE", 0.5))
+    GUIDED_RADIUS = int(os.getenv("GUIDED_RADIUS", 2))
+    GUIDED_EPS = float(os.getenv("GUIDED_EPS", 1e-3))
+    
+    # GIF output: "global" (one palette for the clip, fast) or "per_frame";
+    # GIF_FRAME_DELTA writes only changed pixels (needs the global palette)
+    GIF_PALETTE = os.getenv("GIF_PALETTE", "global")
+    GIF_FRAME_DELTA = os.getenv("GIF_FRAME_DELTA", "1") == "1"
+    
+    # Threads for frame-parallel OpenCV styles on video (bilateral filters etc.)
+    OPENCV_WORKERS = int(os.getenv("OPENCV_WORKERS", os.cpu_count() or 1))
+    
+    # Progress streams (GET /api/convert/events, /api/convert/ws): previews are
+    # JPEGs with this long side, sent at most every PREVIEW_INTERVAL seconds
+    PROGRESS_INTERVAL = float(os.getenv("PROGRESS_INTERVAL", 0.1))
+    PREVIEW_INTERVAL = float(os.getenv("PREVIEW_INTERVAL", 0.5))
+    PREVIEW_SIZE = int(os.getenv("PREVIEW_SIZE", 160))
+    PREVIEW_QUALITY = int(os.getenv("PREVIEW_QUALITY", 60))
+    STREAM_KEEPALIVE_SECONDS = float(os.getenv("STREAM_KEEPALIVE_SECONDS", 15))
+    
+    # Conversions stop between frames and stages once their client disconnects
+    # (polled every DISCONNECT_POLL_SECONDS for POST /api/convert) or their job
+    # is cancelled with DELETE /api/jobs/{job_id}; a DELETE received by another
+    # worker is picked up within JOB_CANCEL_POLL_SECONDS (shared media stores)
+    CANCEL_ON_DISCONNECT = os.getenv("CANCEL_ON_DISCONNECT", "1") == "1"
+    DISCONNECT_POLL_SECONDS = float(os.getenv("DISCONNECT_POLL_SECONDS", 0.5))
+    JOB_CANCEL_POLL_SECONDS = float(os.getenv("JOB_CANCEL_POLL_SECONDS", 1.0))
+    
+    # Live webcam sessions (/api/live WebSocket): frames are styled at a long side
+    # between LIVE_MIN_SIZE and LIVE_MAX_SIZE, adapted to hold the target fps
+    LIVE_MAX_SESSIONS = int(os.getenv("LIVE_MAX_SESSIONS", 4))
+    LIVE_TARGET_FPS = float(os.getenv("LIVE_TARGET_FPS", 15))
+    LIVE_MAX_FPS = float(os.getenv("LIVE_MAX_FPS", 30))
+    LIVE_MIN_SIZE = int(os.getenv("LIVE_MIN_SIZE", 128))
+    LIVE_MAX_SIZE = int(os.getenv("LIVE_MAX_SIZE", 512))
+    LIVE_JPEG_QUALITY = int(os.getenv("LIVE_JPEG_QUALITY", 75))
+    LIVE_STATS_INTERVAL = float(os.getenv("LIVE_STATS_INTERVAL", 1.0))  # seconds between stats messages
+    
+    # Lite mode: OpenCV styles only; torch is never imported and no models are downloaded
+    LITE_MODE = os.getenv("LITE_MODE", "0") == "1"
+    
+    # Inference shards: torch styles run in separate worker processes, each
+    # loading only its group of models, and this process never imports torch.
+    # Groups are separated by ";" and list styles or families, e.g.
+    # "neural;anime" or "candy,mosaic;udnie,rain_princess;anime". Empty: in-process.
+    # The shards run once per host, started by shard_host.py or by the first API
+    # worker; every worker on the host must use the same INFERENCE_SHARD_DIR
+    # (their Unix sockets and the lock choosing that process).
+    INFERENCE_SHARDS = os.getenv("INFERENCE_SHARDS", "")
+    INFERENCE_SHARD_DIR = os.getenv("INFERENCE_SHARD_DIR", os.path.join(TEMP_DIR, "shards"))
+    INFERENCE_SHARD_TIMEOUT = float(os.getenv("INFERENCE_SHARD_TIMEOUT", 300))  # seconds per image or frame
+    INFERENCE_SHARD_THREADS = int(os.getenv("INFERENCE_SHARD_THREADS", 0))  # torch threads per shard; 0: torch default
+    
+    # Uploads: "local" (this process only), "file" (a directory shared by all
+    # workers) or "redis" (any RESP key-value server); with more than one
+    # worker or replica use file or redis so any of them can convert an upload
+    MEDIA_STORE = os.getenv("MEDIA_STORE", "local")
+    MEDIA_STORE_DIR = os.getenv("MEDIA_STORE_DIR", os.path.join(TEMP_DIR, "media"))
+    MEDIA_STORE_URL = os.getenv("MEDIA_STORE_URL", "redis://localhost:6379/0")
+    MEDIA_STORE_PREFIX = os.getenv("MEDIA_STORE_PREFIX", "style:media:")
+    MEDIA_STORE_TIMEOUT = float(os.getenv("MEDIA_STORE_TIMEOUT", 5))  # seconds per key-value request
+    
+    # Finished results served from GET /api/results/{result_id}
+    RESULTS_DIR = os.getenv("RESULTS_DIR", os.path.join(TEMP_DIR, "results"))
+    RESULT_STORE_MB = int(os.getenv("RESULT_STORE_MB", 1024))  # least recently used results evicted beyond this
+    
+    # Style cost model: milliseconds per megapixel of each style on this host,
+    # timed on a synthetic image at startup (or by `benchmark.py calibrate`)
+    # and refined from finished jobs; drives ETAs and Retry-After
+    COST_CALIBRATION = os.getenv("COST_CALIBRATION", "1") == "1"  # time styles missing from COST_MODEL_PATH at startup
+    COST_CALIBRATION_SIZE = int(os.getenv("COST_CALIBRATION_SIZE", 384))  # long side of the 4:3 calibration image
+    COST_CALIBRATION_REPEAT = int(os.getenv("COST_CALIBRATION_REPEAT", 2))  # timed runs per style; the fastest counts
+    COST_MODEL_PATH = os.getenv("COST_MODEL_PATH", os.path.join(TEMP_DIR, "cost_model.json"))
+    COST_PRIOR_MS_PER_MEGAPIXEL = {"opencv": 150, "neural": 5000, "anime": 30000}  # before any timing (CPU)
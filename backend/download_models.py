@@ -1,110 +1,64 @@
-import os
-import requests
-from pathlib import Path
-from tqdm import tqdm
+"""
+Provision the pretrained model files into pretrained/
 
-# Create pretrained directory if it doesn't exist
-MODELS_DIR = Path(__file__).parent / "pretrained"
-MODELS_DIR.mkdir(exist_ok=True)
+Usage (from the backend directory):
+    python download_models.py
+    python download_models.py --mirror https://models.example.com/style --workers 8
+    python download_models.py --source-dir /mnt/models
+    python download_models.py --write-manifest   # record checksums of the files in pretrained/
 
-# Model file IDs from Google Drive
-MODELS = {
-    "shinkai.pth": "12qjzKoC9DYkbiAAflIB1dhLf2rAE58ZG",
-    "hayao.pth": "19CyAIpRnzAlI_M-72SA_Kg8BswchgDJ4", 
-    "hosoda.pth": "1RrRLD-2vO3fG0CFE1ianJx7OX663zCXc",
-    "paprika.pth": "1UR-RVuelUmyuBIs4qdh9rrT1wwP5IjfU",
-    "candy.pth": "1GVpEZab4ULuaWFTW86bNWID7QcaEnjld",
-    "mosaic.pth": "1ja1uH-J3vc5vq-kLPTa5fREa7t7Bn5vZ",
-    "udnie.pth": "1Bb9Oaq9nGClp5_RviyxhG_bqeA0rjyHa",
-    "rain_princess.pth": "1HiQjcirwE5l7rVx68kbQUn3cgEVRjsep"
-}
+Files are fetched in parallel, resumed after interruptions and verified
+against pretrained/manifest.json before they are moved into place.
+"""
+import argparse
+import os
+import sys
+import time
 
-def download_from_gdrive(file_id, output_path):
-    """Download file from Google Drive using requests"""
-    def get_confirm_token(response):
-        for key, value in response.cookies.items():
-            if key.startswith('download_warning'):
-                return value
-        return None
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-    def save_response_content(response, destination):
-        CHUNK_SIZE = 32768
-        with open(destination, "wb") as f:
-            for chunk in response.iter_content(CHUNK_SIZE):
-                if chunk:
-                    f.write(chunk)
+from config import Config
+from utils.model_provisioning import ModelProvisioner, write_manifest
 
-    URL = "https://docs.google.com/uc?export=download"
-    
-    try:
-        print(f"  Downloading from Google Drive (ID: {file_id})...")
-        
-        session = requests.Session()
-        response = session.get(URL, params={'id': file_id}, stream=True)
-        
-        # Check for download warning (large file confirmation)
-        token = get_confirm_token(response)
-        if token:
-            params = {'id': file_id, 'confirm': token}
-            response = session.get(URL, params=params, stream=True)
-        
-        # Save the file
-        save_response_content(response, output_path)
-        
-        # Verify file was downloaded
-        if output_path.exists() and output_path.stat().st_size > 0:
-            print(f"  ✓ File size: {output_path.stat().st_size / (1024*1024):.2f} MB")
-            return True
-        else:
-            print(f"  ✗ Download failed or file is empty")
-            if output_path.exists():
-                output_path.unlink()
-            return False
-            
-    except Exception as e:
-        print(f"  ✗ Error downloading: {e}")
-        if output_path.exists():
-            output_path.unlink()
-        return False
 
-def download_all_models():
-    """Download all model files from Google Drive"""
+def download_all_models(mirror_url=None, source_dir=None, workers=None):
+    """Fetch every missing or corrupt model; returns True when all are present"""
     print("=" * 60)
-    print("Downloading model files from Google Drive...")
-    print(f"Target directory: {MODELS_DIR.absolute()}")
+    print("Provisioning model files...")
+    print(f"Target directory: {Config.MODELS_DIR}")
     print("=" * 60)
-    
-    success_count = 0
-    fail_count = 0
-    skip_count = 0
-    
-    for model_name, file_id in MODELS.items():
-        model_path = MODELS_DIR / model_name
-        
-        # Skip if already exists
-        if model_path.exists() and model_path.stat().st_size > 0:
-            print(f"\n✓ {model_name} already exists ({model_path.stat().st_size / (1024*1024):.2f} MB), skipping")
-            skip_count += 1
-            continue
-        
-        print(f"\n📥 Downloading {model_name}...")
-        if download_from_gdrive(file_id, model_path):
-            success_count += 1
-        else:
-            fail_count += 1
-    
+
+    started = time.perf_counter()
+    provisioner = ModelProvisioner(mirror_url=mirror_url, source_dir=source_dir, workers=workers)
+    results = provisioner.provision()
+
+    counts = {}
+    for result in results.values():
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+
     print("\n" + "=" * 60)
-    print(f"Download Summary:")
-    print(f"  ✓ Downloaded: {success_count}")
-    print(f"  ⊘ Skipped: {skip_count}")
-    print(f"  ✗ Failed: {fail_count}")
+    print(f"Provisioning Summary ({time.perf_counter() - started:.1f}s):")
+    print(f"  ✓ Downloaded: {counts.get('downloaded', 0)}")
+    print(f"  ⊘ Present: {counts.get('present', 0)}")
+    print(f"  ✗ Failed: {counts.get('failed', 0)}")
     print("=" * 60)
-    
-    # List all files in pretrained directory
-    print("\nFiles in pretrained directory:")
-    for file in MODELS_DIR.iterdir():
-        size_mb = file.stat().st_size / (1024*1024)
-        print(f"  - {file.name} ({size_mb:.2f} MB)")
+    return not counts.get("failed")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Download and verify the style model files")
+    parser.add_argument("--mirror", default=None, help="Base URL serving {mirror}/{filename} (default MODEL_MIRROR_URL)")
+    parser.add_argument("--source-dir", default=None, help="Directory to copy models from (default MODEL_SOURCE_DIR)")
+    parser.add_argument("--workers", type=int, default=None, help="Parallel downloads (default MODEL_DOWNLOAD_WORKERS)")
+    parser.add_argument("--write-manifest", action="store_true",
+                        help="Record size and SHA-256 of the files in pretrained/ in the manifest")
+    args = parser.parse_args(argv)
+
+    if args.write_manifest:
+        write_manifest()
+        return 0
+    return 0 if download_all_models(args.mirror, args.source_dir, args.workers) else 1
+
 
 if __name__ == "__main__":
-    download_all_models()
+    sys.exit(main())
@@ -1,9 +1,10 @@
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
-import numpy as np
 from PIL import Image
-from torchvision import transforms
+from utils.timing import stage
+from models.shape_buckets import run_warmup
+from models.tensor_io import TensorIO, fit_pixels
 
 class InstanceNormalization(nn.Module):
     def __init__(self, dim, eps=1e-9):
@@ -159,6 +160,8 @@ class CartoonGANStyler:
         self.style_name = style_name
         self.device = torch.device('cpu')  # Force CPU
         self.model = Transformer()
+        # In: [0, 255] -> [-1, 1]. Out: [-1, 1] -> [0, 255], BGR -> RGB
+        self.tensor_io = TensorIO(scale=2 / 255, offset=-1.0, out_scale=127.5, out_offset=127.5, swap_output=True)
         
         try:
             state_dict = torch.load(model_path, map_location='cpu')
@@ -166,57 +169,36 @@ class CartoonGANStyler:
             self.model.eval()
             self.model.to(self.device)
             print(f"  ✓ Loaded {style_name} CartoonGAN model")
-            
-            # Clear cache
-            import gc
-            gc.collect()
         except Exception as e:
             print(f"  ✗ Failed to load {style_name}: {e}")
             raise
     
+    def warmup(self):
+        """Run once per bucket shape so first requests skip one-time setup"""
+        return run_warmup(self.model, self.device, (-1.0, 1.0))
+    
     def stylize(self, img):
-        """Apply cartoon style with memory optimization"""
+        """Apply cartoon style to a PIL Image or HxWx3 uint8 RGB array; returns a PIL Image"""
         # Reduce size if too large
-        max_size = 512
-        original_size = img.size
-        if max(img.size) > max_size:
-            img.thumbnail((max_size, max_size), Image.LANCZOS)
-        
-        # Convert PIL to tensor [0, 1]
-        transform = transforms.ToTensor()
-        img_tensor = transform(img).unsqueeze(0).to(self.device)
+        original_size = img.size if isinstance(img, Image.Image) else (img.shape[1], img.shape[0])
+        pixels = fit_pixels(img, 512)
         
-        # Normalize to [-1, 1]
-        img_tensor = img_tensor * 2 - 1
+        with stage("preprocess"):
+            img_tensor, size = self.tensor_io.to_tensor(pixels)
         
         # Run model
-        with torch.no_grad():
-            output = self.model(img_tensor)
-        
-        # Move to CPU and process
-        output = output.cpu()[0]
-        
-        # BGR -> RGB
-        output = output[[2, 1, 0], :, :]
-        
-        # Denormalize from [-1, 1] to [0, 1]
-        output = output.float() * 0.5 + 0.5
-        output = torch.clamp(output, 0, 1)
-        
-        # Convert to numpy
-        output_np = output.permute(1, 2, 0).numpy()
-        output_np = (output_np * 255).astype(np.uint8)
+        try:
+            with stage("inference"), torch.no_grad():
+                output = self.model(img_tensor.to(self.device))
+        finally:
+            self.tensor_io.release(img_tensor)
         
-        # Create PIL Image
-        result = Image.fromarray(output_np, 'RGB')
+        with stage("postprocess"):
+            result = self.tensor_io.to_image(output.cpu(), size)
         
         # Resize back if needed
         if result.size != original_size:
-            result = result.resize(original_size, Image.LANCZOS)
-        
-        # Clear cache
-        del img_tensor, output
-        import gc
-        gc.collect()
+            with stage("resize"):
+                result = result.resize(original_size, Image.LANCZOS)
         
         return result
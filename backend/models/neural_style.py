@@ -1,8 +1,8 @@
 import torch
 import torch.nn as nn
-from torchvision import transforms
-from PIL import Image
-import numpy as np
+from utils.timing import stage
+from models.shape_buckets import run_warmup
+from models.tensor_io import TensorIO, fit_pixels
 
 class TransformerNet(nn.Module):
     def __init__(self):
@@ -86,6 +86,7 @@ class NeuralStyler:
     def __init__(self, model_path):
         self.device = torch.device('cpu')  # Force CPU to save memory
         self.model = TransformerNet()
+        self.tensor_io = TensorIO()
         
         # Load with map_location to CPU
         state_dict = torch.load(model_path, map_location='cpu')
@@ -98,41 +99,31 @@ class NeuralStyler:
         self.model.load_state_dict(state_dict, strict=False)
         self.model.eval()
         self.model.to(self.device)
-        
-        # Clear cache
-        import gc
-        gc.collect()
+    
+    def warmup(self):
+        """Run once per bucket shape so first requests skip one-time setup"""
+        return run_warmup(self.model, self.device, (0.0, 255.0))
     
     def stylize(self, img):
         """
         Apply neural style transfer
         Args:
-            img: PIL Image
+            img: PIL Image or HxWx3 uint8 RGB array (views are fine)
         Returns:
             PIL Image
         """
         # Reduce size if too large (save memory)
-        max_size = 512
-        if max(img.size) > max_size:
-            img.thumbnail((max_size, max_size), Image.LANCZOS)
-        
-        transform = transforms.Compose([
-            transforms.ToTensor(),
-            transforms.Lambda(lambda x: x.mul(255))
-        ])
-        
-        img_tensor = transform(img).unsqueeze(0).to(self.device)
-        
-        with torch.no_grad():
-            output = self.model(img_tensor)
+        pixels = fit_pixels(img, 512)
         
-        # Move to CPU immediately
-        output = output.cpu().squeeze(0).clamp(0, 255)
-        output = output.numpy().transpose(1, 2, 0).astype(np.uint8)
+        # The model takes 0..255 floats
+        with stage("preprocess"):
+            img_tensor, size = self.tensor_io.to_tensor(pixels)
         
-        # Clear cache
-        del img_tensor
-        import gc
-        gc.collect()
+        try:
+            with stage("inference"), torch.no_grad():
+                output = self.model(img_tensor.to(self.device))
+        finally:
+            self.tensor_io.release(img_tensor)
         
-        return Image.fromarray(output)
+        with stage("postprocess"):
+            return self.tensor_io.to_image(output.cpu(), size)
@@ -1,6 +1,10 @@
 import cv2
 import numpy as np
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from PIL import Image
+from config import Config
 
 class OpenCVStyler:
     @staticmethod
@@ -62,33 +66,20 @@ class OpenCVStyler:
     
     @staticmethod
     def sepia(img):
-        img_np = np.array(img).astype(np.float32)
-        sepia_filter = np.array([[0.272, 0.534, 0.131],
-                                  [0.349, 0.686, 0.168],
-                                  [0.393, 0.769, 0.189]])
-        sepia_img = cv2.transform(img_np, sepia_filter)
-        sepia_img = np.clip(sepia_img, 0, 255).astype(np.uint8)
+        img_np = np.array(img)
+        # uint8 in and out: OpenCV saturates, no float copy of the image. It
+        # rounds to nearest, so channels may be 1 above the float path's, which truncated
+        sepia_img = cv2.transform(img_np, SEPIA_FILTER)
         return Image.fromarray(sepia_img)
     
     @staticmethod
     def vintage(img):
         img_np = np.array(img)
         # Apply sepia
-        sepia_filter = np.array([[0.272, 0.534, 0.131],
-                                  [0.349, 0.686, 0.168],
-                                  [0.393, 0.769, 0.189]])
-        vintage_img = cv2.transform(img_np.astype(np.float32), sepia_filter)
-        vintage_img = np.clip(vintage_img, 0, 255).astype(np.uint8)
-        # Add vignette
+        vintage_img = cv2.transform(img_np, SEPIA_FILTER)
+        # Add vignette (rounded like the sepia step)
         rows, cols = vintage_img.shape[:2]
-        kernel_x = cv2.getGaussianKernel(cols, cols/2)
-        kernel_y = cv2.getGaussianKernel(rows, rows/2)
-        kernel = kernel_y * kernel_x.T
-        mask = kernel / kernel.max()
-        vintage_img = vintage_img.astype(np.float32)
-        for i in range(3):
-            vintage_img[:,:,i] = vintage_img[:,:,i] * mask
-        vintage_img = np.clip(vintage_img, 0, 255).astype(np.uint8)
+        vintage_img = cv2.multiply(vintage_img, vignette_mask(rows, cols), dtype=cv2.CV_8U)
         return Image.fromarray(vintage_img)
     
     @staticmethod
@@ -136,4 +127,128 @@ class OpenCVStyler:
         # Combine
         edges = cv2.cvtColor(edges, cv2.COLOR_GRAY2RGB)
         cartoon = cv2.bitwise_and(img_np, edges)
-        return Image.fromarray(cartoon)
\ No newline at end of file
+        return Image.fromarray(cartoon)
+    
+    # ---------- Batch API: T×H×W×3 uint8 frame stacks ----------
+    
+    @staticmethod
+    def apply_batch(style, frames):
+        """
+        Apply a style to a T×H×W×3 uint8 stack of frames
+        
+        Returns a T×H×W×3 stack equal to stacking the per-frame method's output
+        (grayscale styles come back with three equal channels). Per-pixel styles
+        run as a few whole-stack operations; styles built on spatial filters run
+        frame by frame on a thread pool, since OpenCV releases the GIL.
+        """
+        batch = getattr(OpenCVStyler, f"_batch_{style}", None)
+        if batch is not None:
+            return batch(frames)
+        method = getattr(OpenCVStyler, style)
+        return _map_frames(lambda frame, out: _copy_rgb(np.asarray(method(frame)), out), frames)
+    
+    @staticmethod
+    def _batch_sepia(frames):
+        return _per_pixel(frames, lambda rows: cv2.transform(rows, SEPIA_FILTER))
+    
+    @staticmethod
+    def _batch_vintage(frames):
+        mask = vignette_mask(*frames.shape[1:3])
+        sepia = OpenCVStyler._batch_sepia(frames)
+        return _map_frames(lambda frame, out: cv2.multiply(frame, mask, dst=out, dtype=cv2.CV_8U), sepia)
+    
+    @staticmethod
+    def _batch_pop_art(frames):
+        def pop_art(rows):
+            hsv = cv2.cvtColor(rows, cv2.COLOR_RGB2HSV)
+            # floor(s * 1.5), as the float path truncates
+            saturation = hsv[:, :, 1].astype(np.uint16)
+            hsv[:, :, 1] = np.minimum(saturation + saturation // 2, 255)
+            rgb = cv2.cvtColor(hsv, cv2.COLOR_HSV2RGB)
+            # Posterize: (x // 64) * 64
+            return np.bitwise_and(rgb, 0xC0, out=rgb)
+        return _per_pixel(frames, pop_art)
+    
+    @staticmethod
+    def _batch_emboss(frames):
+        gray = _gray_stack(frames)
+        kernel = np.array([[0,-1,-1],
+                          [1,0,-1],
+                          [1,1,0]])
+        # filter2D per frame so borders reflect inside each frame, not into the next
+        for frame in gray:
+            cv2.filter2D(frame, -1, kernel, dst=frame)
+        gray += 128
+        return _gray_to_rgb(gray)
+    
+    @staticmethod
+    def _batch_rough_paper(frames):
+        gray = _gray_stack(frames)
+        noise = np.random.randint(0, 50, gray.shape, dtype=np.uint8)
+        return _gray_to_rgb(cv2.add(gray, noise))
+
+
+SEPIA_FILTER = np.array([[0.272, 0.534, 0.131],
+                         [0.349, 0.686, 0.168],
+                         [0.393, 0.769, 0.189]])
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+@lru_cache(maxsize=16)
+def vignette_mask(rows, cols):
+    """Three-channel float32 Gaussian vignette, 1.0 at the centre"""
+    kernel_x = cv2.getGaussianKernel(cols, cols/2)
+    kernel_y = cv2.getGaussianKernel(rows, rows/2)
+    kernel = kernel_y * kernel_x.T
+    mask = (kernel / kernel.max()).astype(np.float32)
+    return cv2.merge([mask, mask, mask])
+
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=Config.OPENCV_WORKERS, thread_name_prefix="opencv-style")
+        return _executor
+
+
+def _rows(frames):
+    """View a T×H×W×C stack as one (T*H)×W×C image for per-pixel OpenCV calls"""
+    t, h, w = frames.shape[:3]
+    return frames.reshape((t * h, w) + frames.shape[3:])
+
+
+def _per_pixel(frames, function):
+    return function(_rows(frames)).reshape(frames.shape)
+
+
+def _gray_stack(frames):
+    return cv2.cvtColor(_rows(frames), cv2.COLOR_RGB2GRAY).reshape(frames.shape[:3])
+
+
+def _gray_to_rgb(gray):
+    return cv2.cvtColor(_rows(gray), cv2.COLOR_GRAY2RGB).reshape(gray.shape + (3,))
+
+
+def _copy_rgb(result, out):
+    if result.ndim == 2:
+        cv2.cvtColor(result, cv2.COLOR_GRAY2RGB, dst=out)
+    else:
+        out[:] = result
+
+
+def _map_frames(function, frames):
+    """Run function(frame, out) for every frame of the stack on the OpenCV thread pool"""
+    out = np.empty(frames.shape[:3] + (3,), dtype=np.uint8)
+    
+    def run(i):
+        function(frames[i], out[i])
+    
+    if Config.OPENCV_WORKERS <= 1 or len(frames) < 2:
+        for i in range(len(frames)):
+            run(i)
+    else:
+        list(_pool().map(run, range(len(frames))))
+    return out
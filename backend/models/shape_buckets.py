@@ -0,0 +1,69 @@
+from config import Config
+
+# Torch is imported inside the tensor helpers so admission control can size
+# buckets without importing it (lite mode)
+
+
+def bucket_side(length, buckets=None):
+    """Smallest bucket >= length; beyond the largest bucket, round up to a multiple of 4"""
+    buckets = Config.SHAPE_BUCKETS if buckets is None else buckets
+    for bucket in buckets:
+        if length <= bucket:
+            return bucket
+    return (length + 3) // 4 * 4
+
+
+def pad_to_bucket(tensor, buckets=None):
+    """
+    Pad an NCHW tensor on the bottom/right up to its bucket shape
+
+    Returns (padded tensor, (height, width)) so the output can be cropped back.
+    Reflection keeps the border statistics close to the image's own; it needs
+    the padding to be smaller than the side, so larger gaps replicate instead.
+    """
+    import torch.nn.functional as F
+    
+    height, width = tensor.shape[-2:]
+    if not (Config.SHAPE_BUCKETS if buckets is None else buckets):
+        return tensor, (height, width)
+    pad_h = bucket_side(height, buckets) - height
+    pad_w = bucket_side(width, buckets) - width
+    if pad_h == 0 and pad_w == 0:
+        return tensor, (height, width)
+    mode = 'reflect' if pad_h < height and pad_w < width else 'replicate'
+    return F.pad(tensor, (0, pad_w, 0, pad_h), mode=mode), (height, width)
+
+
+def crop_to(tensor, size):
+    """Undo pad_to_bucket on the model output"""
+    height, width = size
+    return tensor[..., :height, :width]
+
+
+def warmup_shapes(buckets=None):
+    """
+    (height, width) shapes run by the startup warmup
+
+    Images are thumbnailed so their long side is MAX_IMAGE_SIZE, which lands in
+    the largest bucket; warm every shape with one side in that bucket.
+    """
+    buckets = Config.SHAPE_BUCKETS if buckets is None else buckets
+    if not buckets:
+        return []
+    largest = bucket_side(Config.MAX_IMAGE_SIZE, buckets)
+    sides = sorted(set(buckets) | {largest})
+    shapes = [(largest, side) for side in sides if side <= largest]
+    shapes += [(side, largest) for side in sides if side < largest]
+    return shapes
+
+
+def run_warmup(model, device, value_range=(0.0, 1.0), buckets=None):
+    """Run the model once per warmup shape; returns the shapes run"""
+    import torch
+    
+    shapes = warmup_shapes(buckets)
+    low, high = value_range
+    with torch.no_grad():
+        for height, width in shapes:
+            model(torch.rand(1, 3, height, width, device=device) * (high - low) + low)
+    return shapes
@@ -0,0 +1,148 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+import torch
+from PIL import Image
+from config import Config
+from models.shape_buckets import bucket_side
+from utils.timing import stage
+
+
+class BufferPool:
+    """
+    Free lists of numpy buffers keyed by shape and dtype
+
+    Each request takes its own buffer, so concurrent requests never share
+    one. Only the most recently used max_shapes shapes are kept (bucketed
+    shapes repeat; unbucketed ones would otherwise pile up).
+    """
+
+    def __init__(self, per_shape=2, max_shapes=8):
+        self.per_shape = per_shape
+        self.max_shapes = max_shapes
+        self.allocations = 0
+        self._free = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, shape, dtype):
+        key = (tuple(shape), np.dtype(dtype).str)
+        with self._lock:
+            free = self._free.get(key)
+            if free:
+                return free.pop()
+            self.allocations += 1
+        return np.empty(shape, dtype=dtype)
+
+    def give(self, array):
+        key = (array.shape, array.dtype.str)
+        with self._lock:
+            free = self._free.setdefault(key, [])
+            self._free.move_to_end(key)
+            if len(free) < self.per_shape:
+                free.append(array)
+            while len(self._free) > self.max_shapes:
+                self._free.popitem(last=False)
+
+
+def pad_in_place(tensor, height, width):
+    """
+    Fill the bottom/right of an NCHW tensor from its top-left height x width
+    region, as pad_to_bucket does with F.pad (reflect, or replicate when the
+    gap is not smaller than the side)
+    """
+    full_height, full_width = tensor.shape[-2:]
+    pad_h, pad_w = full_height - height, full_width - width
+    if not pad_h and not pad_w:
+        return
+    reflect = pad_h < height and pad_w < width
+    if pad_h:
+        rows = tensor[..., height:, :width]
+        if reflect:
+            rows.copy_(tensor[..., height - 1 - pad_h:height - 1, :width].flip(-2))
+        else:
+            rows.copy_(tensor[..., height - 1:height, :width].expand_as(rows))
+    if pad_w:
+        # Full height, so the corner is padded from the padded rows
+        cols = tensor[..., width:]
+        if reflect:
+            cols.copy_(tensor[..., width - 1 - pad_w:width - 1].flip(-1))
+        else:
+            cols.copy_(tensor[..., width - 1:width].expand_as(cols))
+
+
+def fit_pixels(img, max_size):
+    """
+    HxWx3 uint8 RGB pixels of a PIL image or array, LANCZOS-thumbnailed to
+    max_size; arrays that already fit are used as they are (any strides)
+    """
+    if isinstance(img, np.ndarray):
+        if max(img.shape[:2]) <= max_size:
+            return img
+        img = Image.fromarray(np.ascontiguousarray(img))
+    if max(img.size) > max_size:
+        with stage("resize"):
+            img.thumbnail((max_size, max_size), Image.LANCZOS)
+    return np.asarray(img if img.mode == 'RGB' else img.convert('RGB'))
+
+
+class TensorIO:
+    """
+    uint8 HxWx3 pixels <-> float32 1x3xHxW model tensors through pooled buffers
+
+    to_tensor writes the pixels into a bucket-shaped buffer in one cast
+    (channel-reversed or otherwise strided views need no copy first), scales
+    to `pixels * scale + offset` and pads in place. to_image maps the model
+    output to `output * out_scale + out_offset`, clamps to 0..255 and casts
+    into a pooled uint8 buffer, optionally swapping the channel order, all in
+    place on the output tensor.
+    """
+
+    def __init__(self, scale=1.0, offset=0.0, out_scale=1.0, out_offset=0.0, swap_output=False, pool=None):
+        self.scale = scale
+        self.offset = offset
+        self.out_scale = out_scale
+        self.out_offset = out_offset
+        self.swap_output = swap_output
+        self.pool = pool or BufferPool()
+
+    def to_tensor(self, pixels, buckets=None):
+        """(1x3xHbxWb tensor over a pooled buffer, (height, width)); pass the tensor to release() when done"""
+        height, width = pixels.shape[:2]
+        if Config.SHAPE_BUCKETS if buckets is None else buckets:
+            shape = (1, 3, bucket_side(height, buckets), bucket_side(width, buckets))
+        else:
+            shape = (1, 3, height, width)
+        buffer = self.pool.take(shape, np.float32)
+        region = buffer[0, :, :height, :width]
+        np.copyto(region, pixels.transpose(2, 0, 1))
+        if self.scale != 1.0:
+            np.multiply(region, self.scale, out=region)
+        if self.offset:
+            np.add(region, self.offset, out=region)
+        tensor = torch.from_numpy(buffer)
+        pad_in_place(tensor, height, width)
+        return tensor, (height, width)
+
+    def release(self, tensor):
+        self.pool.give(tensor.numpy())
+
+    def to_image(self, output, size):
+        """RGB PIL image of the top-left `size` of a 1x3xHxW output (modified in place)"""
+        height, width = size
+        region = output[0, :, :height, :width]
+        if self.out_scale != 1.0:
+            region.mul_(self.out_scale)
+        if self.out_offset:
+            region.add_(self.out_offset)
+        region.clamp_(0, 255)
+        pixels = self.pool.take((height, width, 3), np.uint8)
+        target = torch.from_numpy(pixels).permute(2, 0, 1)
+        if self.swap_output:
+            for channel in range(3):
+                target[channel].copy_(region[2 - channel])
+        else:
+            target.copy_(region)
+        # fromarray copies RGB data, so the buffer can go straight back
+        image = Image.fromarray(pixels, 'RGB')
+        self.pool.give(pixels)
+        return image
@@ -0,0 +1,41 @@
+"""
+Run this host's inference shards in the foreground
+
+Usage (from the backend directory):
+    INFERENCE_SHARDS="neural;anime" python shard_host.py
+
+API workers started with the same INFERENCE_SHARDS and INFERENCE_SHARD_DIR
+attach to these shards instead of starting them, so restarting or scaling
+the workers never reloads the models.
+"""
+
+import signal
+import sys
+import threading
+
+from config import Config
+from utils.shards import ShardHost, parse_shards
+
+
+def main():
+    groups = parse_shards(Config.INFERENCE_SHARDS)
+    if not groups:
+        print("❌ INFERENCE_SHARDS is not set")
+        return 1
+    host = ShardHost.claim(groups, Config.INFERENCE_SHARD_DIR)
+    if host is None:
+        print(f"❌ Another process already runs the shards in {Config.INFERENCE_SHARD_DIR}")
+        return 1
+
+    stopped = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stopped.set())
+    while not stopped.wait(1):
+        pass
+    print("🛑 Stopping inference shards")
+    host.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
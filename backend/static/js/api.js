@@ -69,6 +69,64 @@ const API = {
         }
     },
     
+    // The stream of the conversion in progress, if any
+    activeStream: null,
+    
+    // Convert with progress over Server-Sent Events; resolves to the result blob.
+    // onProgress gets {stage, done, total, eta_seconds}, onPreview a low-res JPEG data URL.
+    // Closing a stream cancels its conversion on the server, so starting a new one
+    // stops the previous conversion (whose promise rejects with an AbortError).
+    convertStyleStream(mediaId, style, { onProgress, onPreview } = {}) {
+        const params = new URLSearchParams({ media_id: mediaId, style: style });
+        if (this.activeStream) this.activeStream.cancel();
+        
+        return new Promise((resolve, reject) => {
+            const events = new EventSource(`${this.BASE_URL}/api/convert/events?${params}`);
+            const stream = {
+                cancel: () => {
+                    close();
+                    reject(new DOMException('Conversion replaced by a newer one', 'AbortError'));
+                }
+            };
+            const close = () => {
+                events.close();
+                if (this.activeStream === stream) this.activeStream = null;
+            };
+            this.activeStream = stream;
+            
+            events.addEventListener('progress', (e) => {
+                if (onProgress) onProgress(JSON.parse(e.data));
+            });
+            
+            events.addEventListener('preview', (e) => {
+                if (onPreview) onPreview(JSON.parse(e.data).image);
+            });
+            
+            events.addEventListener('result', async (e) => {
+                close();
+                const result = JSON.parse(e.data);
+                try {
+                    const response = await fetch(`${this.BASE_URL}${result.url}`);
+                    if (!response.ok) throw new Error(`Could not download result (${response.status})`);
+                    resolve(await response.blob());
+                } catch (error) {
+                    reject(error);
+                }
+            });
+            
+            // Server errors carry data; connection errors do not. Either way the
+            // stream is closed so the browser does not reconnect and start over.
+            events.addEventListener('error', (e) => {
+                close();
+                if (e.data) {
+                    reject(new Error(JSON.parse(e.data).detail || 'Conversion failed'));
+                } else {
+                    reject(new Error('Lost connection to the server while processing.'));
+                }
+            });
+        });
+    },
+    
     async deleteImage(mediaId) {
         const response = await fetch(`${this.BASE_URL}/api/delete/${mediaId}`, {
             method: 'DELETE'
@@ -0,0 +1,112 @@
+class LiveStylizer {
+    constructor(camera) {
+        this.camera = camera;
+        this.socket = null;
+        this.running = false;
+        this.inFlight = 0;
+        this.lastSent = 0;
+        this.targetFps = 15;
+        this.maxInFlight = 2;    // frames on the wire; the server drops stale ones anyway
+        this.maxSide = 640;      // camera frames are scaled down before sending
+        this.canvas = document.createElement('canvas');
+        this.frameUrl = null;
+    }
+
+    init() {
+        this.output = document.getElementById('livePreview');
+        this.stats = document.getElementById('liveStats');
+    }
+
+    start(style) {
+        if (this.running) return;
+        const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+        this.socket = new WebSocket(`${protocol}//${window.location.host}/api/live`);
+        this.socket.binaryType = 'blob';
+        this.running = true;
+        this.inFlight = 0;
+
+        this.socket.onopen = () => {
+            this.socket.send(JSON.stringify({ style: style, fps: this.targetFps }));
+        };
+
+        this.socket.onmessage = (e) => {
+            if (typeof e.data === 'string') {
+                this.handleMessage(JSON.parse(e.data));
+                return;
+            }
+            this.inFlight = Math.max(0, this.inFlight - 1);
+            this.showFrame(e.data);
+        };
+
+        this.socket.onclose = () => this.stop();
+        this.socket.onerror = (e) => console.error('Live session error:', e);
+    }
+
+    handleMessage(message) {
+        if (message.type === 'ready') {
+            this.output.style.display = 'block';
+            this.loop();
+        } else if (message.type === 'stats') {
+            this.stats.textContent = `${message.side}px · ${message.frame_ms} ms/frame · ${message.dropped} dropped`;
+        } else if (message.type === 'error') {
+            console.error('Live session:', message.detail);
+            this.stats.textContent = message.detail;
+            // A rejected frame never comes back
+            this.inFlight = Math.max(0, this.inFlight - 1);
+        }
+    }
+
+    showFrame(blob) {
+        if (this.frameUrl) URL.revokeObjectURL(this.frameUrl);
+        this.frameUrl = URL.createObjectURL(blob);
+        this.output.src = this.frameUrl;
+    }
+
+    loop() {
+        if (!this.running) return;
+        const now = performance.now();
+        if (this.inFlight < this.maxInFlight && now - this.lastSent >= 1000 / this.targetFps) {
+            this.sendFrame();
+            this.lastSent = now;
+        }
+        requestAnimationFrame(() => this.loop());
+    }
+
+    sendFrame() {
+        const video = this.camera.video;
+        if (!video.videoWidth || this.socket.readyState !== WebSocket.OPEN) return;
+
+        const scale = Math.min(1, this.maxSide / Math.max(video.videoWidth, video.videoHeight));
+        this.canvas.width = Math.round(video.videoWidth * scale);
+        this.canvas.height = Math.round(video.videoHeight * scale);
+        this.canvas.getContext('2d').drawImage(video, 0, 0, this.canvas.width, this.canvas.height);
+
+        this.inFlight++;
+        this.canvas.toBlob((blob) => {
+            if (blob && this.socket && this.socket.readyState === WebSocket.OPEN) {
+                this.socket.send(blob);
+            } else {
+                this.inFlight = Math.max(0, this.inFlight - 1);
+            }
+        }, 'image/jpeg', 0.8);
+    }
+
+    setStyle(style) {
+        if (this.socket && this.socket.readyState === WebSocket.OPEN) {
+            this.socket.send(JSON.stringify({ style: style }));
+        }
+    }
+
+    stop() {
+        this.running = false;
+        if (this.socket) {
+            this.socket.onclose = null;
+            this.socket.close();
+            this.socket = null;
+        }
+        if (this.output) {
+            this.output.style.display = 'none';
+            this.stats.textContent = '';
+        }
+    }
+}
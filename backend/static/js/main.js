@@ -10,6 +10,7 @@ let isVideo = false;
 
 const camera = new CameraHandler();
 const uploader = new UploadHandler();
+const live = new LiveStylizer(camera);
 
 const styleIcons = {
     pencil_sketch: '✏️',
@@ -37,6 +38,7 @@ const styleIcons = {
 window.addEventListener('DOMContentLoaded', async () => {
     camera.init();
     uploader.init();
+    live.init();
     
     await loadStyles();
     setupEventListeners();
@@ -48,6 +50,7 @@ async function loadStyles() {
         availableStyles = data.styles;
         document.getElementById('styleCount').textContent = `${availableStyles.length} styles`;
         renderStyleGrid();
+        renderLiveStyles(data.opencv_styles);
     } catch (error) {
         console.error('Failed to load styles:', error);
     }
@@ -76,6 +79,18 @@ function renderStyleGrid() {
     });
 }
 
+function renderLiveStyles(styles) {
+    // OpenCV styles keep up with a webcam on CPU
+    const select = document.getElementById('liveStyle');
+    select.innerHTML = '';
+    styles.forEach(style => {
+        const option = document.createElement('option');
+        option.value = style;
+        option.textContent = `${styleIcons[style] || '🎨'} ${formatStyleName(style)}`;
+        select.appendChild(option);
+    });
+}
+
 function formatStyleName(style) {
     return style.split('_').map(w => w.charAt(0).toUpperCase() + w.slice(1)).join(' ');
 }
@@ -96,13 +111,27 @@ function setupEventListeners() {
     });
     
     document.getElementById('captureBtn').addEventListener('click', () => {
+        live.stop();
         camera.capture();
     });
     
     document.getElementById('closeCameraBtn').addEventListener('click', () => {
+        live.stop();
         camera.stop();
     });
     
+    document.getElementById('liveBtn').addEventListener('click', () => {
+        if (live.running) {
+            live.stop();
+        } else {
+            live.start(document.getElementById('liveStyle').value);
+        }
+    });
+    
+    document.getElementById('liveStyle').addEventListener('change', (e) => {
+        live.setStyle(e.target.value);
+    });
+    
     document.getElementById('removeBtn').addEventListener('click', removePhoto);
     document.getElementById('downloadBtn').addEventListener('click', downloadStyledMedia);
     document.getElementById('addAnotherBtn').addEventListener('click', addAnother);
@@ -198,10 +227,18 @@ async function applyStyle(styleName, cardElement) {
     
     if (isVideo) {
         document.getElementById('processingInfo').style.display = 'block';
+        document.getElementById('progressFill').style.width = '0%';
+        document.getElementById('progressText').textContent = '⏳ Processing video...';
     }
     
+    let superseded = false;
     try {
-        const blob = await API.convertStyle(currentMediaId, styleName);
+        const blob = isVideo
+            ? await API.convertStyleStream(currentMediaId, styleName, {
+                onProgress: showProgress,
+                onPreview: showPreview
+            })
+            : await API.convertStyle(currentMediaId, styleName);
         currentStyleBlob = blob;
         
         console.log('Style applied successfully, blob size:', blob.size);
@@ -211,6 +248,7 @@ async function applyStyle(styleName, cardElement) {
             const videoEl = document.getElementById('styledVideo');
             videoEl.src = url;
             videoEl.style.display = 'block';
+            document.getElementById('styledImage').style.display = 'none';
             document.getElementById('processingInfo').style.display = 'none';
         } else {
             const reader = new FileReader();
@@ -231,16 +269,51 @@ async function applyStyle(styleName, cardElement) {
         document.getElementById('addAnotherBtn').style.display = 'inline-block';
         
     } catch (error) {
+        // A newer conversion took over the preview
+        if (error.name === 'AbortError') {
+            superseded = true;
+            return;
+        }
         console.error('Style conversion error:', error);
         alert('Style conversion failed: ' + error.message);
         document.getElementById('placeholderText').style.display = 'block';
         document.getElementById('placeholderText').textContent = 'Conversion failed. Try again.';
         document.getElementById('processingInfo').style.display = 'none';
+        document.getElementById('styledImage').style.display = 'none';
     } finally {
-        document.getElementById('loader').style.display = 'none';
+        if (!superseded) document.getElementById('loader').style.display = 'none';
     }
 }
 
+const stageLabels = {
+    queued: '⏳ Waiting for a free worker...',
+    decode: '⏳ Reading video...',
+    style: '🎨 Styling frames',
+    encode: '🎬 Encoding video...'
+};
+
+function showProgress({ stage, done, total, eta_seconds }) {
+    let text = stageLabels[stage] || '⏳ Processing video...';
+    if (stage === 'style' && total) {
+        text += ` ${done}/${total}`;
+        if (eta_seconds != null) {
+            text += ` · ~${Math.ceil(eta_seconds)}s left`;
+        }
+        document.getElementById('progressFill').style.width = `${Math.round(100 * done / total)}%`;
+    } else if (stage === 'encode') {
+        document.getElementById('progressFill').style.width = '100%';
+    }
+    document.getElementById('progressText').textContent = text;
+}
+
+function showPreview(image) {
+    // Low-resolution styled frame shown until the finished video arrives
+    document.getElementById('loader').style.display = 'none';
+    const styledImg = document.getElementById('styledImage');
+    styledImg.src = image;
+    styledImg.style.display = 'block';
+}
+
 function applyIntensity() {
     if (!originalImageData || !styledImageData) return;
     
@@ -0,0 +1,295 @@
+import asyncio
+import math
+import threading
+import time
+from config import Config
+from utils import metrics
+from utils.image_processor import fit_within
+from utils.fair_share import ClientBudgets, FairQueue
+from models.shape_buckets import bucket_side
+
+MB = 1024 * 1024
+
+
+def style_family(style):
+    if style in Config.NEURAL_STYLES:
+        return "neural"
+    if style in Config.CARTOON_STYLES:
+        return "anime"
+    return "opencv"
+
+
+class MemoryEstimator:
+    """
+    Estimates a conversion's peak memory from its resolution, frame count and style
+
+    Per-pixel working sets come from Config.MEMORY_BYTES_PER_PIXEL (measured on
+    CPU: torch activations dominate for neural and anime styles).
+    """
+
+    @staticmethod
+    def estimate(style, width, height, frames=1, input_bytes=0, is_video=False):
+        family = style_family(style)
+        working_set = Config.MEMORY_BYTES_PER_PIXEL[family]
+        full_px = width * height
+        styled_w, styled_h = fit_within((width, height), Config.MAX_IMAGE_SIZE)
+        styled_px = styled_w * styled_h
+        if family != "opencv" and Config.SHAPE_BUCKETS:
+            # Torch styles run on the input padded up to its bucket shape
+            inference_px = bucket_side(styled_w) * bucket_side(styled_h)
+        else:
+            inference_px = styled_px
+
+        if not is_video:
+            # upload bytes + decoded image (JPEG draft decodes at most 2x the
+            # styled size per side) + model working set + encoded output
+            decoded_px = min(full_px, styled_px * 4)
+            return input_bytes + decoded_px * 3 + inference_px * working_set + styled_px * 6
+
+        # The sampler decodes only the frames it keeps
+        kept = min(frames, Config.MAX_VIDEO_FRAMES)
+        in_flight = 1
+        batch = 0
+        if family == "opencv":
+            # OpenCV styles run on a T×H×W×3 stack: the stack itself plus
+            # whole-stack temporaries (HSV, uint16 saturation), and one
+            # filter working set per worker thread
+            in_flight = max(1, min(kept, Config.OPENCV_WORKERS))
+            batch = kept * styled_px * 11
+        # Frames are shrunk to MAX_IMAGE_SIZE as they are decoded, so only
+        # one full-size frame is alive at a time
+        return (
+            input_bytes * 2                 # upload + temp file copy
+            + full_px * 3                   # frame being decoded
+            + kept * styled_px * 3          # decoded RGB frames
+            + kept * styled_px * 3          # styled frames awaiting encode
+            + batch                         # batch input stack and temporaries
+            + inference_px * working_set * in_flight  # frames in flight
+            + kept * styled_px // 4         # encoded output
+        )
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, message, retry_after, status_code=503):
+        super().__init__(message)
+        self.message = message
+        self.retry_after = retry_after
+        self.status_code = status_code
+
+
+# Scheduling lanes, in the order freed capacity is offered to them
+LANES = ("instant", "model", "video")
+
+
+def conversion_lane(style, is_video):
+    """Lane of a conversion: quick OpenCV images, neural and anime images, or videos"""
+    if is_video:
+        return "video"
+    return "instant" if style_family(style) == "opencv" else "model"
+
+
+class Reservation:
+    def __init__(self, nbytes, lane, seconds=None, client=None, weight=1.0, charged=0.0):
+        self.nbytes = nbytes
+        self.lane = lane
+        self.seconds = seconds
+        self.client = client
+        self.weight = weight
+        self.charged = charged  # seconds taken from the client's budget so far
+        self.started = time.monotonic()
+
+
+class Lane:
+    """One class of conversions with its own concurrency limit and fair queue"""
+
+    def __init__(self, name, concurrency, max_queued):
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.max_queued = max_queued
+        self.running = 0
+        self.waiters = FairQueue()
+
+
+class AdmissionController:
+    """
+    Schedules conversions by lane and client and tracks the memory committed to them
+
+    Each lane (see conversion_lane) runs at most Config.LANE_CONCURRENCY of
+    its jobs at once. A job starts only when its lane has a free slot and its
+    memory estimate fits in the remaining budget; otherwise it waits in its
+    lane's queue, where clients take turns in proportion to their weight
+    (FairQueue). Freed capacity is offered to the lanes in LANES order, so a
+    quick image never queues behind a long video. Jobs are rejected
+    (503 + Retry-After) when their lane's queue is full or the wait exceeds
+    the timeout, and jobs that could never fit are rejected outright (413).
+    A client that has used up its conversion-time budget (ClientBudgets) or
+    has CLIENT_MAX_QUEUED jobs waiting in the lane gets 429 + Retry-After.
+    Retry-After is the work left in the lane, from each job's expected
+    seconds (the style cost model's estimate) or recent job durations when
+    it has none.
+    """
+
+    def __init__(self, budget_bytes=None, max_queued=None, queue_timeout=None, lanes=None, client_budgets=None,
+                 client_max_queued=None):
+        self.budget_bytes = budget_bytes or Config.MEMORY_BUDGET_MB * MB
+        self.queue_timeout = Config.QUEUE_TIMEOUT_SECONDS if queue_timeout is None else queue_timeout
+        if lanes is None:
+            lanes = {name: (Config.LANE_CONCURRENCY[name], Config.LANE_MAX_QUEUED[name]) for name in LANES}
+        self.lanes = {
+            name: Lane(name, concurrency, queued if max_queued is None else max_queued)
+            for name, (concurrency, queued) in lanes.items()
+        }
+        self.client_budgets = ClientBudgets() if client_budgets is None else client_budgets
+        self.client_max_queued = Config.CLIENT_MAX_QUEUED if client_max_queued is None else client_max_queued
+        self.committed = 0
+        self.running = 0
+        self._reservations = set()
+        self._lock = threading.Lock()
+        self._avg_duration = 5.0
+        metrics.MEMORY_BUDGET.set(self.budget_bytes)
+
+    def _fits(self, lane, nbytes):
+        if lane.running >= lane.concurrency:
+            return False
+        # A lone job may always start as long as it fits the whole budget
+        return self.running == 0 or self.committed + nbytes <= self.budget_bytes
+
+    def _expected(self, seconds):
+        return self._avg_duration if seconds is None else seconds
+
+    def retry_after(self, lane):
+        """Seconds a client should wait: work left on the lane's running jobs plus its queued work"""
+        lane = self.lanes[lane] if isinstance(lane, str) else lane
+        now = time.monotonic()
+        work = sum(max(self._expected(r.seconds) - (now - r.started), 0)
+                   for r in self._reservations if r.lane is lane)
+        work += sum(self._expected(reservation.seconds) for reservation, _, _ in lane.waiters)
+        return int(min(max(math.ceil(work / lane.concurrency), 1), 120))
+
+    def _reject(self, reason, lane, message, retry_after, status_code=503):
+        metrics.ADMISSION_REJECTIONS.inc(reason=reason, lane=lane.name)
+        raise AdmissionRejected(message, retry_after, status_code)
+
+    def _check_client(self, lane, client, weight):
+        """Turn away a client over its budget or queue share (lock held)"""
+        if client is None:
+            return
+        wait = self.client_budgets.retry_after(client, weight)
+        if wait:
+            self._reject("client_budget", lane, "Conversion time limit reached, please retry later.",
+                         min(wait, 3600), 429)
+        if lane.waiters and lane.waiters.count(client) >= self.client_max_queued:
+            self._reject("client_queue", lane, "Too many conversions queued, please retry.",
+                         self.retry_after(lane), 429)
+
+    async def acquire(self, nbytes, lane, seconds=None, client=None, weight=1.0):
+        """
+        Wait for a slot in `lane` for a job of ~nbytes expected to run ~seconds
+        (None: unknown), on behalf of `client` (None: no per-client accounting)
+        """
+        lane = self.lanes[lane]
+        if nbytes > self.budget_bytes:
+            self._reject("too_large", lane,
+                         f"Job needs ~{nbytes // MB}MB, over the {self.budget_bytes // MB}MB memory budget. "
+                         f"Try a smaller file.", 0, 413)
+
+        with self._lock:
+            self._check_client(lane, client, weight)
+            reservation = Reservation(nbytes, lane, seconds, client, weight)
+            if not lane.waiters and self._fits(lane, nbytes):
+                self._charge(reservation)
+                return self._start(reservation)
+            if len(lane.waiters) >= lane.max_queued:
+                self._reject("queue_full", lane, "Server busy, please retry.", self.retry_after(lane))
+            future = asyncio.get_running_loop().create_future()
+            waiter = (reservation, future, time.monotonic())
+            lane.waiters.push(waiter, client, self._expected(seconds), weight)
+            self._charge(reservation)
+            metrics.QUEUED.inc(lane=lane.name)
+
+        try:
+            return await asyncio.wait_for(future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                if waiter in lane.waiters:
+                    lane.waiters.remove(waiter)
+                    metrics.QUEUED.dec(lane=lane.name)
+                    self._refund(reservation)
+                elif future.done() and not future.cancelled():
+                    # Admitted at the same moment the timeout fired
+                    return future.result()
+            self._reject("timeout", lane, "Server busy, please retry.", self.retry_after(lane))
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter in lane.waiters:
+                    lane.waiters.remove(waiter)
+                    metrics.QUEUED.dec(lane=lane.name)
+                    self._refund(reservation)
+                elif future.done() and not future.cancelled():
+                    self._finish(future.result())
+                    self._refund(reservation)
+                    self._admit_waiters()
+            raise
+
+    def _charge(self, reservation):
+        if reservation.client is not None:
+            reservation.charged = self._expected(reservation.seconds)
+            self.client_budgets.charge(reservation.client, reservation.charged, reservation.weight)
+
+    def _refund(self, reservation):
+        if reservation.client is not None and reservation.charged:
+            self.client_budgets.charge(reservation.client, -reservation.charged, reservation.weight)
+            reservation.charged = 0.0
+
+    def _start(self, reservation, enqueued=None):
+        lane = reservation.lane
+        self.committed += reservation.nbytes
+        self.running += 1
+        lane.running += 1
+        reservation.started = time.monotonic()
+        metrics.MEMORY_COMMITTED.set(self.committed)
+        metrics.LANE_RUNNING.set(lane.running, lane=lane.name)
+        metrics.QUEUE_WAIT.observe(0.0 if enqueued is None else reservation.started - enqueued, lane=lane.name)
+        self._reservations.add(reservation)
+        return reservation
+
+    def _finish(self, reservation):
+        lane = reservation.lane
+        self._reservations.discard(reservation)
+        self.committed -= reservation.nbytes
+        self.running -= 1
+        lane.running -= 1
+        metrics.MEMORY_COMMITTED.set(self.committed)
+        metrics.LANE_RUNNING.set(lane.running, lane=lane.name)
+
+    def release(self, reservation):
+        duration = time.monotonic() - reservation.started
+        with self._lock:
+            self._avg_duration = 0.8 * self._avg_duration + 0.2 * duration
+            if reservation.client is not None:
+                # Settle the estimate charged on admission to the measured duration
+                self.client_budgets.charge(reservation.client, duration - reservation.charged, reservation.weight)
+                metrics.CLIENT_CHARGED_SECONDS.inc(duration)
+            self._finish(reservation)
+            self._admit_waiters()
+
+    def _admit_waiters(self):
+        """Start queued jobs, lane by lane in order and fairly within a lane, while they fit (lock held)"""
+        for lane in self.lanes.values():
+            while lane.waiters and self._fits(lane, lane.waiters.peek()[0].nbytes):
+                reservation, future, enqueued = lane.waiters.pop()
+                metrics.QUEUED.dec(lane=lane.name)
+                if future.done():
+                    self._refund(reservation)
+                    continue
+                future.get_loop().call_soon_threadsafe(self._resolve, future, self._start(reservation, enqueued))
+
+    def _resolve(self, future, reservation):
+        if future.done():
+            # The waiter gave up before we could hand over the reservation
+            with self._lock:
+                self._finish(reservation)
+                self._refund(reservation)
+                self._admit_waiters()
+            return
+        future.set_result(reservation)
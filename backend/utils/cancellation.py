@@ -0,0 +1,77 @@
+import contextvars
+import threading
+
+_current_token = contextvars.ContextVar("cancel_token", default=None)
+
+
+class ConversionCancelled(Exception):
+    """A conversion stopped because it was cancelled ('disconnect' or 'delete') at `stage`"""
+
+    def __init__(self, reason, stage=None):
+        super().__init__(f"Conversion cancelled ({reason})")
+        self.reason = reason
+        self.stage = stage
+
+
+class CancelToken:
+    """
+    Cancellation flag of one conversion, settable from any thread
+
+    The worker polls it between stages and frames (check_cancelled) and
+    stops by raising ConversionCancelled. Callbacks registered with
+    on_cancel run once, when the token is cancelled (e.g. to stop waiting
+    in an admission queue).
+    """
+
+    def __init__(self):
+        self.reason = None
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self.reason is not None
+
+    def cancel(self, reason):
+        """Cancel with a reason; False when it was already cancelled"""
+        with self._lock:
+            if self.reason is not None:
+                return False
+            self.reason = reason
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+        return True
+
+    def on_cancel(self, callback):
+        """Call `callback` when cancelled (right away if it already is); returns a function that unregisters it"""
+        with self._lock:
+            if self.reason is None:
+                self._callbacks.append(callback)
+                return lambda: self._discard(callback)
+        callback()
+        return lambda: None
+
+    def _discard(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def raise_if_cancelled(self, stage=None):
+        if self.reason is not None:
+            raise ConversionCancelled(self.reason, stage)
+
+    def activate(self):
+        """Bind this token to the current context; returns a token for deactivate()"""
+        return _current_token.set(self)
+
+    @staticmethod
+    def deactivate(token):
+        _current_token.reset(token)
+
+
+def check_cancelled(stage=None):
+    """Raise ConversionCancelled if the active conversion was cancelled (no-op without a token)"""
+    token = _current_token.get()
+    if token is not None:
+        token.raise_if_cancelled(stage)
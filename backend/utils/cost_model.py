@@ -0,0 +1,165 @@
+import json
+import os
+import threading
+import time
+import cv2
+import numpy as np
+from config import Config
+from utils import metrics
+from utils.admission import style_family
+from utils.style_loader import SERVABLE
+
+KINDS = ("image", "video")
+
+# Where an estimate comes from; a video estimate may also borrow the image one
+DEFAULT, CALIBRATED, MEASURED, IMAGE = "default", "calibrated", "measured", "image"
+
+LIVE_WEIGHT = 0.3  # weight of each finished job in the running estimate
+CALIBRATION_FRAMES = 8  # OpenCV video calibration runs one batch of this many frames
+
+
+def calibration_image(size=None, seed=0):
+    """Synthetic 4:3 BGR image with a long side of `size` (smooth noise, so filters see edges)"""
+    width = size or Config.COST_CALIBRATION_SIZE
+    height = max(1, width * 3 // 4)
+    noise = np.random.default_rng(seed).integers(0, 256, (height, width, 3), dtype=np.uint8)
+    return cv2.GaussianBlur(noise, (0, 0), 3)
+
+
+class StyleCostModel:
+    """
+    Milliseconds per megapixel of each style on this host, per media kind
+
+    A style starts from its family's Config.COST_PRIOR_MS_PER_MEGAPIXEL,
+    is timed on a synthetic image by calibrate() and then follows finished
+    jobs (record(), an exponentially weighted average). Video costs are per
+    frame; until a style has its own video timings its image cost stands in.
+    Estimates survive restarts in COST_MODEL_PATH (load() / save()).
+    """
+
+    def __init__(self, path=None):
+        self.path = Config.COST_MODEL_PATH if path is None else path
+        self._entries = {}  # (style, kind) -> {"ms_per_megapixel", "samples", "source"}
+        self._lock = threading.Lock()
+
+    def _lookup(self, style, kind):
+        entry = self._entries.get((style, kind))
+        if entry is not None:
+            return entry["ms_per_megapixel"], entry["samples"], entry["source"]
+        if kind == "video" and (style, "image") in self._entries:
+            return self._entries[(style, "image")]["ms_per_megapixel"], 0, IMAGE
+        return Config.COST_PRIOR_MS_PER_MEGAPIXEL[style_family(style)], 0, DEFAULT
+
+    def ms_per_megapixel(self, style, kind="image"):
+        return self._lookup(style, kind)[0]
+
+    def estimate_seconds(self, style, kind, megapixels, frames=1):
+        """Expected styling time of `frames` frames of `megapixels` each"""
+        return self.ms_per_megapixel(style, kind) * megapixels * frames / 1000
+
+    def has(self, style, kind="image"):
+        return (style, kind) in self._entries
+
+    def record(self, style, kind, seconds, megapixels, frames=1, source=MEASURED):
+        """Fold a timed run into the estimate; calibration runs replace it"""
+        if not (seconds > 0 and megapixels > 0 and frames > 0):
+            return
+        observed = seconds * 1000 / (megapixels * frames)
+        with self._lock:
+            entry = self._entries.get((style, kind))
+            if entry is None or source != MEASURED:
+                entry = self._entries[(style, kind)] = {"ms_per_megapixel": observed, "samples": 0, "source": source}
+            else:
+                entry["ms_per_megapixel"] += LIVE_WEIGHT * (observed - entry["ms_per_megapixel"])
+                entry["source"] = MEASURED
+            entry["samples"] += 1
+            estimate = entry["ms_per_megapixel"]
+        metrics.STYLE_COST.set(estimate, style=style, kind=kind)
+
+    def calibrate(self, style_loader, styles=None, size=None, repeat=None):
+        """
+        Time each servable style on a synthetic image; returns {style: {kind: ms per megapixel}}
+
+        OpenCV styles are also timed on a batch of video frames, which they
+        style as a stack. Torch styles get one untimed run only when their
+        models were not warmed up on load.
+        """
+        repeat = max(1, Config.COST_CALIBRATION_REPEAT if repeat is None else repeat)
+        image = calibration_image(size)
+        megapixels = image.shape[0] * image.shape[1] / 1e6
+        results = {}
+        for style in Config.ALL_STYLES if styles is None else styles:
+            if style_loader.style_status(style) not in SERVABLE:
+                continue
+            opencv = style in Config.OPENCV_STYLES
+            try:
+                if opencv or not Config.MODEL_WARMUP:
+                    style_loader.apply_style(image.copy(), style)
+                samples = []
+                for _ in range(repeat):
+                    pixels = image.copy()
+                    started = time.perf_counter()
+                    style_loader.apply_style(pixels, style)
+                    samples.append(time.perf_counter() - started)
+                self.record(style, "image", min(samples), megapixels, source=CALIBRATED)
+                results[style] = {"image": round(self.ms_per_megapixel(style, "image"), 1)}
+                if opencv:
+                    frames = [image[:, :, ::-1].copy() for _ in range(CALIBRATION_FRAMES)]
+                    started = time.perf_counter()
+                    style_loader.style_frames(frames, style)
+                    self.record(style, "video", time.perf_counter() - started, megapixels, CALIBRATION_FRAMES,
+                                source=CALIBRATED)
+                    results[style]["video"] = round(self.ms_per_megapixel(style, "video"), 1)
+            except Exception as e:
+                print(f"⚠️  Could not calibrate {style}: {e}")
+                continue
+            print(f"📏 {style}: {results[style]['image']:.0f} ms/MP")
+        return results
+
+    def snapshot(self):
+        """{style: {kind: {"ms_per_megapixel", "samples", "source"}}} for every style"""
+        snapshot = {}
+        with self._lock:
+            for style in Config.ALL_STYLES:
+                snapshot[style] = {}
+                for kind in KINDS:
+                    ms, samples, source = self._lookup(style, kind)
+                    snapshot[style][kind] = {"ms_per_megapixel": round(ms, 1), "samples": samples, "source": source}
+        return snapshot
+
+    def load(self):
+        """Read saved estimates from self.path (missing or unreadable files are ignored)"""
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)["costs"]
+            entries = {
+                (style, kind): {
+                    "ms_per_megapixel": float(entry["ms_per_megapixel"]),
+                    "samples": int(entry.get("samples", 0)),
+                    "source": entry["source"],
+                }
+                for style, kinds in saved.items() if style in Config.ALL_STYLES
+                for kind, entry in kinds.items() if kind in KINDS and entry.get("source") in (CALIBRATED, MEASURED)
+            }
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            print(f"⚠️  Ignoring cost model {self.path}: {e}")
+            return 0
+        with self._lock:
+            self._entries.update(entries)
+        for (style, kind), entry in entries.items():
+            metrics.STYLE_COST.set(entry["ms_per_megapixel"], style=style, kind=kind)
+        return len(entries)
+
+    def save(self):
+        """Write the calibrated and measured estimates to self.path"""
+        with self._lock:
+            costs = {}
+            for (style, kind), entry in sorted(self._entries.items()):
+                costs.setdefault(style, {})[kind] = dict(entry, ms_per_megapixel=round(entry["ms_per_megapixel"], 3))
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"updated": time.time(), "costs": costs}, f, indent=2)
+        os.replace(tmp, self.path)
@@ -0,0 +1,143 @@
+import math
+import time
+import cv2
+import numpy as np
+from PIL import Image
+from config import Config
+from utils.timing import stage
+from utils.progress import report_total
+
+SCALE_STEP = 0.05  # inference scales are rounded down to this step
+
+# Encode seconds per output megapixel-frame; starts from values measured on
+# CPU and follows finished jobs (record_encode)
+ENCODE_SECONDS_PER_MEGAPIXEL = {"mp4": 0.015, "gif": 0.1}
+
+
+def record_encode(output_format, seconds, frames, megapixels):
+    """Fold a finished encode into the estimate used to reserve time for encoding"""
+    if frames and megapixels:
+        current = ENCODE_SECONDS_PER_MEGAPIXEL.get(output_format, seconds / (frames * megapixels))
+        ENCODE_SECONDS_PER_MEGAPIXEL[output_format] = current + 0.3 * (seconds / (frames * megapixels) - current)
+
+
+def encode_estimate(output_format, frames, megapixels):
+    return ENCODE_SECONDS_PER_MEGAPIXEL.get(output_format, 0.05) * frames * megapixels
+
+
+def plan_scale(seconds_left, frames_left, seconds_per_megapixel, megapixels):
+    """
+    Largest inference scale (per side, <= 1) at which frames_left frames of
+    `megapixels` each fit in seconds_left, assuming cost grows with pixels;
+    never below BUDGET_MIN_SCALE
+    """
+    min_scale = Config.BUDGET_MIN_SCALE
+    if frames_left <= 0:
+        return 1.0
+    full_cost = frames_left * seconds_per_megapixel * megapixels
+    if seconds_left <= 0 or full_cost <= 0:
+        return 1.0 if full_cost <= 0 else min_scale
+    scale = math.sqrt(seconds_left / full_cost)
+    scale = math.floor(scale / SCALE_STEP) * SCALE_STEP
+    return max(min_scale, min(1.0, scale))
+
+
+def plan_frame_step(seconds_left, frame_count, seconds_per_frame, fps):
+    """
+    Smallest frame step (keep every Nth frame) at which frame_count frames
+    styled at seconds_per_frame fit in seconds_left; the output frame rate
+    does not go below BUDGET_MIN_FPS
+    """
+    max_step = max(1, int(fps // Config.BUDGET_MIN_FPS)) if Config.BUDGET_MIN_FPS else frame_count
+    step = 1
+    while step < max_step and math.ceil(frame_count / step) * seconds_per_frame > seconds_left:
+        step += 1
+    return step
+
+
+def _resize(frame, size):
+    # PIL in, PIL out: style_frames treats bare arrays on the per-frame path as BGR
+    with stage("resize"):
+        return Image.fromarray(cv2.resize(np.asarray(frame), size, interpolation=cv2.INTER_AREA))
+
+
+def _upscale(frame, size):
+    frame = np.asarray(frame)
+    if (frame.shape[1], frame.shape[0]) == size:
+        return frame
+    with stage("resize"):
+        return cv2.resize(frame, size, interpolation=cv2.INTER_LINEAR)
+
+
+def style_within_budget(style_loader, frames, style, fps, deadline, budget, durations=None, output_format='mp4'):
+    """
+    Style video frames so the job finishes by `deadline` (time.monotonic())
+
+    The first BUDGET_PROBE_FRAMES frames are styled at full size to measure
+    the style's cost per megapixel. If the remaining frames would not fit even
+    at BUDGET_MIN_SCALE, every Nth frame is kept and the frame rate lowered.
+    The rest are styled in chunks; before each chunk the inference scale is
+    re-planned from the cost measured so far, and styled frames are scaled
+    back up so the output keeps its size. Time for encoding the output is
+    held back, estimated from earlier encodes of the same format.
+
+    Returns (styled RGB frames, fps, durations, settings); entries of `frames`
+    are released as they are consumed.
+    """
+    count = len(frames)
+    width, height = np.asarray(frames[0]).shape[1::-1]
+    megapixels = width * height / 1e6
+
+    # Probe: full-size frames give the starting cost estimate
+    probe_count = min(Config.BUDGET_PROBE_FRAMES, count)
+    probe_started = time.perf_counter()
+    probe = style_loader.style_frames(frames[:probe_count], style)
+    probe_seconds = time.perf_counter() - probe_started
+    seconds_per_megapixel = probe_seconds / (probe_count * megapixels)
+
+    step = plan_frame_step(
+        deadline - time.monotonic() - encode_estimate(output_format, count, megapixels), count - probe_count,
+        seconds_per_megapixel * megapixels * Config.BUDGET_MIN_SCALE ** 2, fps
+    )
+    kept = list(range(0, count, step))
+    reserve = encode_estimate(output_format, len(kept), megapixels)
+    styled = {i: probe[i] for i in range(probe_count) if i % step == 0}
+    frames[:probe_count] = [None] * probe_count
+    del probe
+
+    todo = [i for i in kept if i >= probe_count]
+    report_total(probe_count + len(todo))
+    scales = [1.0] * len(styled)
+    while todo:
+        chunk, todo = todo[:Config.BUDGET_CHUNK_FRAMES], todo[Config.BUDGET_CHUNK_FRAMES:]
+        scale = plan_scale(deadline - time.monotonic() - reserve, len(chunk) + len(todo),
+                           seconds_per_megapixel, megapixels)
+        size = (max(2, round(width * scale)), max(2, round(height * scale)))
+        inputs = [frames[i] if scale >= 1.0 else _resize(frames[i], size) for i in chunk]
+
+        chunk_started = time.perf_counter()
+        outputs = style_loader.style_frames(inputs, style)
+        chunk_seconds = time.perf_counter() - chunk_started
+
+        # Closed loop: follow the measured cost at the scale actually used
+        measured = chunk_seconds / (len(chunk) * size[0] * size[1] / 1e6)
+        seconds_per_megapixel += 0.5 * (measured - seconds_per_megapixel)
+        for i, output in zip(chunk, outputs):
+            styled[i] = _upscale(output, (width, height))
+            frames[i] = None
+        scales += [scale] * len(chunk)
+
+    if durations:
+        durations = [sum(durations[i:i + step]) for i in kept]
+    settings = {
+        "time_budget": budget,
+        "frames": len(kept),
+        "frame_step": step,
+        "fps": round(fps / step, 3),
+        "scale": round(sum(scales) / len(scales), 3),
+        "scale_min": min(scales),
+        "inference_size": [round(width * min(scales)), round(height * min(scales))],
+        "output_size": [width, height],
+        "probe_ms_per_frame": round(probe_seconds / probe_count * 1000, 1),
+    }
+    return [styled[i] for i in kept], fps / step, durations, settings
@@ -0,0 +1,133 @@
+import hashlib
+import itertools
+import math
+import threading
+import time
+from config import Config
+
+MAX_TRACKED_CLIENTS = 10000  # idle clients with a full budget are forgotten beyond this
+
+
+def client_identity(api_key, address, forwarded_for=None):
+    """
+    (client id, weight) of a request
+
+    API keys listed in Config.CLIENT_WEIGHTS identify their client (by a hash,
+    so keys are never logged); anything else is keyed by IP address, taken
+    from X-Forwarded-For only when TRUST_FORWARDED_FOR is set. Unknown keys
+    fall back to the address, so made-up keys cannot buy a fresh budget.
+    """
+    if api_key and api_key in Config.CLIENT_WEIGHTS:
+        return "key:" + hashlib.sha256(api_key.encode()).hexdigest()[:16], Config.CLIENT_WEIGHTS[api_key]
+    if forwarded_for and Config.TRUST_FORWARDED_FOR:
+        address = forwarded_for.split(",")[0].strip() or address
+    return f"ip:{address or 'unknown'}", 1.0
+
+
+class FairQueue:
+    """
+    Waiters of one lane in weighted fair order (self-clocked fair queueing)
+
+    Each waiter gets a virtual finish tag: the later of the queue's virtual
+    time and its client's previous tag, plus its expected cost divided by
+    the client's weight. The smallest tag goes first, so a client with many
+    queued jobs takes turns with everyone else instead of going ahead of them.
+    """
+
+    def __init__(self):
+        self._items = []  # [tag, seq, waiter, client]
+        self._last_tag = {}
+        self._virtual_time = 0.0
+        self._seq = itertools.count()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return (item[2] for item in self._items)
+
+    def __contains__(self, waiter):
+        return any(item[2] is waiter for item in self._items)
+
+    def count(self, client):
+        return sum(1 for item in self._items if item[3] == client)
+
+    def push(self, waiter, client=None, cost=1.0, weight=1.0):
+        tag = max(self._virtual_time, self._last_tag.get(client, 0.0)) + cost / max(weight, 1e-6)
+        self._last_tag[client] = tag
+        self._items.append([tag, next(self._seq), waiter, client])
+
+    def _first(self):
+        return min(self._items, key=lambda item: (item[0], item[1]))
+
+    def peek(self):
+        return self._first()[2]
+
+    def pop(self):
+        item = self._first()
+        self._items.remove(item)
+        self._virtual_time = item[0]
+        if not self._items:
+            self._last_tag.clear()
+        return item[2]
+
+    def remove(self, waiter):
+        self._items = [item for item in self._items if item[2] is not waiter]
+        if not self._items:
+            self._last_tag.clear()
+
+
+class ClientBudgets:
+    """
+    Per-client token buckets of conversion seconds
+
+    A client may use `capacity` seconds (times its weight), refilled evenly
+    over `window` seconds. Jobs are charged their expected seconds when they
+    are admitted to a queue and settled to their measured duration when they
+    finish. A client whose bucket is empty is turned away until it refills.
+    """
+
+    def __init__(self, capacity=None, window=None):
+        self.capacity = Config.CLIENT_CPU_SECONDS if capacity is None else capacity
+        self.window = Config.CLIENT_BUDGET_WINDOW if window is None else window
+        self._buckets = {}  # client -> [seconds left, last refill, weight]
+        self._lock = threading.Lock()
+
+    def _bucket(self, client, weight, now):
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            if len(self._buckets) >= MAX_TRACKED_CLIENTS:
+                self._forget_idle(now)
+            bucket = self._buckets[client] = [self.capacity * weight, now, weight]
+        bucket[2] = weight
+        limit = self.capacity * weight
+        bucket[0] = min(limit, bucket[0] + (now - bucket[1]) * limit / self.window)
+        bucket[1] = now
+        return bucket
+
+    def _forget_idle(self, now):
+        for client, (left, updated, weight) in list(self._buckets.items()):
+            limit = self.capacity * weight
+            if left + (now - updated) * limit / self.window >= limit:
+                del self._buckets[client]
+
+    def retry_after(self, client, weight=1.0):
+        """0 when the client may start a job, else seconds until its bucket is positive again"""
+        if not self.capacity:
+            return 0
+        with self._lock:
+            left = self._bucket(client, weight, time.monotonic())[0]
+        if left > 0:
+            return 0
+        return max(1, math.ceil(-left * self.window / (self.capacity * weight)) + 1)
+
+    def charge(self, client, seconds, weight=1.0):
+        """Take seconds from the client's bucket (negative to refund); it may go below zero"""
+        if not self.capacity:
+            return
+        with self._lock:
+            self._bucket(client, weight, time.monotonic())[0] -= seconds
+
+    def remaining(self, client, weight=1.0):
+        with self._lock:
+            return self._bucket(client, weight, time.monotonic())[0]
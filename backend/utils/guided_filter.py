@@ -0,0 +1,39 @@
+import cv2
+import numpy as np
+from config import Config
+
+
+def _box(image, radius):
+    return cv2.boxFilter(image, -1, (2 * radius + 1, 2 * radius + 1), borderType=cv2.BORDER_REFLECT)
+
+
+def guided_upsample(guide, low_guide, low_output, radius=None, eps=None):
+    """
+    Upsample a styled low-resolution RGB image to the size of `guide` (fast guided filter)
+
+    In each window of 2 * radius + 1 low-resolution pixels, every output
+    channel is fit as a linear function a * I + b of the guide's luminance,
+    regularized by eps (on 0..1 intensities). The coefficients are averaged,
+    upsampled bilinearly and applied to the full-resolution guide, so edges
+    come from the input while colors and strokes come from the styled image.
+    `low_guide` is `guide` (RGB uint8) resized to the size of `low_output`.
+    """
+    radius = Config.GUIDED_RADIUS if radius is None else radius
+    eps = Config.GUIDED_EPS if eps is None else eps
+    low = cv2.cvtColor(np.ascontiguousarray(low_guide), cv2.COLOR_RGB2GRAY).astype(np.float32) * (1 / 255)
+    styled = np.asarray(low_output, dtype=np.float32) * (1 / 255)
+
+    mean_i = _box(low, radius)
+    var_i = _box(low * low, radius) - mean_i * mean_i
+    mean_i = mean_i[:, :, None]
+    mean_p = _box(styled, radius)
+    cov_ip = _box(styled * low[:, :, None], radius) - mean_i * mean_p
+    a = cov_ip / (var_i[:, :, None] + eps)
+    b = mean_p - a * mean_i
+
+    height, width = guide.shape[:2]
+    a = cv2.resize(_box(a, radius), (width, height), interpolation=cv2.INTER_LINEAR)
+    b = cv2.resize(_box(b, radius), (width, height), interpolation=cv2.INTER_LINEAR)
+    full = cv2.cvtColor(np.ascontiguousarray(guide), cv2.COLOR_RGB2GRAY).astype(np.float32)
+    output = a * full[:, :, None] + b * 255
+    return np.clip(output + 0.5, 0, 255).astype(np.uint8)
@@ -2,26 +2,123 @@ from PIL import Image
 import io
 import numpy as np
 import cv2
+from config import Config
+from utils.timing import stage
+
+OUTPUT_MIME_TYPES = {"jpeg": "image/jpeg", "webp": "image/webp", "png": "image/png"}
+OUTPUT_EXTENSIONS = {"jpeg": "jpg", "webp": "webp", "png": "png"}
+PIL_FORMATS = {"jpeg": "JPEG", "webp": "WEBP", "png": "PNG"}
+FORMAT_ALIASES = {"jpg": "jpeg"}
+
+def fit_within(size, max_size):
+    """(width, height) scaled so the long side is at most max_size"""
+    width, height = size
+    longest = max(width, height)
+    if longest <= max_size:
+        return width, height
+    scale = max_size / longest
+    return max(int(round(width * scale)), 1), max(int(round(height * scale)), 1)
 
 class ImageProcessor:
     @staticmethod
     def load_image(image_bytes, max_size=1024):
         """Load image from bytes and return PIL Image"""
-        img = Image.open(io.BytesIO(image_bytes))
-        
-        # Convert to RGB if needed
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
+        with stage("decode"):
+            img = Image.open(io.BytesIO(image_bytes))
+            if max(img.size) > max_size:
+                # JPEG: let libjpeg decode at 1/2, 1/4 or 1/8 scale (DCT scaling)
+                # while staying at least max_size; other formats ignore the hint
+                img.draft('RGB', fit_within(img.size, max_size))
+            img.load()  # PIL decodes lazily; keep decode time out of "resize"
+            
+            # Convert to RGB if needed
+            if img.mode != 'RGB':
+                img = img.convert('RGB')
         
         # Resize if too large
         if max(img.size) > max_size:
-            img.thumbnail((max_size, max_size), Image.LANCZOS)
+            with stage("resize"):
+                img.thumbnail((max_size, max_size), Image.LANCZOS)
         
         return img
     
     @staticmethod
-    def image_to_bytes(img):
-        """Convert PIL Image to bytes"""
+    def probe(image_bytes):
+        """Return (width, height) from the image header without decoding"""
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            return img.size
+    
+    @staticmethod
+    def negotiate_format(accept=None, requested=None):
+        """
+        Pick the output format
+        
+        An explicit `requested` format wins; otherwise the highest-q supported
+        type in the Accept header, where image/* and */* cover the types not
+        listed on their own and q=0 rules a type out (ties: listed types in
+        order, then the default); otherwise the default, or the first type
+        not ruled out when the default is.
+        Raises ValueError for an unsupported requested format.
+        """
+        if requested and requested.lower() != 'auto':
+            fmt = FORMAT_ALIASES.get(requested.lower(), requested.lower())
+            if fmt not in Config.ENCODER_PROFILES:
+                raise ValueError(f"Unsupported output format: {requested}")
+            return fmt
+        
+        mime_to_format = {mime: fmt for fmt, mime in OUTPUT_MIME_TYPES.items()}
+        listed, wildcards = {}, {}
+        for part in (accept or '').split(','):
+            media, _, params = part.strip().partition(';')
+            media = media.strip().lower()
+            q = 1.0
+            for param in params.split(';'):
+                name, _, value = param.strip().partition('=')
+                if name.strip() == 'q':
+                    try:
+                        q = float(value)
+                    except ValueError:
+                        q = 0.0
+            if media in mime_to_format:
+                listed.setdefault(mime_to_format[media], q)
+            elif media in ('image/*', '*/*'):
+                wildcards.setdefault(media, q)
+        
+        def quality(fmt):
+            if fmt in listed:
+                return listed[fmt]
+            return wildcards.get('image/*', wildcards.get('*/*', 0.0))
+        
+        default = Config.DEFAULT_OUTPUT_FORMAT
+        candidates = list(listed) + [default] + [fmt for fmt in OUTPUT_MIME_TYPES if fmt != default]
+        best = max(candidates, key=quality)  # max keeps the first on ties
+        if quality(best) > 0:
+            return best
+        # Nothing acceptable: the default, unless the client ruled it out
+        return next((fmt for fmt in candidates if fmt not in listed), default)
+    
+    @staticmethod
+    def output_mime(fmt):
+        return OUTPUT_MIME_TYPES[fmt]
+    
+    @staticmethod
+    def output_extension(fmt):
+        return OUTPUT_EXTENSIONS[fmt]
+    
+    @staticmethod
+    def image_to_bytes(img, fmt=None, profile=None, grayscale=False):
+        """
+        Convert PIL Image to bytes
+        
+        Args:
+            fmt: "jpeg", "webp" or "png" (default Config.DEFAULT_OUTPUT_FORMAT)
+            profile: encoder profile name from Config.ENCODER_PROFILES
+            grayscale: encode single-channel (JPEG/PNG) when the image is gray
+        """
+        fmt = fmt or Config.DEFAULT_OUTPUT_FORMAT
+        profile = profile or Config.DEFAULT_ENCODER_PROFILE
+        options = Config.ENCODER_PROFILES[fmt][profile]
+        
         if isinstance(img, np.ndarray):
             # Convert numpy to PIL
             if len(img.shape) == 3 and img.shape[2] == 3:
@@ -29,9 +126,18 @@ class ImageProcessor:
             else:
                 img = Image.fromarray(img)
         
-        buffer = io.BytesIO()
-        img.save(buffer, format='JPEG', quality=95)
-        return buffer.getvalue()
+        with stage("encode"):
+            # WebP has no single-channel mode; JPEG and PNG store "L" natively
+            if fmt == 'webp':
+                if img.mode != 'RGB':
+                    img = img.convert('RGB')
+            elif grayscale and img.mode != 'L':
+                img = img.convert('L')
+            elif img.mode not in ('RGB', 'L'):
+                img = img.convert('RGB')
+            buffer = io.BytesIO()
+            img.save(buffer, format=PIL_FORMATS[fmt], **options)
+            return buffer.getvalue()
     
     @staticmethod
     def validate_extension(filename, allowed_extensions):
@@ -0,0 +1,215 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from config import Config
+from utils.media_store import FileMediaStore, RedisMediaStore, MediaStoreError, valid_media_id
+
+# Jobs in these states can still be cancelled
+ACTIVE = ("queued", "running")
+
+
+def valid_job_id(job_id):
+    """Client-chosen job IDs follow the upload ID rules (UUIDs)"""
+    return valid_media_id(job_id)
+
+
+class Job:
+    """Record of one conversion request"""
+
+    def __init__(self, media_id, style, media_type, job_id=None):
+        self.job_id = job_id or str(uuid.uuid4())
+        self.media_id = media_id
+        self.style = style
+        self.media_type = media_type
+        self.status = "queued"
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.timings = {}
+        self.meta = {}
+        self.cancel_token = None  # utils.cancellation.CancelToken of the run
+
+    def start(self):
+        self.status = "running"
+        self.started_at = time.time()
+
+    def finish(self, status, error=None):
+        self.status = status
+        self.error = error
+        self.finished_at = time.time()
+
+    def cancel(self, reason):
+        """Ask a queued or running job to stop (before its next frame or stage); False once it has finished"""
+        if self.status not in ACTIVE or self.cancel_token is None:
+            return False
+        self.cancel_token.cancel(reason)
+        return True
+
+    def to_dict(self):
+        return {
+            "job_id": self.job_id,
+            "media_id": self.media_id,
+            "style": self.style,
+            "media_type": self.media_type,
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "timings": self.timings,
+            "meta": self.meta,
+        }
+
+
+class SharedJobs:
+    """
+    Job records published for the other workers, in the media store backend
+
+    GET and DELETE /api/jobs/{job_id} may reach a worker that does not run
+    the job: it reads the record published here and leaves a cancel request,
+    which the worker running the job picks up (JobRegistry polls them).
+    """
+
+    def __init__(self, records, cancels):
+        self.records = records
+        self.cancels = cancels
+
+    def publish(self, job):
+        self.records.put(job.job_id, {'data': b'', **job.to_dict()})
+
+    def record(self, job_id):
+        info = self.records.get(job_id)
+        if info is None:
+            return None
+        info.pop('data', None)
+        return info
+
+    def request_cancel(self, job_id, reason):
+        self.cancels.put(job_id, {'data': b'', 'reason': reason})
+
+    def cancel_requested(self, job_id):
+        """The reason of a pending cancel request for the job, or None"""
+        info = self.cancels.get(job_id)
+        return info['reason'] if info else None
+
+    def remove(self, job_id):
+        self.records.delete(job_id)
+        self.cancels.delete(job_id)
+
+
+def create_shared_jobs(backend=None):
+    """SharedJobs next to the uploads of MEDIA_STORE, or None for the local (single worker) store"""
+    backend = (backend or Config.MEDIA_STORE).lower()
+    if backend == "file":
+        return SharedJobs(FileMediaStore(os.path.join(Config.MEDIA_STORE_DIR, "jobs")),
+                          FileMediaStore(os.path.join(Config.MEDIA_STORE_DIR, "job-cancels")))
+    if backend == "redis":
+        records = RedisMediaStore(prefix=f"{Config.MEDIA_STORE_PREFIX}jobs:")
+        return SharedJobs(records, RedisMediaStore(prefix=f"{Config.MEDIA_STORE_PREFIX}job-cancels:",
+                                                   client=records.client))
+    return None
+
+
+class JobRegistry:
+    """
+    Bounded in-memory store of recent jobs (oldest finished jobs are evicted first)
+
+    With `shared` (SharedJobs), every job is also published for the other
+    workers, and their cancel requests for this worker's jobs are polled
+    every JOB_CANCEL_POLL_SECONDS.
+    """
+
+    def __init__(self, max_jobs=None, shared=None):
+        self.max_jobs = max_jobs or Config.MAX_JOB_RECORDS
+        self.shared = shared
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._poller = None
+
+    def create(self, media_id, style, media_type, job_id=None, cancel_token=None):
+        """
+        Register a queued job, cancelled through `cancel_token`; ValueError
+        when `job_id` is already in use
+        """
+        job = Job(media_id, style, media_type, job_id)
+        job.cancel_token = cancel_token
+        if job_id is not None and self.shared is not None and self.shared.record(job_id) is not None:
+            raise ValueError(f"Job ID already in use: {job_id}")
+        with self._lock:
+            if job.job_id in self._jobs:
+                raise ValueError(f"Job ID already in use: {job.job_id}")
+            self._jobs[job.job_id] = job
+            self._evict()
+            if self.shared is not None and self._poller is None:
+                self._poller = threading.Thread(target=self._poll_cancels, name="job-cancels", daemon=True)
+                self._poller.start()
+        self.update(job)
+        return job
+
+    def update(self, job):
+        """Publish the job's current state to the other workers"""
+        if self.shared is None:
+            return
+        try:
+            self.shared.publish(job)
+        except MediaStoreError as e:
+            print(f"⚠️  Could not publish job {job.job_id}: {e}")
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def lookup(self, job_id):
+        """Record (dict) of a job run by this or another worker, or None"""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        if self.shared is None or not valid_job_id(job_id):
+            return None
+        return self.shared.record(job_id)
+
+    def cancel(self, job_id, reason):
+        """
+        Cancel a queued or running job of any worker; returns its record, with
+        'cancelling' True when the request was made (None: unknown job)
+        """
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return {**job.to_dict(), "cancelling": job.cancel(reason)}
+        record = self.lookup(job_id)
+        if record is None:
+            return None
+        cancelling = record["status"] in ACTIVE
+        if cancelling:
+            self.shared.request_cancel(job_id, reason)
+        return {**record, "cancelling": cancelling}
+
+    def _poll_cancels(self):
+        while True:
+            time.sleep(Config.JOB_CANCEL_POLL_SECONDS)
+            with self._lock:
+                active = [job for job in self._jobs.values() if job.status in ACTIVE]
+            for job in active:
+                try:
+                    reason = self.shared.cancel_requested(job.job_id)
+                except MediaStoreError:
+                    continue
+                if reason:
+                    job.cancel(reason)
+
+    def _evict(self):
+        excess = len(self._jobs) - self.max_jobs
+        if excess <= 0:
+            return
+        for job_id in [jid for jid, job in self._jobs.items() if job.status not in ACTIVE][:excess]:
+            del self._jobs[job_id]
+            if self.shared is not None:
+                try:
+                    self.shared.remove(job_id)
+                except MediaStoreError:
+                    pass
+
+    def __len__(self):
+        return len(self._jobs)
@@ -0,0 +1,179 @@
+import math
+import time
+import cv2
+import numpy as np
+from config import Config
+from utils import metrics
+from utils.admission import MemoryEstimator, style_family
+
+SIDE_STEP = 16  # OpenCV sides are rounded to this
+
+# IMREAD_REDUCED_* decode JPEGs at 1/2, 1/4 or 1/8 scale in the IDCT
+REDUCED_DECODE = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+
+class LiveFrameError(Exception):
+    pass
+
+
+class LiveSession:
+    """
+    One live webcam stream (the /api/live WebSocket)
+
+    The styler is resolved once per style. Frames arrive as JPEG and are
+    decoded straight to BGR, at a reduced scale when the camera frame is much
+    larger than the inference size. They are resized into a reused buffer and
+    handed to the OpenCV method, whose output is encoded as JPEG without a
+    PIL round trip. Torch styles go through apply_style.
+
+    The inference size (long side) follows the measured frame time: it shrinks
+    when styling one frame takes longer than 1 / target_fps and grows back
+    when there is headroom. Torch styles snap to SHAPE_BUCKETS, the shapes
+    their models are warmed on.
+    """
+
+    def __init__(self, style_loader, style, target_fps=None, max_side=None):
+        self.style_loader = style_loader
+        self.target_fps = Config.LIVE_TARGET_FPS
+        self.max_side = Config.LIVE_MAX_SIZE
+        self.side = None
+        self.configure(style, target_fps, max_side)
+        self.source_size = None
+        self.styled = 0
+        self.dropped = 0
+        self.failed = 0
+        self._buffers = {}
+
+    def configure(self, style=None, target_fps=None, max_side=None):
+        """Change style, frame rate or size cap mid-stream"""
+        if style is not None:
+            style = style.lower()
+            if style not in Config.ALL_STYLES:
+                raise ValueError(f"Invalid style: {style}")
+            self.style = style
+            self.family = style_family(style)
+            self._method = getattr(self.style_loader.opencv_styler, style) if self.family == "opencv" else None
+        if target_fps is not None:
+            if not target_fps > 0:
+                raise ValueError("fps must be positive")
+            self.target_fps = min(float(target_fps), Config.LIVE_MAX_FPS)
+        if max_side is not None:
+            self.max_side = max(Config.LIVE_MIN_SIZE, min(int(max_side), Config.LIVE_MAX_SIZE))
+        self.side = self._snap(min(self.side or self.max_side, self.max_side))
+        self.frame_seconds = None  # EWMA of the frame time at the current side
+
+    # ---- sizing ----
+
+    def _snap(self, side):
+        """Valid inference side <= `side`"""
+        if self.family != "opencv" and Config.SHAPE_BUCKETS:
+            fitting = [bucket for bucket in Config.SHAPE_BUCKETS if bucket <= side]
+            return fitting[-1] if fitting else Config.SHAPE_BUCKETS[0]
+        side = int(side) // SIDE_STEP * SIDE_STEP
+        return max(Config.LIVE_MIN_SIZE, min(side, self.max_side))
+
+    def _adapt(self, seconds):
+        """Fold one frame time into the estimate and re-plan the inference side"""
+        if self.frame_seconds is None:
+            self.frame_seconds = seconds
+        else:
+            self.frame_seconds += 0.3 * (seconds - self.frame_seconds)
+
+        budget = 1.0 / self.target_fps
+        if self.frame_seconds > budget:
+            # Cost grows with pixels: shrink the side by the square root
+            wanted = self.side * max(0.7, math.sqrt(budget / self.frame_seconds))
+        elif self.frame_seconds < 0.6 * budget and self.side < self.max_side:
+            wanted = self.side * min(1.25, math.sqrt(0.8 * budget / self.frame_seconds))
+            if self.family != "opencv":
+                # Buckets are coarse; step up one bucket at a time
+                larger = [bucket for bucket in Config.SHAPE_BUCKETS if bucket > self.side]
+                wanted = larger[0] if larger and wanted >= self.side * 1.1 else self.side
+        else:
+            return
+
+        side = self._snap(wanted)
+        if side != self.side:
+            self.frame_seconds *= (side / self.side) ** 2
+            self.side = side
+
+    # ---- per frame ----
+
+    def _decode(self, data):
+        """BGR frame, decoded at a reduced scale when that still covers the inference side"""
+        buffer = np.frombuffer(data, dtype=np.uint8)
+        flags = cv2.IMREAD_COLOR
+        if self.source_size:
+            for factor, reduced in REDUCED_DECODE:
+                if max(self.source_size) // factor >= self.side:
+                    flags = reduced
+                    break
+        frame = cv2.imdecode(buffer, flags)
+        if frame is None:
+            raise LiveFrameError("Frame is not a decodable image")
+        if flags == cv2.IMREAD_COLOR:
+            self.source_size = frame.shape[1::-1]
+        return frame
+
+    def _resize(self, frame):
+        height, width = frame.shape[:2]
+        scale = self.side / max(height, width)
+        if scale >= 1.0:
+            return frame
+        size = (max(2, round(width * scale)), max(2, round(height * scale)))
+        out = self._buffers.get(size)
+        if out is None:
+            # One buffer per size; sizes only change when the side is re-planned
+            self._buffers = {size: np.empty((size[1], size[0], 3), dtype=np.uint8)}
+            out = self._buffers[size]
+        return cv2.resize(frame, size, dst=out, interpolation=cv2.INTER_AREA)
+
+    def _style(self, frame):
+        """BGR (or grayscale) frame ready for imencode"""
+        if self._method is not None:
+            # As in apply_style, the method's output on a BGR frame is read as RGB
+            styled = np.asarray(self._method(frame))
+        else:
+            styled = np.asarray(self.style_loader.apply_style(frame, self.style).convert('RGB'))
+        return styled if styled.ndim == 2 else cv2.cvtColor(styled, cv2.COLOR_RGB2BGR)
+
+    def process(self, data):
+        """Style one JPEG (or PNG) frame; returns JPEG bytes"""
+        started = time.perf_counter()
+        try:
+            frame = self._resize(self._decode(data))
+            styled = self._style(frame)
+            ok, encoded = cv2.imencode(".jpg", styled, [cv2.IMWRITE_JPEG_QUALITY, Config.LIVE_JPEG_QUALITY])
+            if not ok:
+                raise LiveFrameError("Could not encode the styled frame")
+        except Exception:
+            self.failed += 1
+            metrics.LIVE_FRAMES.inc(style=self.style, result="failed")
+            raise
+        seconds = time.perf_counter() - started
+        self.styled += 1
+        metrics.LIVE_FRAMES.inc(style=self.style, result="styled")
+        metrics.LIVE_FRAME_SECONDS.observe(seconds, style=self.style)
+        self._adapt(seconds)
+        return encoded.tobytes()
+
+    def memory_estimate(self, nbytes):
+        """Peak memory of styling one frame of `nbytes`, for admission"""
+        width, height = self.source_size or (self.max_side, self.max_side)
+        return MemoryEstimator.estimate(self.style, width, height, input_bytes=nbytes)
+
+    def drop(self):
+        """A frame was replaced by a newer one, or turned away by admission, before it was styled"""
+        self.dropped += 1
+        metrics.LIVE_FRAMES.inc(style=self.style, result="dropped")
+
+    def stats(self):
+        return {
+            "style": self.style,
+            "side": self.side,
+            "target_fps": self.target_fps,
+            "frame_ms": round(self.frame_seconds * 1000, 1) if self.frame_seconds is not None else None,
+            "styled": self.styled,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
@@ -0,0 +1,344 @@
+import json
+import os
+import re
+import socket
+import threading
+from urllib.parse import urlparse, unquote
+from config import Config
+
+# Upload IDs are UUIDs; anything else is never stored (and never becomes a path)
+MEDIA_ID_PATTERN = re.compile(r"[0-9a-fA-F-]{1,64}")
+
+
+class MediaStoreError(Exception):
+    """The store could not be reached or answered with an error"""
+    pass
+
+
+def valid_media_id(media_id):
+    return isinstance(media_id, str) and MEDIA_ID_PATTERN.fullmatch(media_id) is not None
+
+
+def split_media(info):
+    """(JSON metadata, upload bytes) of a media record"""
+    meta = {key: value for key, value in info.items() if key != 'data'}
+    return json.dumps(meta).encode(), info['data']
+
+
+def join_media(meta, data):
+    return {**json.loads(meta), 'data': data}
+
+
+class LocalMediaStore:
+    """Uploads in a dict of this process (a single worker)"""
+
+    def __init__(self):
+        self._media = {}
+
+    def put(self, media_id, info):
+        self._media[media_id] = info
+
+    def get(self, media_id):
+        return self._media.get(media_id)
+
+    def delete(self, media_id):
+        return self._media.pop(media_id, None) is not None
+
+    def total_bytes(self):
+        return sum(len(info['data']) for info in list(self._media.values()))
+
+    def __len__(self):
+        return len(self._media)
+
+
+class FileMediaStore:
+    """
+    Uploads as files in a directory shared by every worker (e.g. an NFS or
+    volume mount)
+
+    Each upload is `<id>.bin` plus a `<id>.json` metadata file. Both are
+    written to a temporary name and renamed, the metadata last, so another
+    process sees either the whole upload or none of it.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or Config.MEDIA_STORE_DIR
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _paths(self, media_id):
+        base = os.path.join(self.directory, media_id)
+        return f"{base}.json", f"{base}.bin"
+
+    def _write(self, path, data):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def put(self, media_id, info):
+        if not valid_media_id(media_id):
+            raise MediaStoreError(f"Invalid media ID: {media_id}")
+        meta_path, data_path = self._paths(media_id)
+        meta, data = split_media(info)
+        self._write(data_path, data)
+        self._write(meta_path, meta)
+
+    def get(self, media_id):
+        if not valid_media_id(media_id):
+            return None
+        meta_path, data_path = self._paths(media_id)
+        try:
+            with open(meta_path, 'rb') as f:
+                meta = f.read()
+            with open(data_path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        return join_media(meta, data)
+
+    def delete(self, media_id):
+        if not valid_media_id(media_id):
+            return False
+        deleted = False
+        for path in self._paths(media_id):
+            try:
+                os.unlink(path)
+                deleted = True
+            except FileNotFoundError:
+                pass
+        return deleted
+
+    def _entries(self, suffix):
+        try:
+            return [entry for entry in os.scandir(self.directory) if entry.name.endswith(suffix)]
+        except FileNotFoundError:
+            return []
+
+    def total_bytes(self):
+        total = 0
+        for entry in self._entries('.bin'):
+            try:
+                total += entry.stat().st_size
+            except FileNotFoundError:
+                pass
+        return total
+
+    def __len__(self):
+        return len(self._entries('.json'))
+
+
+# ---- RESP (Redis serialization protocol) ----
+
+class RespError(Exception):
+    """Error reply from the server"""
+    pass
+
+
+def encode_command(args):
+    parts = [f"*{len(args)}\r\n".encode()]
+    for arg in args:
+        if isinstance(arg, str):
+            arg = arg.encode()
+        elif isinstance(arg, int):
+            arg = str(arg).encode()
+        parts.append(b"$%d\r\n" % len(arg))
+        parts.append(arg)
+        parts.append(b"\r\n")
+    return b"".join(parts)
+
+
+def read_reply(stream):
+    """Read one RESP2 reply; error replies are returned as RespError, not raised"""
+    line = stream.readline()
+    if not line.endswith(b"\r\n"):
+        raise ConnectionError("Connection closed by the key-value server")
+    kind, value = line[:1], line[1:-2]
+    if kind == b"+":
+        return value.decode()
+    if kind == b"-":
+        return RespError(value.decode())
+    if kind == b":":
+        return int(value)
+    if kind == b"$":
+        length = int(value)
+        if length < 0:
+            return None
+        data = stream.read(length + 2)
+        if len(data) != length + 2:
+            raise ConnectionError("Connection closed by the key-value server")
+        return data[:-2]
+    if kind == b"*":
+        count = int(value)
+        return None if count < 0 else [read_reply(stream) for _ in range(count)]
+    raise ConnectionError(f"Unexpected reply from the key-value server: {line[:32]!r}")
+
+
+class _Connection:
+    def __init__(self, host, port, timeout):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.stream = self.sock.makefile('rb')
+
+    def close(self):
+        for closeable in (self.stream, self.sock):
+            try:
+                closeable.close()
+            except OSError:
+                pass
+
+
+class RespClient:
+    """
+    Minimal pooled client for servers speaking RESP2 (Redis, Valkey, KeyDB)
+
+    `pipeline` sends several commands in one write and reads their replies in
+    order, so a multi-command operation costs one round trip. A pooled
+    connection that turns out to be dead (server restart, idle timeout) is
+    replaced and the commands are sent once more.
+    """
+
+    def __init__(self, url, timeout=None, max_idle=8):
+        parsed = urlparse(url)
+        if parsed.scheme not in ("redis", "tcp"):
+            raise ValueError(f"Unsupported key-value URL: {url}")
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.username = unquote(parsed.username) if parsed.username else None
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.strip("/") or 0)
+        self.timeout = timeout or Config.MEDIA_STORE_TIMEOUT
+        self.max_idle = max_idle
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        connection = _Connection(self.host, self.port, self.timeout)
+        setup = []
+        if self.password:
+            setup.append(("AUTH", self.username, self.password) if self.username else ("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        if setup:
+            connection.sock.sendall(b"".join(encode_command(command) for command in setup))
+            for reply in [read_reply(connection.stream) for _ in setup]:
+                if isinstance(reply, RespError):
+                    connection.close()
+                    raise MediaStoreError(f"Key-value server refused the connection: {reply}")
+        return connection
+
+    def _acquire(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return self._connect(), False
+
+    def _release(self, connection):
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(connection)
+                return
+        connection.close()
+
+    def pipeline(self, commands):
+        """Run commands in one round trip; returns their replies, raising on an error reply"""
+        payload = b"".join(encode_command(command) for command in commands)
+        for attempt in range(2):
+            try:
+                connection, pooled = self._acquire()
+            except OSError as e:
+                raise MediaStoreError(f"Key-value server unreachable at {self.host}:{self.port}: {e}")
+            try:
+                connection.sock.sendall(payload)
+                replies = [read_reply(connection.stream) for _ in commands]
+            except (OSError, ConnectionError) as e:
+                connection.close()
+                if pooled and attempt == 0:
+                    continue
+                raise MediaStoreError(f"Key-value server connection failed: {e}")
+            self._release(connection)
+            for reply in replies:
+                if isinstance(reply, RespError):
+                    raise MediaStoreError(f"Key-value server error: {reply}")
+            return replies
+
+    def execute(self, *args):
+        return self.pipeline([args])[0]
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+
+class RedisMediaStore:
+    """
+    Uploads in a network key-value server speaking RESP (Redis, Valkey, KeyDB)
+
+    Each upload is one hash `<prefix><id>` with `meta` (JSON) and `data`
+    fields, written with a single HSET so readers never see half an upload.
+    A set of IDs and a byte counter back the media store metrics without
+    scanning the keyspace.
+    """
+
+    def __init__(self, url=None, prefix=None, client=None):
+        self.client = client or RespClient(url or Config.MEDIA_STORE_URL)
+        self.prefix = Config.MEDIA_STORE_PREFIX if prefix is None else prefix
+
+    def _key(self, media_id):
+        return f"{self.prefix}{media_id}"
+
+    def put(self, media_id, info):
+        if not valid_media_id(media_id):
+            raise MediaStoreError(f"Invalid media ID: {media_id}")
+        meta, data = split_media(info)
+        key = self._key(media_id)
+        self.client.pipeline([
+            ("HSET", key, "meta", meta, "data", data),
+            ("SADD", f"{self.prefix}index", media_id),
+            ("INCRBY", f"{self.prefix}bytes", len(data)),
+        ])
+
+    def get(self, media_id):
+        if not valid_media_id(media_id):
+            return None
+        meta, data = self.client.execute("HMGET", self._key(media_id), "meta", "data")
+        if meta is None or data is None:
+            return None
+        return join_media(meta, data)
+
+    def delete(self, media_id):
+        if not valid_media_id(media_id):
+            return False
+        key = self._key(media_id)
+        size, deleted, _ = self.client.pipeline([
+            ("HSTRLEN", key, "data"),
+            ("DEL", key),
+            ("SREM", f"{self.prefix}index", media_id),
+        ])
+        if deleted:
+            # Only the delete that removed the hash adjusts the counter
+            self.client.execute("DECRBY", f"{self.prefix}bytes", size)
+        return bool(deleted)
+
+    def total_bytes(self):
+        value = self.client.execute("GET", f"{self.prefix}bytes")
+        return int(value) if value else 0
+
+    def __len__(self):
+        return self.client.execute("SCARD", f"{self.prefix}index")
+
+
+MEDIA_STORES = {
+    "local": LocalMediaStore,
+    "file": FileMediaStore,
+    "redis": RedisMediaStore,
+}
+
+
+def create_media_store(backend=None):
+    """The media store selected by MEDIA_STORE"""
+    backend = (backend or Config.MEDIA_STORE).lower()
+    if backend not in MEDIA_STORES:
+        raise ValueError(f"Unknown MEDIA_STORE: {backend} (expected one of {', '.join(MEDIA_STORES)})")
+    return MEDIA_STORES[backend]()
@@ -0,0 +1,277 @@
+import os
+import threading
+import time
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+FPS_BUCKETS = (0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+LIVE_FRAME_BUCKETS = (0.005, 0.01, 0.02, 0.033, 0.05, 0.1, 0.25, 0.5, 1.0)
+QUEUE_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = []
+    for name, value in pairs:
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        escaped.append(f'{name}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self):
+        lines = self.header()
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+        self._function = None
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount=1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount=1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function):
+        """Compute the (unlabelled) value at scrape time"""
+        self._function = function
+
+    def value(self, **labels):
+        if self._function is not None:
+            return float(self._function())
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self):
+        lines = self.header()
+        if self._function is not None:
+            try:
+                lines.append(f"{self.name} {_format_value(self._function())}")
+            except Exception as e:
+                print(f"⚠️  Metric {self.name} failed: {e}")
+            return lines
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series = {}
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        lines = self.header()
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series["counts"]):
+                    cumulative += count
+                    labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(series['sum'])}")
+                lines.append(f"{self.name}_count{labels} {series['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def process_rss_bytes(pid="self"):
+    """Resident set size of this process (or of `pid`, Linux only) in bytes"""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        if pid != "self":
+            return 0
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is kilobytes on Linux and bytes on macOS; this is the peak, not current
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+registry = MetricsRegistry()
+
+CONVERSIONS_TOTAL = registry.counter(
+    "style_conversions_total", "Finished conversions by outcome", ("style", "media_type", "status"))
+CONVERSIONS_CANCELLED = registry.counter(
+    "style_conversions_cancelled_total",
+    "Conversions cancelled by reason (disconnect, delete) and the stage they stopped at", ("reason", "stage"))
+CANCELLED_WORK_AVOIDED = registry.counter(
+    "style_cancelled_work_avoided_seconds_total",
+    "Estimated styling and encoding seconds not spent because conversions were cancelled", ("reason",))
+CONVERSION_LATENCY = registry.histogram(
+    "style_conversion_duration_seconds", "End-to-end conversion latency", ("style", "media_type"))
+VIDEO_FPS = registry.histogram(
+    "style_video_frames_per_second", "Styled frames per second of wall time for video jobs", ("style",), FPS_BUCKETS)
+VIDEO_FRAMES_TOTAL = registry.counter(
+    "style_video_frames_total", "Video frames styled", ("style",))
+VIDEO_DECODE_FRAMES = registry.counter(
+    "style_video_decode_frames_total",
+    "Source video frames by sampler action (retrieved, grabbed, seeked over)", ("action",))
+IN_FLIGHT = registry.gauge(
+    "style_conversions_in_flight", "Conversions currently running")
+QUEUED = registry.gauge(
+    "style_conversions_queued", "Conversions waiting to start per scheduling lane", ("lane",))
+CLIENT_CHARGED_SECONDS = registry.counter(
+    "style_client_charged_seconds_total", "Conversion seconds charged to client budgets")
+LANE_RUNNING = registry.gauge(
+    "style_lane_running", "Conversions running per scheduling lane", ("lane",))
+QUEUE_WAIT = registry.histogram(
+    "style_queue_wait_seconds", "Time conversions waited for a slot in their lane", ("lane",), QUEUE_WAIT_BUCKETS)
+PROGRESS_STREAMS = registry.gauge(
+    "style_progress_streams", "Open progress streams (SSE and WebSocket)")
+PROGRESS_PREVIEWS = registry.counter(
+    "style_progress_previews_total", "Low-resolution previews sent on progress streams")
+LIVE_SESSIONS = registry.gauge(
+    "style_live_sessions", "Open live webcam sessions")
+LIVE_FRAMES = registry.counter(
+    "style_live_frames_total", "Live webcam frames by outcome (styled, dropped as stale, failed)", ("style", "result"))
+LIVE_FRAME_SECONDS = registry.histogram(
+    "style_live_frame_seconds", "Time to decode, style and encode one live frame", ("style",), LIVE_FRAME_BUCKETS)
+MEDIA_STORE_BYTES = registry.gauge(
+    "media_store_bytes", "Bytes held by the media store")
+MEDIA_STORE_ENTRIES = registry.gauge(
+    "media_store_entries", "Uploads held by the media store")
+RESULT_STORE_BYTES = registry.gauge(
+    "result_store_bytes", "Bytes held by the result store")
+RESULT_STORE_ENTRIES = registry.gauge(
+    "result_store_entries", "Results held by the result store")
+RESULT_CACHE_HITS = registry.counter(
+    "style_result_cache_hits_total", "Conversions answered from a stored result", ("style", "media_type"))
+MEMORY_BUDGET = registry.gauge(
+    "style_memory_budget_bytes", "Memory budget for running conversions")
+MEMORY_COMMITTED = registry.gauge(
+    "style_memory_committed_bytes", "Estimated memory committed to running conversions")
+ADMISSION_REJECTIONS = registry.counter(
+    "style_admission_rejections_total", "Conversions rejected by admission control", ("reason", "lane"))
+STYLE_FAMILY_READY = registry.gauge(
+    "style_family_ready", "1 when a style family's models are loaded", ("family",))
+MODEL_LOAD_SECONDS = registry.gauge(
+    "style_model_load_seconds", "Time taken to load each model", ("style", "family"))
+MODEL_WARMUP_SECONDS = registry.gauge(
+    "style_model_warmup_seconds", "Time taken to warm each model on the bucket shapes", ("style", "family"))
+STYLE_COST = registry.gauge(
+    "style_cost_ms_per_megapixel", "Estimated styling cost of each style per megapixel (per frame for video)",
+    ("style", "kind"))
+INFERENCE_SHARD_UP = registry.gauge(
+    "style_inference_shard_up", "1 while an inference shard process is serving", ("shard",))
+INFERENCE_SHARD_RSS = registry.gauge(
+    "style_inference_shard_resident_memory_bytes", "Resident memory of each inference shard process", ("shard",))
+INFERENCE_SHARD_REQUESTS = registry.counter(
+    "style_inference_shard_requests_total", "Images and frames sent to inference shards by outcome", ("shard", "result"))
+INFERENCE_SHARD_SECONDS = registry.histogram(
+    "style_inference_shard_seconds", "Round trip of one image or frame through an inference shard", ("shard",))
+INFERENCE_SHARD_RESTARTS = registry.counter(
+    "style_inference_shard_restarts_total", "Inference shard processes restarted after dying or timing out", ("shard",))
+PROCESS_RSS = registry.gauge(
+    "process_resident_memory_bytes", "Resident memory size in bytes")
+PROCESS_RSS.set_function(process_rss_bytes)
+PROCESS_START = registry.gauge(
+    "process_start_time_seconds", "Start time of the process since unix epoch")
+PROCESS_START.set(time.time())
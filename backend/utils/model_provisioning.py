@@ -0,0 +1,246 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from config import Config
+
+GDRIVE_URL = "https://docs.google.com/uc?export=download"
+CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_CHUNK_SIZE = 64 * 1024  # an interrupted read loses at most one chunk
+STAMP_FILE = ".verified.json"
+
+# Legacy (pre zip) torch.save files are a pickle stream starting with protocol 2
+LEGACY_TORCH_MAGIC = b"\x80\x02"
+
+
+class ProvisioningError(Exception):
+    pass
+
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def looks_like_torch_file(path):
+    """
+    Cheap structural check for files without a recorded checksum
+
+    Zip-format checkpoints need their central directory at the end, so a
+    truncated download fails; HTML error pages fail both checks.
+    """
+    if zipfile.is_zipfile(path):
+        return True
+    with open(path, 'rb') as f:
+        return f.read(2) == LEGACY_TORCH_MAGIC
+
+
+def load_manifest(path=None):
+    """{filename: {"gdrive_id", "sha256", "size"}} from the checksum manifest"""
+    with open(path or Config.MODEL_MANIFEST) as f:
+        return json.load(f)["models"]
+
+
+def write_manifest(models_dir=None, path=None):
+    """Record size and SHA-256 of the model files present in models_dir"""
+    models_dir = models_dir or Config.MODELS_DIR
+    path = path or Config.MODEL_MANIFEST
+    manifest = load_manifest(path)
+    for name, entry in manifest.items():
+        model_path = os.path.join(models_dir, name)
+        if os.path.exists(model_path):
+            entry["size"] = os.path.getsize(model_path)
+            entry["sha256"] = sha256_file(model_path)
+            print(f"  ✓ {name}: {entry['sha256'][:16]}… ({entry['size']} bytes)")
+        else:
+            print(f"  ⊘ {name}: not present, left unchanged")
+    with open(path, 'w') as f:
+        json.dump({"models": manifest}, f, indent=2)
+        f.write("\n")
+    return manifest
+
+
+class ModelProvisioner:
+    """
+    Fetches missing or corrupt model files in parallel
+
+    Sources are tried in order: a local directory, an HTTP mirror
+    (`{mirror}/{filename}`), then Google Drive. Downloads go to `<name>.part`
+    and resume with a Range request after an interrupted transfer. A file is
+    moved into place only after it matches the manifest's size and SHA-256
+    (or, for entries without a checksum, passes a structural check).
+    """
+
+    def __init__(self, models_dir=None, manifest=None, mirror_url=None, source_dir=None,
+                 workers=None, timeout=None, retries=None):
+        self.models_dir = models_dir or Config.MODELS_DIR
+        self.manifest = manifest if manifest is not None else load_manifest()
+        self.mirror_url = (Config.MODEL_MIRROR_URL if mirror_url is None else mirror_url).rstrip('/')
+        self.source_dir = Config.MODEL_SOURCE_DIR if source_dir is None else source_dir
+        self.workers = workers or Config.MODEL_DOWNLOAD_WORKERS
+        self.timeout = timeout or Config.MODEL_DOWNLOAD_TIMEOUT
+        self.retries = retries or Config.MODEL_DOWNLOAD_RETRIES
+        self._stamps = None
+        self._stamp_lock = threading.Lock()
+        os.makedirs(self.models_dir, exist_ok=True)
+
+    # ---- verification ----
+
+    def _load_stamps(self):
+        if self._stamps is None:
+            try:
+                with open(os.path.join(self.models_dir, STAMP_FILE)) as f:
+                    self._stamps = json.load(f)
+            except (OSError, ValueError):
+                self._stamps = {}
+        return self._stamps
+
+    def _stamp(self, name, path, sha256):
+        stat = os.stat(path)
+        with self._stamp_lock:
+            stamps = self._load_stamps()
+            stamps[name] = [stat.st_size, stat.st_mtime_ns, sha256]
+            with open(os.path.join(self.models_dir, STAMP_FILE), 'w') as f:
+                json.dump(stamps, f)
+
+    def verify(self, name, path, use_stamp=False):
+        """Raise ProvisioningError unless path is a good copy of model `name`"""
+        entry = self.manifest[name]
+        size = os.path.getsize(path)
+        if size == 0:
+            raise ProvisioningError(f"{name} is empty")
+        if entry.get("size") and size != entry["size"]:
+            raise ProvisioningError(f"{name} is {size} bytes, expected {entry['size']}")
+
+        expected = entry.get("sha256")
+        if not expected:
+            if not looks_like_torch_file(path):
+                raise ProvisioningError(f"{name} is not a torch checkpoint")
+            return
+
+        if use_stamp:
+            # Skip re-hashing files verified earlier and unchanged since
+            stat = os.stat(path)
+            with self._stamp_lock:
+                stamp = self._load_stamps().get(name)
+            if stamp == [stat.st_size, stat.st_mtime_ns, expected]:
+                return
+        actual = sha256_file(path)
+        if actual != expected:
+            raise ProvisioningError(f"{name} checksum mismatch: {actual[:16]}… != {expected[:16]}…")
+        self._stamp(name, path, actual)
+
+    def is_present(self, name):
+        path = os.path.join(self.models_dir, name)
+        if not os.path.exists(path):
+            return False
+        try:
+            self.verify(name, path, use_stamp=True)
+            return True
+        except ProvisioningError as e:
+            print(f"⚠️  {e}; fetching again")
+            return False
+
+    # ---- sources ----
+
+    def _sources(self, name):
+        entry = self.manifest[name]
+        if self.source_dir:
+            yield "local", lambda part: self._copy_local(os.path.join(self.source_dir, name), part)
+        if self.mirror_url:
+            yield "mirror", lambda part: self._download(requests.Session(), f"{self.mirror_url}/{name}", part)
+        if entry.get("gdrive_id"):
+            yield "gdrive", lambda part: self._download_gdrive(entry["gdrive_id"], part)
+
+    def _copy_local(self, source, part):
+        if not os.path.exists(source):
+            raise ProvisioningError(f"{source} not found")
+        shutil.copyfile(source, part)
+
+    def _download(self, session, url, part, params=None):
+        """GET url into part, resuming from its current size"""
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        with session.get(url, params=params, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 416 and offset:
+                # The part file already holds the whole body
+                return
+            response.raise_for_status()
+            if response.headers.get("Content-Type", "").startswith("text/html"):
+                raise ProvisioningError(f"{url} returned an HTML page instead of the model")
+
+            resumed = response.status_code == 206 and \
+                response.headers.get("Content-Range", "").startswith(f"bytes {offset}-")
+            if offset and resumed:
+                print(f"  ↻ Resuming {os.path.basename(part)} at {offset / (1024 * 1024):.1f} MB")
+            with open(part, 'ab' if resumed else 'wb') as f:
+                for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+
+    def _download_gdrive(self, file_id, part):
+        session = requests.Session()
+        # Large files need the confirmation token Drive sets as a cookie
+        with session.get(GDRIVE_URL, params={'id': file_id}, stream=True, timeout=self.timeout):
+            pass
+        params = {'id': file_id}
+        for key, value in session.cookies.items():
+            if key.startswith('download_warning'):
+                params['confirm'] = value
+        self._download(session, GDRIVE_URL, part, params)
+
+    # ---- provisioning ----
+
+    def _provision_one(self, name):
+        path = os.path.join(self.models_dir, name)
+        started = time.perf_counter()
+        if self.is_present(name):
+            return {"status": "present", "seconds": 0.0}
+
+        part = f"{path}.part"
+        errors = []
+        for source, fetch in self._sources(name):
+            for attempt in range(1, self.retries + 1):
+                try:
+                    fetch(part)
+                except ProvisioningError as e:
+                    # This source cannot serve the file; try the next one
+                    errors.append(f"{source}: {e}")
+                    break
+                except (OSError, requests.RequestException) as e:
+                    # Transfer error: keep the part file so the next attempt resumes
+                    errors.append(f"{source} attempt {attempt}: {e}")
+                    time.sleep(0.5 * attempt)
+                    continue
+
+                try:
+                    self.verify(name, part)
+                except ProvisioningError as e:
+                    # Bad content: the next source starts from scratch
+                    os.unlink(part)
+                    errors.append(f"{source}: {e}")
+                    break
+
+                os.replace(part, path)
+                if self.manifest[name].get("sha256"):
+                    self._stamp(name, path, self.manifest[name]["sha256"])
+                size = os.path.getsize(path)
+                print(f"  ✓ {name} from {source} ({size / (1024 * 1024):.1f} MB)")
+                return {"status": "downloaded", "source": source, "bytes": size,
+                        "seconds": round(time.perf_counter() - started, 3)}
+        print(f"  ✗ {name}: {'; '.join(errors) or 'no source configured'}")
+        return {"status": "failed", "errors": errors,
+                "seconds": round(time.perf_counter() - started, 3)}
+
+    def provision(self, names=None):
+        """Make every model (or `names`) present and verified; returns per-model results"""
+        names = list(names or self.manifest)
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(names) or 1))) as pool:
+            return dict(zip(names, pool.map(self._provision_one, names)))
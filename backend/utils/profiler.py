@@ -0,0 +1,134 @@
+import cProfile
+import io
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from config import Config
+
+TRACE_NAME = re.compile(r"^[\w.\-]+\.(prof|txt|json)$")
+
+
+class ProfileSession:
+    """
+    cProfile (and torch.profiler when torch is loaded) around one conversion
+
+    Only the thread running the conversion is profiled: batches split over
+    the OpenCV style pool (OPENCV_WORKERS) and inference in shard processes
+    (INFERENCE_SHARDS) show up as the time spent waiting for them.
+    """
+
+    def __init__(self, output_dir, style, job_id, with_torch=True):
+        self.output_dir = output_dir
+        self.base_name = f"{time.strftime('%Y%m%d-%H%M%S')}_{style}_{job_id[:8]}"
+        self.profiler = cProfile.Profile()
+        self.torch_profiler = None
+        self.with_torch = with_torch and "torch" in sys.modules
+        self.files = []
+
+    def start(self):
+        if self.with_torch:
+            try:
+                import torch
+                self.torch_profiler = torch.profiler.profile(
+                    activities=[torch.profiler.ProfilerActivity.CPU],
+                    record_shapes=True,
+                )
+                self.torch_profiler.__enter__()
+            except Exception as e:
+                print(f"⚠️  torch profiler unavailable: {e}")
+                self.torch_profiler = None
+        self.profiler.enable()
+
+    def stop(self):
+        """Stop profiling and write the traces; returns the saved file names"""
+        self.profiler.disable()
+
+        prof_path = os.path.join(self.output_dir, f"{self.base_name}.prof")
+        self.profiler.dump_stats(prof_path)
+        self.files.append(os.path.basename(prof_path))
+
+        summary = io.StringIO()
+        pstats.Stats(self.profiler, stream=summary).sort_stats("cumulative").print_stats(40)
+        txt_path = os.path.join(self.output_dir, f"{self.base_name}.txt")
+        with open(txt_path, "w") as f:
+            f.write(summary.getvalue())
+        self.files.append(os.path.basename(txt_path))
+
+        if self.torch_profiler is not None:
+            try:
+                self.torch_profiler.__exit__(None, None, None)
+                trace_path = os.path.join(self.output_dir, f"{self.base_name}.torch.json")
+                self.torch_profiler.export_chrome_trace(trace_path)
+                self.files.append(os.path.basename(trace_path))
+            except Exception as e:
+                print(f"⚠️  torch trace export failed: {e}")
+
+        print(f"🔬 Profile saved: {', '.join(self.files)}")
+        return self.files
+
+
+class ProfileCapture:
+    """
+    Arms profiling for the next N conversions of a style
+
+    claim() is a single dict check while nothing is armed, so conversions
+    pay nothing when profiling is off.
+    """
+
+    def __init__(self, output_dir=None):
+        self.output_dir = output_dir or os.path.join(Config.TEMP_DIR, "profiles")
+        self._armed = {}
+        self._with_torch = {}
+        self._lock = threading.Lock()
+
+    def arm(self, style, count=1, with_torch=True):
+        os.makedirs(self.output_dir, exist_ok=True)
+        with self._lock:
+            self._armed[style] = count
+            self._with_torch[style] = with_torch
+        print(f"🔬 Profiling armed: next {count} '{style}' conversions")
+
+    def disarm(self, style=None):
+        with self._lock:
+            if style is None:
+                self._armed.clear()
+            else:
+                self._armed.pop(style, None)
+
+    def claim(self, style, job_id):
+        """Return a ProfileSession if this conversion should be profiled"""
+        if not self._armed:
+            return None
+        with self._lock:
+            remaining = self._armed.get(style, 0)
+            if remaining <= 0:
+                return None
+            if remaining == 1:
+                del self._armed[style]
+            else:
+                self._armed[style] = remaining - 1
+            with_torch = self._with_torch.get(style, True)
+        return ProfileSession(self.output_dir, style, job_id, with_torch)
+
+    def status(self):
+        return {"armed": dict(self._armed), "traces": self.list_traces()}
+
+    def list_traces(self):
+        if not os.path.isdir(self.output_dir):
+            return []
+        traces = []
+        for name in sorted(os.listdir(self.output_dir), reverse=True):
+            if TRACE_NAME.match(name):
+                path = os.path.join(self.output_dir, name)
+                traces.append({"name": name, "bytes": os.path.getsize(path), "modified": os.path.getmtime(path)})
+        return traces
+
+    def trace_path(self, name):
+        """Resolve a trace file name, rejecting anything outside the profile directory"""
+        if not TRACE_NAME.match(name):
+            return None
+        path = os.path.join(self.output_dir, name)
+        return path if os.path.isfile(path) else None
@@ -0,0 +1,151 @@
+import asyncio
+import base64
+import contextvars
+import threading
+import time
+import cv2
+import numpy as np
+from config import Config
+from utils import metrics
+
+# Events that end a stream
+TERMINAL_EVENTS = ("result", "error")
+
+_current_channel = contextvars.ContextVar("progress_channel", default=None)
+
+
+class ProgressChannel:
+    """
+    Progress of one conversion, pushed from the worker thread to a stream
+
+    The conversion reports stages and styled frames; the channel turns them
+    into events on an asyncio queue owned by the request's event loop.
+    Progress events are sent at most every PROGRESS_INTERVAL seconds and
+    low-resolution JPEG previews at most every PREVIEW_INTERVAL seconds (the
+    first styled frame always gets one). While frames are styled, progress
+    events carry `eta_seconds`: the cost model's estimate (`estimate`) until
+    the first frame is done, then the pace measured so far.
+    """
+
+    def __init__(self, loop=None):
+        self.loop = loop or asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        self.total = None
+        self.done = 0
+        self.stage = None
+        self.estimate = None  # expected seconds of the style stage
+        self._style_started = None
+        self._last_progress = 0.0
+        self._last_preview = None
+        self._lock = threading.Lock()
+
+    def activate(self):
+        """Bind this channel to the current context; returns a token for deactivate()"""
+        return _current_channel.set(self)
+
+    @staticmethod
+    def deactivate(token):
+        _current_channel.reset(token)
+
+    def emit(self, event, **data):
+        """Queue an event (callable from any thread)"""
+        try:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, (event, data))
+        except RuntimeError:
+            # The request's loop is gone; nobody is listening
+            pass
+
+    def _progress(self, stage, done, total):
+        data = {"stage": stage, "done": done, "total": total}
+        if stage == "style" and self._style_started is not None:
+            elapsed = time.monotonic() - self._style_started
+            if done and total:
+                data["eta_seconds"] = round(elapsed * (total - done) / done, 1)
+            elif self.estimate is not None:
+                data["eta_seconds"] = round(max(self.estimate - elapsed, 0), 1)
+        self.emit("progress", **data)
+
+    def set_stage(self, name, total=None):
+        with self._lock:
+            self.stage = name
+            if total is not None:
+                self.total = total
+                self.done = 0
+            if name == "style":
+                self._style_started = time.monotonic()
+        self._progress(name, self.done, self.total)
+
+    def set_total(self, total):
+        """Change the frame count mid-way (e.g. when a time budget drops frames)"""
+        with self._lock:
+            self.total = total
+
+    def frame(self, styled):
+        """One styled RGB frame is finished"""
+        now = time.monotonic()
+        with self._lock:
+            self.done += 1
+            done, total = self.done, self.total
+            send_progress = done == total or now - self._last_progress >= Config.PROGRESS_INTERVAL
+            if send_progress:
+                self._last_progress = now
+            send_preview = self._last_preview is None or now - self._last_preview >= Config.PREVIEW_INTERVAL
+            if send_preview:
+                self._last_preview = now
+        if send_progress:
+            self._progress(self.stage, done, total)
+        if send_preview:
+            self.emit("preview", frame=done - 1, image=preview_data_url(styled))
+            metrics.PROGRESS_PREVIEWS.inc()
+
+    async def events(self):
+        """Yield (event, data) until a result or error event; None marks an idle keepalive period"""
+        while True:
+            try:
+                event, data = await asyncio.wait_for(self.queue.get(), Config.STREAM_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            yield event, data
+            if event in TERMINAL_EVENTS:
+                return
+
+
+def preview_data_url(frame):
+    """Small JPEG data URL of an RGB frame (long side PREVIEW_SIZE)"""
+    frame = np.asarray(frame)
+    height, width = frame.shape[:2]
+    scale = Config.PREVIEW_SIZE / max(height, width)
+    if scale < 1:
+        frame = cv2.resize(frame, (max(1, round(width * scale)), max(1, round(height * scale))),
+                           interpolation=cv2.INTER_AREA)
+    if frame.ndim == 2:
+        frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+    else:
+        frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+    _, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, Config.PREVIEW_QUALITY])
+    return "data:image/jpeg;base64," + base64.b64encode(encoded.tobytes()).decode("ascii")
+
+
+def report_stage(name, total=None):
+    """Report a pipeline stage to the active channel (no-op without one)"""
+    channel = _current_channel.get()
+    if channel is not None:
+        channel.set_stage(name, total)
+
+
+def report_total(total):
+    channel = _current_channel.get()
+    if channel is not None:
+        channel.set_total(total)
+
+
+def report_frame(styled):
+    """Report one styled frame to the active channel (no-op without one)"""
+    channel = _current_channel.get()
+    if channel is not None:
+        channel.frame(styled)
+
+
+def current_channel():
+    return _current_channel.get()
@@ -0,0 +1,229 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from config import Config
+
+CHUNK_SIZE = 64 * 1024
+RESULT_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+
+def content_digest(data):
+    """SHA-256 hex digest of an upload or a result"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def result_key(media_digest, style, *variant):
+    """
+    Stable result ID for a conversion
+
+    The same upload converted with the same style and output settings always
+    maps to the same ID, so retries and repeat downloads find the stored file.
+    """
+    parts = [media_digest, style, str(Config.MAX_IMAGE_SIZE), *[str(v) for v in variant]]
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()[:32]
+
+
+def parse_range(header, size):
+    """
+    Parse a single-range `Range: bytes=...` header
+
+    Returns (start, end) inclusive, or None when the header should be ignored
+    (not bytes, malformed or multiple ranges - the full body is sent instead).
+    Raises ValueError when the range cannot be satisfied.
+    """
+    unit, _, spec = (header or '').partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in spec:
+        return None
+    first, _, last = (part.strip() for part in spec.partition('-'))
+    if not (first or last) or not all(part.isdigit() for part in (first, last) if part):
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        if int(last) == 0 or size == 0:
+            raise ValueError(f"Range not satisfiable: {header}")
+        return max(size - int(last), 0), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    end = int(last) if last else size - 1
+    if start >= size:
+        raise ValueError(f"Range not satisfiable: {header}")
+    return start, min(end, size - 1)
+
+
+def etag_matches(header, etag):
+    """True when an If-None-Match / If-Range header names this ETag"""
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    candidates = [tag.strip() for tag in header.split(',')]
+    return etag in candidates or f"W/{etag}" in candidates
+
+
+def iter_file(path, start, length):
+    """Yield `length` bytes of a file from `start` in CHUNK_SIZE pieces"""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _write_atomic(path, data):
+    """Write through a temp file unique to this process and thread, then rename"""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+class StoredResult:
+    """A finished conversion on disk"""
+
+    def __init__(self, result_id, path, media_type, filename, size, etag, job_id=None, created_at=None):
+        self.result_id = result_id
+        self.path = path
+        self.media_type = media_type
+        self.filename = filename
+        self.size = size
+        self.etag = etag
+        self.job_id = job_id
+        self.created_at = created_at or time.time()
+
+    def to_dict(self):
+        return {
+            "result_id": self.result_id,
+            "media_type": self.media_type,
+            "filename": self.filename,
+            "size": self.size,
+            "etag": self.etag,
+            "job_id": self.job_id,
+            "created_at": self.created_at,
+        }
+
+
+class ResultStore:
+    """
+    Finished results kept on disk under stable IDs
+
+    Each result is a file plus a JSON sidecar, so the index survives restarts.
+    Least recently used results are evicted once the store exceeds max_bytes.
+    When several workers share the directory, a result another worker stored
+    is picked up from its sidecar on first access.
+    """
+
+    def __init__(self, directory=None, max_bytes=None):
+        self.directory = directory or Config.RESULTS_DIR
+        self.max_bytes = max_bytes if max_bytes is not None else Config.RESULT_STORE_MB * 1024 * 1024
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        sidecars = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith('.json')),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        for entry in sidecars:
+            try:
+                result = self._read_sidecar(entry.path)
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                print(f"⚠️  Skipping result {entry.name}: {e}")
+                continue
+            if os.path.exists(result.path):
+                self._results[result.result_id] = result
+        if self._results:
+            print(f"✅ Result store: {len(self._results)} results in {self.directory}")
+
+    def _read_sidecar(self, path):
+        with open(path) as f:
+            meta = json.load(f)
+        return StoredResult(path=os.path.join(self.directory, meta.pop('filename_on_disk')), **meta)
+
+    def _load_shared(self, result_id):
+        """A result written by another worker sharing the directory, or None"""
+        if not RESULT_ID_PATTERN.fullmatch(result_id):
+            return None
+        try:
+            result = self._read_sidecar(os.path.join(self.directory, f"{result_id}.json"))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        return result if os.path.exists(result.path) else None
+
+    def get(self, result_id):
+        with self._lock:
+            result = self._results.get(result_id)
+        shared = result is None
+        if shared:
+            result = self._load_shared(result_id)
+            if result is None:
+                return None
+        with self._lock:
+            if not os.path.exists(result.path):
+                self._results.pop(result_id, None)
+                return None
+            result = self._results.setdefault(result_id, result)
+            self._results.move_to_end(result_id)
+            if shared:
+                self._evict()
+            return result
+
+    def put(self, result_id, data, media_type, filename, job_id=None):
+        """Write a result atomically and index it; returns the StoredResult"""
+        extension = os.path.splitext(filename)[1]
+        disk_name = f"{result_id}{extension}"
+        path = os.path.join(self.directory, disk_name)
+        result = StoredResult(result_id, path, media_type, filename, len(data),
+                              f'"{content_digest(data)[:32]}"', job_id)
+
+        _write_atomic(path, data)
+        # The sidecar goes last: other workers treat it as the result being complete
+        sidecar = json.dumps({**result.to_dict(), "filename_on_disk": disk_name})
+        _write_atomic(os.path.join(self.directory, f"{result_id}.json"), sidecar.encode())
+
+        with self._lock:
+            self._results[result_id] = result
+            self._results.move_to_end(result_id)
+            self._evict()
+        return result
+
+    def delete(self, result_id):
+        with self._lock:
+            result = self._results.pop(result_id, None)
+        if result is not None:
+            self._remove_files(result)
+        return result is not None
+
+    def _evict(self):
+        while len(self._results) > 1 and self.total_bytes() > self.max_bytes:
+            _, result = self._results.popitem(last=False)
+            self._remove_files(result)
+
+    def _remove_files(self, result):
+        for path in (result.path, os.path.join(self.directory, f"{result.result_id}.json")):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def total_bytes(self):
+        return sum(result.size for result in list(self._results.values()))
+
+    def __len__(self):
+        return len(self._results)
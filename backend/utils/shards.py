@@ -0,0 +1,555 @@
+import fcntl
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.connection import Client, Listener
+import numpy as np
+from PIL import Image
+from config import Config
+from utils import metrics
+from utils.admission import style_family
+from utils.style_loader import (
+    StyleLoader, StylerUnavailable, PENDING, LOADING, WARMING, READY, UNAVAILABLE, DISABLED, SERVABLE
+)
+from utils.timing import StageTimer, current_timer, stage
+
+TORCH_FAMILIES = {"neural": Config.NEURAL_STYLES, "anime": Config.CARTOON_STYLES}
+
+# A family is as ready as its most ready shard
+STATUS_RANK = (READY, WARMING, LOADING, PENDING, UNAVAILABLE)
+
+MIN_BUFFER_BYTES = 1024 * 1024
+
+SHARD_POLL_SECONDS = 0.5    # status polling while a shard loads or is unreachable
+SHARD_RESTART_DELAY = 1.0   # pause before starting a shard that exited again
+
+
+def parse_shards(spec):
+    """Style groups from an INFERENCE_SHARDS value ("neural;anime", "candy,mosaic;udnie")"""
+    groups = []
+    assigned = set()
+    for group in (spec or "").split(";"):
+        styles = []
+        for token in (token.strip().lower() for token in group.split(",")):
+            if not token:
+                continue
+            if token in TORCH_FAMILIES:
+                styles.extend(TORCH_FAMILIES[token])
+            elif any(token in family_styles for family_styles in TORCH_FAMILIES.values()):
+                styles.append(token)
+            else:
+                raise ValueError(f"INFERENCE_SHARDS: {token} is not a neural or anime style or family")
+        duplicates = assigned.intersection(styles)
+        if duplicates:
+            raise ValueError(f"INFERENCE_SHARDS: {', '.join(sorted(duplicates))} assigned to more than one shard")
+        if styles:
+            assigned.update(styles)
+            groups.append(list(dict.fromkeys(styles)))
+    return groups
+
+
+def shard_address(directory, index):
+    """Unix socket a shard listens on"""
+    return os.path.join(directory, f"shard-{index}.sock")
+
+
+def release_shared(shm, unlink=False):
+    """Close a shared memory block, unlinking it if asked and still there"""
+    shm.close()
+    if unlink:
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def attach_shared(name, shared_tracker):
+    """
+    Attach to a block another process created and unlinks
+
+    Attaching registers the block with this process's resource tracker, which
+    unlinks what it holds when it exits. That is only right when the creator
+    uses the same tracker (a shard and the process that started it).
+    """
+    shm = shared_memory.SharedMemory(name=name)
+    if not shared_tracker:
+        resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+def shared_array(shm, shape):
+    """uint8 array view over a shared memory block (drop it before closing the block)"""
+    return np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+
+
+def grow_shared(shm, nbytes):
+    """`shm` if it holds nbytes, else a new, larger block (the old one is unlinked)"""
+    if shm is not None and shm.size >= nbytes:
+        return shm
+    size = max(nbytes, MIN_BUFFER_BYTES, 2 * shm.size if shm is not None else 0)
+    if shm is not None:
+        release_shared(shm, unlink=True)
+    return shared_memory.SharedMemory(create=True, size=size)
+
+
+def to_rgb_array(img):
+    """RGB uint8 array of a PIL image or of a BGR array (apply_style's inputs)"""
+    if isinstance(img, np.ndarray):
+        if img.ndim == 3 and img.shape[2] == 3:
+            return np.ascontiguousarray(img[:, :, ::-1], dtype=np.uint8)
+        return np.ascontiguousarray(img, dtype=np.uint8)
+    return np.asarray(img.convert('RGB'))
+
+
+
+
+# ---- shard process ----
+
+def _shard_status(loader, final):
+    loaded = loader.models
+    return ("status", dict(loader.family_status), loaded['neural'] + loaded['anime'], final,
+            os.getpid(), os.getppid())
+
+
+def _style_request(loader, inputs, output, style, name, shape, client_pid):
+    """Style the frame in shared block `name`; returns (output block, reply)"""
+    if name not in inputs:
+        for shm in inputs.values():
+            shm.close()
+        inputs.clear()
+        inputs[name] = attach_shared(name, shared_tracker=client_pid == os.getppid())
+    timer = StageTimer()
+    token = timer.activate()
+    try:
+        # apply_style reads arrays as BGR, so reversing the channels hands the
+        # stylers the shared RGB pixels themselves
+        styled = loader.apply_style(shared_array(inputs[name], shape)[:, :, ::-1], style)
+        with stage("postprocess"):
+            styled = np.asarray(styled)
+            output = grow_shared(output, styled.nbytes)
+            shared_array(output, styled.shape)[...] = styled
+    finally:
+        StageTimer.deactivate(token)
+    return output, ("ok", output.name, styled.shape, timer.durations)
+
+
+def _serve_client(client, loader, state):
+    """Answer one API process's requests; the output block is this connection's own"""
+    inputs = {}
+    output = None
+    try:
+        _, client_pid = client.recv()
+        while True:
+            try:
+                message = client.recv()
+            except (EOFError, OSError):
+                break
+            if message[0] == "status":
+                reply = _shard_status(loader, state["final"])
+            else:
+                _, style, name, shape = message
+                try:
+                    # One model runs at a time, whichever API process asks
+                    with state["lock"]:
+                        output, reply = _style_request(loader, inputs, output, style, name, shape, client_pid)
+                        state["outputs"][id(client)] = output
+                except Exception as e:
+                    reply = ("error", f"{type(e).__name__}: {e}")
+            client.send(reply)
+    except (EOFError, OSError):
+        pass
+    finally:
+        client.close()
+        for shm in inputs.values():
+            shm.close()
+        if output is not None:
+            state["outputs"].pop(id(client), None)
+            release_shared(output, unlink=True)
+
+
+def _accept_clients(listener, loader, state):
+    while True:
+        try:
+            client = listener.accept()
+        except OSError:
+            break
+        threading.Thread(target=_serve_client, args=(client, loader, state), daemon=True).start()
+
+
+def run_shard(conn, styles, address, threads=0):
+    """
+    Entry point of an inference shard process
+
+    Listens on `address` for API processes, loads `styles`, and serves until
+    its owner sends "stop" on `conn` or exits.
+    """
+    # Ctrl-C reaches the whole process group; the owner stops its shards itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if threads:
+        import torch
+        torch.set_num_threads(threads)
+
+    loader = StyleLoader(lite=False, styles=styles)
+    state = {"final": False, "lock": threading.Lock(), "outputs": {}}
+    listener = Listener(address, family="AF_UNIX")
+    threading.Thread(target=_accept_clients, args=(listener, loader, state), daemon=True).start()
+    try:
+        with state["lock"]:
+            loader.load_neural_models()
+            loader.load_anime_models()
+            loader.warmup_models()
+        state["final"] = True
+        try:
+            conn.recv()
+        except EOFError:
+            pass
+    finally:
+        listener.close()
+        for shm in list(state["outputs"].values()):
+            release_shared(shm, unlink=True)
+
+
+class ShardHost:
+    """
+    The inference shard processes of this host
+
+    Only the process holding the host lock in INFERENCE_SHARD_DIR runs them:
+    shard_host.py, or else the first API process to load models. Each shard
+    listens on its own Unix socket there, so every API process on the host
+    shares one copy of each model. The shards exit with their owner, and one
+    that dies is started again.
+    """
+
+    def __init__(self, groups, directory, lock_file):
+        self.groups = groups
+        self.directory = directory
+        self.processes = {}
+        self.conns = {}
+        self.stopping = False
+        self._lock_file = lock_file
+        self._lock = threading.Lock()
+
+    @classmethod
+    def claim(cls, groups, directory):
+        """A started ShardHost when this process gets the host lock, else None (another process owns the shards)"""
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        lock_file = open(os.path.join(directory, "host.lock"), "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return None
+        host = cls(groups, directory, lock_file)
+        host.start()
+        return host
+
+    def start(self):
+        print(f"🧩 Starting {len(self.groups)} inference shard(s) in {self.directory}")
+        for index in range(len(self.groups)):
+            self._spawn(index)
+
+    def _spawn(self, index):
+        address = shard_address(self.directory, index)
+        if os.path.exists(address):
+            # Left by a shard of an earlier owner
+            os.unlink(address)
+        context = multiprocessing.get_context("spawn")
+        conn, child = context.Pipe()
+        process = context.Process(
+            target=run_shard, args=(child, self.groups[index], address, Config.INFERENCE_SHARD_THREADS),
+            name=f"inference-shard-{index}", daemon=True)
+        process.start()
+        child.close()
+        with self._lock:
+            self.processes[index] = process
+            self.conns[index] = conn
+        print(f"🧩 Inference shard {index} (pid {process.pid}): {', '.join(self.groups[index])}")
+        threading.Thread(target=self._watch, args=(index, process), name=f"inference-shard-{index}-watch",
+                         daemon=True).start()
+
+    def _watch(self, index, process):
+        process.join()
+        if self.stopping:
+            return
+        print(f"❌ Inference shard {index} exited (code {process.exitcode}); restarting")
+        metrics.INFERENCE_SHARD_RESTARTS.inc(shard=str(index))
+        time.sleep(SHARD_RESTART_DELAY)
+        if not self.stopping:
+            self._spawn(index)
+
+    def stop(self):
+        self.stopping = True
+        with self._lock:
+            running = [(self.processes[index], self.conns[index]) for index in self.processes]
+        for process, conn in running:
+            try:
+                conn.send(("stop",))
+            except (OSError, ValueError):
+                pass
+            process.join(5)
+            if process.is_alive():
+                process.terminate()
+                process.join(5)
+            conn.close()
+        fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+        self._lock_file.close()
+
+
+# ---- API process ----
+
+class InferenceShard:
+    """
+    This API process's connection to one inference shard
+
+    Requests are serialized per connection, and the shard runs one model at a
+    time for all API processes. The frame goes to the shard through a shared
+    memory block owned by this side and the styled frame comes back through
+    one the shard keeps for this connection; only the block names and shapes
+    cross the socket.
+    """
+
+    def __init__(self, index, styles, address, on_status=None, on_unreachable=None):
+        self.name = str(index)
+        self.styles = styles
+        self.address = address
+        self.on_status = on_status
+        self.on_unreachable = on_unreachable
+        self.family_status = {family: PENDING for family, family_styles in TORCH_FAMILIES.items()
+                              if not set(family_styles).isdisjoint(styles)}
+        self.loaded = []
+        self.pid = None
+        self.owner_pid = None
+        self.conn = None
+        self.closed = False
+        self.lock = threading.Lock()
+        self._input = None
+        self._output = None
+
+    def _set_family_status(self, status):
+        for family in self.family_status:
+            self.family_status[family] = status
+        if self.on_status:
+            self.on_status()
+
+    def _request(self, message):
+        """Send a message and wait for the reply (with self.lock held)"""
+        if self.conn is None:
+            self.conn = Client(self.address, family="AF_UNIX")
+            self.conn.send(("hello", os.getpid()))
+        self.conn.send(message)
+        if not self.conn.poll(Config.INFERENCE_SHARD_TIMEOUT):
+            raise TimeoutError(f"no reply in {Config.INFERENCE_SHARD_TIMEOUT:.0f}s")
+        return self.conn.recv()
+
+    def wait_ready(self):
+        """
+        Poll the shard's status until its models are warmed up; while nothing
+        answers on its socket, on_unreachable may start the shards here
+        """
+        while not self.closed:
+            try:
+                with self.lock:
+                    _, family_status, loaded, final, self.pid, self.owner_pid = self._request(("status",))
+            except (EOFError, OSError, TimeoutError):
+                with self.lock:
+                    self._disconnect()
+                if self.on_unreachable:
+                    self.on_unreachable()
+                time.sleep(SHARD_POLL_SECONDS)
+                continue
+            self.loaded = loaded
+            for family in self.family_status:
+                self.family_status[family] = family_status[family]
+            if self.on_status:
+                self.on_status()
+            if final:
+                break
+            time.sleep(SHARD_POLL_SECONDS)
+        if self.closed:
+            return
+        metrics.INFERENCE_SHARD_UP.set(1, shard=self.name)
+        metrics.INFERENCE_SHARD_RSS.set(metrics.process_rss_bytes(self.pid), shard=self.name)
+        print(f"✅ Inference shard {self.name} ready (pid {self.pid}): {', '.join(self.loaded) or 'no models'}")
+
+    def _attach_output(self, name):
+        if self._output is None or self._output.name != name:
+            if self._output is not None:
+                self._output.close()
+            self._output = attach_shared(name, shared_tracker=self.owner_pid == os.getpid())
+        return self._output
+
+    def stylize(self, rgb, style):
+        """Style an RGB uint8 array in the shard; returns a PIL Image"""
+        started = time.perf_counter()
+        with self.lock:
+            if self.conn is None:
+                metrics.INFERENCE_SHARD_REQUESTS.inc(shard=self.name, result="unavailable")
+                raise StylerUnavailable(f"Inference shard {self.name} for '{style}' is not running")
+            with stage("preprocess"):
+                self._input = grow_shared(self._input, rgb.nbytes)
+                shared_array(self._input, rgb.shape)[...] = rgb
+            try:
+                reply = self._request(("style", style, self._input.name, rgb.shape))
+            except (EOFError, OSError, TimeoutError) as e:
+                metrics.INFERENCE_SHARD_REQUESTS.inc(shard=self.name, result="failed")
+                self._fail(e)
+                raise StylerUnavailable(f"Inference shard {self.name} for '{style}' failed: {e}")
+            if reply[0] == "error":
+                metrics.INFERENCE_SHARD_REQUESTS.inc(shard=self.name, result="error")
+                raise RuntimeError(reply[1])
+            _, name, shape, durations = reply
+            with stage("postprocess"):
+                image = Image.fromarray(shared_array(self._attach_output(name), shape))
+                # Single-channel images may wrap the shared block instead of copying it
+                if image.readonly:
+                    image = image.copy()
+
+        seconds = time.perf_counter() - started
+        timer = current_timer()
+        if timer is not None:
+            for stage_name, stage_seconds in durations.items():
+                timer.add(stage_name, stage_seconds)
+            timer.add("ipc", max(0.0, seconds - sum(durations.values())))
+        metrics.INFERENCE_SHARD_REQUESTS.inc(shard=self.name, result="ok")
+        metrics.INFERENCE_SHARD_SECONDS.observe(seconds, shard=self.name)
+        metrics.INFERENCE_SHARD_RSS.set(metrics.process_rss_bytes(self.pid), shard=self.name)
+        return image
+
+    def _fail(self, error):
+        """The shard died or hung: drop the connection and reconnect in the background"""
+        print(f"❌ Inference shard {self.name} failed ({error}); reconnecting")
+        if isinstance(error, TimeoutError) and self.pid:
+            # A hung shard is killed; its owner starts a fresh one
+            try:
+                os.kill(self.pid, signal.SIGKILL)
+            except OSError:
+                pass
+        self._disconnect()
+        self._set_family_status(UNAVAILABLE)
+        threading.Thread(target=self.wait_ready, name=f"inference-shard-{self.name}-reconnect", daemon=True).start()
+
+    def _disconnect(self):
+        """Close the connection and the shard's block (with self.lock held)"""
+        metrics.INFERENCE_SHARD_UP.set(0, shard=self.name)
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+        # The shard unlinks its block when the connection closes (or, if it
+        # died, the owner's resource tracker does when the owner exits)
+        if self._output is not None:
+            self._output.close()
+            self._output = None
+
+    def close(self):
+        self.closed = True
+        with self.lock:
+            self._disconnect()
+            if self._input is not None:
+                release_shared(self._input, unlink=True)
+                self._input = None
+
+
+class ShardRouter(StyleLoader):
+    """
+    StyleLoader whose torch styles run in the host's inference shards
+
+    OpenCV styles still run in this process. Each torch style is routed to
+    the shard that holds it, so this process never imports torch. The shards
+    run once per host: this process starts them only if no other process
+    (another API worker or shard_host.py) owns them, and otherwise attaches
+    to their sockets. Family and style status follow the shards' status.
+    """
+
+    def __init__(self, shards=None, directory=None):
+        super().__init__(lite=False, styles=())
+        self.groups = parse_shards(Config.INFERENCE_SHARDS if shards is None else shards)
+        self.directory = directory or Config.INFERENCE_SHARD_DIR
+        self.host = None
+        self._host_lock = threading.Lock()
+        self.shards = [InferenceShard(index, styles, shard_address(self.directory, index),
+                                      self._refresh_status, self._claim_host)
+                       for index, styles in enumerate(self.groups)]
+        self.routes = {style: shard for shard in self.shards for style in shard.styles}
+        self._refresh_status()
+
+    def _refresh_status(self):
+        for family in TORCH_FAMILIES:
+            statuses = [shard.family_status[family] for shard in self.shards if family in shard.family_status]
+            status = next((status for status in STATUS_RANK if status in statuses), DISABLED)
+            if self.family_status.get(family) != status:
+                self._set_status(family, status)
+
+    def _claim_host(self):
+        """Start the shards here when no process on this host owns them"""
+        with self._host_lock:
+            if self.host is None and self.groups:
+                self.host = ShardHost.claim(self.groups, self.directory)
+
+    def load_models(self):
+        """Start or attach to the host's shards, then wait for each to warm up"""
+        if not self.shards:
+            return
+        self._claim_host()
+        if self.host is None:
+            print(f"🧩 Attaching to {len(self.shards)} inference shard(s) in {self.directory}")
+        for shard in self.shards:
+            shard.wait_ready()
+
+    def close(self):
+        for shard in self.shards:
+            shard.close()
+        with self._host_lock:
+            if self.host is not None:
+                self.host.stop()
+                self.host = None
+
+    def style_status(self, style_name):
+        shard = self.routes.get(style_name)
+        if shard is None:
+            return super().style_status(style_name)
+        status = shard.family_status[style_family(style_name)]
+        if status in SERVABLE and style_name not in shard.loaded:
+            return UNAVAILABLE
+        return status
+
+    def apply_style(self, img, style_name):
+        style_name = style_name.lower()
+        shard = self.routes.get(style_name)
+        if shard is None:
+            return super().apply_style(img, style_name)
+        with stage("preprocess"):
+            rgb = to_rgb_array(img)
+        return shard.stylize(rgb, style_name)
+
+    def shard_status(self):
+        """Per-shard summary for /ready"""
+        return [
+            {
+                "shard": shard.name,
+                "pid": shard.pid,
+                "owned": self.host is not None,
+                "styles": shard.styles,
+                "loaded": shard.loaded,
+                "families": dict(shard.family_status),
+            }
+            for shard in self.shards
+        ]
+
+    @property
+    def models(self):
+        loaded = [style for shard in self.shards for style in shard.loaded]
+        return {
+            'neural': [style for style in Config.NEURAL_STYLES if style in loaded],
+            'anime': [style for style in Config.CARTOON_STYLES if style in loaded],
+            'opencv': Config.OPENCV_STYLES
+        }
+
+
+def create_style_loader():
+    """ShardRouter when INFERENCE_SHARDS is set (and not in lite mode), else an in-process StyleLoader"""
+    if Config.INFERENCE_SHARDS.strip() and not Config.LITE_MODE:
+        return ShardRouter()
+    return StyleLoader()
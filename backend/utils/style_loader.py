@@ -1,35 +1,126 @@
 import os
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
-from models.neural_style import NeuralStyler
 from models.opencv_styles import OpenCVStyler
-from models.cartoon_transformer import CartoonGANStyler
 from config import Config
+from utils import metrics
+from utils.admission import style_family
+from utils.timing import stage
+from utils.progress import report_frame
+from utils.cancellation import ConversionCancelled, check_cancelled
+from utils.guided_filter import guided_upsample
+import cv2
 import numpy as np
+import time
 from PIL import Image
 
-print("=" * 50)
-print("Loading Style Models...")
-print("=" * 50)
+# Family states reported by /ready; a warming family already serves requests
+PENDING, LOADING, WARMING, READY = "pending", "loading", "warming", "ready"
+UNAVAILABLE, DISABLED = "unavailable", "disabled"
+SERVABLE = (WARMING, READY)
+
+# OpenCV batches are split so progress is reported while a long clip is styled
+BATCH_PROGRESS_FRAMES = 16
+
+
+class StylerUnavailable(Exception):
+    """The styler for a style went away mid-request (e.g. its inference shard died)"""
+    pass
+
 
 class StyleLoader:
-    def __init__(self):
+    """
+    Holds the stylers for every family
+    
+    OpenCV styles are usable immediately. Torch is only imported by
+    load_models(), which the app runs in a background thread; in lite mode
+    it is never imported and the neural and anime families stay disabled.
+    `styles` limits which torch models are loaded (an inference shard holds
+    a subset); by default all of them are.
+    """
+    
+    def __init__(self, lite=None, styles=None):
         self.neural_models = {}
         self.anime_models = {}
         self.opencv_styler = OpenCVStyler()
+        self.lite = Config.LITE_MODE if lite is None else lite
+        self.styles = None if styles is None else set(styles)
+        self.family_status = {}
+        self._set_status("opencv", READY)
+        for family, family_styles in (("neural", Config.NEURAL_STYLES), ("anime", Config.CARTOON_STYLES)):
+            wanted = self.styles is None or not self.styles.isdisjoint(family_styles)
+            self._set_status(family, PENDING if wanted and not self.lite else DISABLED)
+    
+    def _set_status(self, family, status):
+        self.family_status[family] = status
+        metrics.STYLE_FAMILY_READY.set(1 if status == READY else 0, family=family)
+    
+    def load_models(self):
+        """Import torch and load the neural and anime models (slow)"""
+        if self.lite:
+            print("🪶 Lite mode: neural and anime styles disabled, torch not imported")
+            return
+        print("=" * 50)
+        print("Loading Style Models...")
+        print("=" * 50)
         self.load_neural_models()
         self.load_anime_models()
+        self.warmup_models()
+    
+    def close(self):
+        """Release stylers held outside this process (none for an in-process loader)"""
+        pass
+    
+    def warmup_models(self):
+        """Run every loaded model once per bucket shape, then mark its family ready"""
+        for family, models in (("neural", self.neural_models), ("anime", self.anime_models)):
+            if self.family_status[family] != WARMING:
+                continue
+            if Config.MODEL_WARMUP:
+                for style_name, styler in models.items():
+                    start = time.perf_counter()
+                    try:
+                        shapes = styler.warmup()
+                    except Exception as e:
+                        print(f"⚠️  Warmup failed for {style_name}: {e}")
+                        continue
+                    elapsed = time.perf_counter() - start
+                    metrics.MODEL_WARMUP_SECONDS.set(elapsed, style=style_name, family=family)
+                    print(f"🔥 Warmed {style_name} on {len(shapes)} shapes in {elapsed:.1f}s")
+            self._set_status(family, READY)
+    
+    def style_status(self, style_name):
+        """Family status for a style, or UNAVAILABLE when its model is missing"""
+        family = style_family(style_name)
+        status = self.family_status[family]
+        if status in SERVABLE and family != "opencv" and style_name not in self.models[family]:
+            return UNAVAILABLE
+        return status
     
     def load_neural_models(self):
         """Load neural style transfer models"""
+        if self.family_status["neural"] == DISABLED:
+            return
+        self._set_status("neural", LOADING)
+        try:
+            from models.neural_style import NeuralStyler
+        except ImportError as e:
+            print(f"✗ Neural styles unavailable: {e}")
+            self._set_status("neural", UNAVAILABLE)
+            return
+        
         print(f"\nLooking for models in: {Config.MODELS_DIR}")
         print(f"Models directory exists: {os.path.exists(Config.MODELS_DIR)}\n")
         
         for style_name, model_path in Config.NEURAL_MODEL_PATHS.items():
+            if self.styles is not None and style_name not in self.styles:
+                continue
             print(f"Checking {style_name}: {model_path}")
             if os.path.exists(model_path):
                 try:
+                    start = time.perf_counter()
                     self.neural_models[style_name] = NeuralStyler(model_path)
+                    metrics.MODEL_LOAD_SECONDS.set(time.perf_counter() - start, style=style_name, family="neural")
                     print(f"  ✓ Loaded {style_name} model")
                 except Exception as e:
                     print(f"  ✗ Failed to load {style_name}: {e}")
@@ -40,16 +131,31 @@ class StyleLoader:
         
         print(f"\nTotal neural models loaded: {len(self.neural_models)}")
         print("=" * 50)
+        self._set_status("neural", WARMING if self.neural_models else UNAVAILABLE)
     
     def load_anime_models(self):
         """Load CartoonGAN anime style models"""
+        if self.family_status["anime"] == DISABLED:
+            return
+        self._set_status("anime", LOADING)
+        try:
+            from models.cartoon_transformer import CartoonGANStyler
+        except ImportError as e:
+            print(f"✗ Anime styles unavailable: {e}")
+            self._set_status("anime", UNAVAILABLE)
+            return
+        
         print(f"\nLoading anime models...")
         
         for style_name, model_path in Config.ANIME_MODEL_PATHS.items():
+            if self.styles is not None and style_name not in self.styles:
+                continue
             print(f"Checking {style_name}: {model_path}")
             if os.path.exists(model_path):
                 try:
+                    start = time.perf_counter()
                     self.anime_models[style_name] = CartoonGANStyler(model_path, style_name)
+                    metrics.MODEL_LOAD_SECONDS.set(time.perf_counter() - start, style=style_name, family="anime")
                     print(f"  ✓ Loaded {style_name} CartoonGAN model")
                 except Exception as e:
                     print(f"  ✗ Failed to load {style_name}: {e}")
@@ -60,6 +166,7 @@ class StyleLoader:
         
         print(f"\nTotal anime models loaded: {len(self.anime_models)}")
         print("=" * 50)
+        self._set_status("anime", WARMING if self.anime_models else UNAVAILABLE)
     
     def apply_style(self, img, style_name):
         """
@@ -74,17 +181,15 @@ class StyleLoader:
         """
         style_name = style_name.lower()
         
-        # Convert numpy array to PIL Image if needed
         is_numpy = isinstance(img, np.ndarray)
-        if is_numpy:
-            # OpenCV uses BGR, convert to RGB
-            if len(img.shape) == 3 and img.shape[2] == 3:
-                img_rgb = img[:, :, ::-1]  # BGR to RGB
-            else:
-                img_rgb = img
-            pil_img = Image.fromarray(img_rgb.astype('uint8'), 'RGB')
+        if is_numpy and img.ndim == 3 and img.shape[2] == 3:
+            # OpenCV uses BGR; the torch stylers take this RGB view as is, no copy
+            torch_input = img[:, :, ::-1]
+        elif is_numpy:
+            with stage("preprocess"):
+                torch_input = Image.fromarray(img.astype('uint8')).convert('RGB')
         else:
-            pil_img = img
+            torch_input = img
         
         # Apply the style
         try:
@@ -93,31 +198,34 @@ class StyleLoader:
                 # OpenCV styles work with numpy arrays
                 if not is_numpy:
                     # Convert PIL to numpy BGR for OpenCV
-                    numpy_img = np.array(pil_img)
-                    numpy_img = numpy_img[:, :, ::-1]  # RGB to BGR
+                    with stage("preprocess"):
+                        numpy_img = np.array(img)
+                        numpy_img = numpy_img[:, :, ::-1]  # RGB to BGR
                 else:
                     numpy_img = img
                 
                 method = getattr(self.opencv_styler, style_name)
-                result = method(numpy_img)
+                with stage("inference"):
+                    result = method(numpy_img)
                 
                 # Convert result back to PIL Image (RGB)
                 if isinstance(result, np.ndarray):
-                    result_rgb = result[:, :, ::-1] if len(result.shape) == 3 else result
-                    return Image.fromarray(result_rgb.astype('uint8'), 'RGB')
+                    with stage("postprocess"):
+                        result_rgb = result[:, :, ::-1] if len(result.shape) == 3 else result
+                        return Image.fromarray(result_rgb.astype('uint8'), 'RGB')
                 return result
             
             # Neural styles
             elif style_name in Config.NEURAL_STYLES:
                 if style_name not in self.neural_models:
                     raise ValueError(f"Model for {style_name} not loaded. Check model file exists.")
-                return self.neural_models[style_name].stylize(pil_img)
+                return self.neural_models[style_name].stylize(torch_input)
             
             # Anime styles
             elif style_name in Config.CARTOON_STYLES:
                 if style_name not in self.anime_models:
                     raise ValueError(f"Model for {style_name} not loaded. Check model file exists.")
-                return self.anime_models[style_name].stylize(pil_img)
+                return self.anime_models[style_name].stylize(torch_input)
             
             else:
                 raise ValueError(f"Unknown style: {style_name}")
@@ -128,6 +236,97 @@ class StyleLoader:
             traceback.print_exc()
             raise
 
+    def apply_style_low_res(self, img, style_name, scale=None):
+        """
+        Apply a style at `scale` (default FAST_TIER_SCALE) of the size, then
+        upsample the result with a guided filter led by the full-size input
+        (utils.guided_filter); takes and returns images like apply_style
+        """
+        scale = Config.FAST_TIER_SCALE if scale is None else scale
+        with stage("preprocess"):
+            if isinstance(img, np.ndarray):
+                rgb = (cv2.cvtColor(img, cv2.COLOR_BGR2RGB) if img.ndim == 3
+                       else cv2.cvtColor(img.astype('uint8'), cv2.COLOR_GRAY2RGB))
+            else:
+                rgb = np.asarray(img.convert('RGB'))
+        height, width = rgb.shape[:2]
+        # Inputs are padded up to the smallest shape bucket, so going below it only loses detail
+        scale = max(scale, min(Config.SHAPE_BUCKETS, default=0) / max(height, width))
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        if size[0] >= width or size[1] >= height:
+            return self.apply_style(img, style_name)
+        with stage("resize"):
+            low = cv2.resize(rgb, size, interpolation=cv2.INTER_AREA)
+        styled = self.apply_style(Image.fromarray(low), style_name)
+        with stage("upsample"):
+            return Image.fromarray(guided_upsample(rgb, low, np.asarray(styled.convert('RGB'))))
+
+    def style_frames(self, frames, style_name, scale=None):
+        """
+        Style a list of RGB video frames; returns RGB uint8 arrays
+        
+        OpenCV styles run over T×H×W×3 stacks of BATCH_PROGRESS_FRAMES frames
+        (the result matches apply_style frame by frame). Other styles, and a
+        batch that fails, go frame by frame (from the first frame not styled
+        yet); a frame that fails keeps its original pixels. Entries of
+        `frames` are released as they are consumed, and each styled frame is
+        reported to the progress channel. A cancelled conversion stops before
+        the next frame or batch. With a `scale`, frame-by-frame styles run
+        through apply_style_low_res.
+        """
+        style_name = style_name.lower()
+        styled_frames = []
+        if style_name in Config.OPENCV_STYLES and frames:
+            stack = None
+            try:
+                with stage("preprocess"):
+                    first = np.asarray(frames[0])
+                    # The OpenCV methods receive BGR from apply_style
+                    stack = np.empty((len(frames),) + first.shape, dtype=np.uint8)
+                    for i, frame in enumerate(frames):
+                        cv2.cvtColor(np.asarray(frame), cv2.COLOR_RGB2BGR, dst=stack[i])
+                frames[:] = [None] * len(frames)
+                for start in range(0, len(stack), BATCH_PROGRESS_FRAMES):
+                    check_cancelled("style")
+                    with stage("inference"):
+                        styled = self.opencv_styler.apply_batch(style_name, stack[start:start + BATCH_PROGRESS_FRAMES])
+                    for frame in styled:
+                        styled_frames.append(frame)
+                        report_frame(frame)
+                return styled_frames
+            except ConversionCancelled:
+                raise
+            except Exception as e:
+                print(f"❌ Batch {style_name} failed, styling frame {len(styled_frames) + 1} on frame by frame: {e}")
+                if frames[-1] is None:
+                    # The decoded frames were released into the stack; take the unstyled ones back
+                    for i in range(len(styled_frames), len(frames)):
+                        frames[i] = Image.fromarray(cv2.cvtColor(stack[i], cv2.COLOR_BGR2RGB))
+                del stack
+        
+        for i in range(len(styled_frames), len(frames)):
+            frame = frames[i]
+            check_cancelled("style")
+            if i % 10 == 0:
+                print(f"⏳ Frame {i+1}/{len(frames)}")
+            try:
+                if scale is None:
+                    styled = self.apply_style(frame, style_name)
+                else:
+                    styled = self.apply_style_low_res(frame, style_name, scale)
+                with stage("postprocess"):
+                    styled = np.asarray(styled.convert('RGB'))
+            except StylerUnavailable:
+                raise
+            except Exception as e:
+                print(f"❌ Frame {i} failed: {e}")
+                styled = np.asarray(frame)
+            styled_frames.append(styled)
+            report_frame(styled)
+            # Drop the decoded frame so only one copy of each frame is alive
+            frames[i] = None
+        return styled_frames
+
     @property
     def models(self):
         """Return count of all loaded models"""
@@ -0,0 +1,92 @@
+import contextvars
+import time
+
+# Canonical order used when reporting stages
+STAGE_ORDER = ["decode", "resize", "cvtcolor", "preprocess", "inference", "postprocess", "encode", "mux"]
+
+_current_timer = contextvars.ContextVar("stage_timer", default=None)
+
+
+class StageTimer:
+    """Accumulates wall time per pipeline stage for one conversion"""
+
+    def __init__(self):
+        self.durations = {}
+        self.counts = {}
+        self.started = time.perf_counter()
+
+    def add(self, name, seconds):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def total_ms(self):
+        return (time.perf_counter() - self.started) * 1000.0
+
+    def as_dict(self):
+        """Stage timings in milliseconds, canonical stages first"""
+        names = [name for name in STAGE_ORDER if name in self.durations]
+        names += [name for name in self.durations if name not in STAGE_ORDER]
+        return {
+            name: {"ms": round(self.durations[name] * 1000.0, 3), "count": self.counts[name]}
+            for name in names
+        }
+
+    def server_timing(self):
+        """Format as a Server-Timing header value"""
+        parts = [f"{name};dur={stats['ms']:.1f}" for name, stats in self.as_dict().items()]
+        parts.append(f"total;dur={self.total_ms():.1f}")
+        return ", ".join(parts)
+
+    def activate(self):
+        """Bind this timer to the current context; returns a token for deactivate()"""
+        return _current_timer.set(self)
+
+    @staticmethod
+    def deactivate(token):
+        _current_timer.reset(token)
+
+
+class _Stage:
+    __slots__ = ("timer", "name", "start")
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+def stage(name):
+    """
+    Time a block against the active StageTimer
+
+    Returns a shared no-op context manager when no timer is active, so the
+    hooks cost a single context-variable lookup when timing is disabled.
+    """
+    timer = _current_timer.get()
+    if timer is None:
+        return _NULL_STAGE
+    return _Stage(timer, name)
+
+
+def current_timer():
+    return _current_timer.get()
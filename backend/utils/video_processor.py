@@ -1,9 +1,29 @@
 import cv2
-import imageio
 import numpy as np
-from PIL import Image
+from PIL import Image, ImageSequence
 import tempfile
+import io
 import os
+import time
+from config import Config
+from utils import metrics
+from utils.timing import stage
+from utils.image_processor import fit_within
+
+# GIF encoding: palette index 255 is reserved as the transparent "unchanged"
+# color; a frame is delta-encoded when at least this share of it is unchanged
+GIF_TRANSPARENT_INDEX = 255
+GIF_DELTA_MIN_UNCHANGED = 0.5
+GIF_PALETTE_SAMPLE_FRAMES = 16
+
+# Frame sampler: gaps shorter than this are always grabbed through, longer
+# ones are seeked over when the measured seek cost is lower
+SEEK_MIN_GAP = 8
+DEFAULT_VIDEO_FPS = 25.0
+
+
+def _ewma(current, sample, weight=0.3):
+    return sample if current is None else current + weight * (sample - current)
 
 class VideoProcessor:
     @staticmethod
@@ -19,105 +39,268 @@ class VideoProcessor:
         return filename.lower().endswith('.gif')
     
     @staticmethod
-    def extract_frames(video_bytes, max_frames=150):
-        """Extract frames from video bytes"""
+    def probe(video_bytes, filename):
+        """Return (width, height, frame_count, fps) from container metadata"""
+        if VideoProcessor.is_gif(filename):
+            with Image.open(io.BytesIO(video_bytes)) as gif:
+                duration = gif.info.get('duration', 100) or 100
+                return gif.size[0], gif.size[1], getattr(gif, 'n_frames', 1), 1000.0 / duration
+        
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as tmp:
+            tmp.write(video_bytes)
+            tmp_path = tmp.name
+        try:
+            cap = cv2.VideoCapture(tmp_path)
+            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            cap.release()
+            return width, height, frame_count, fps
+        finally:
+            os.unlink(tmp_path)
+    
+    @staticmethod
+    def sample_plan(frame_count, fps, max_frames, min_fps=None):
+        """
+        Source frame indices to style, and the output frame rate
+        
+        Clips with at most max_frames frames keep every frame. Longer clips
+        are sampled evenly over their whole duration, unless that would drop
+        below min_fps; then frames are taken at min_fps from the start and
+        the output covers the first max_frames / min_fps seconds. With an
+        unknown frame count, the first max_frames frames are taken.
+        """
+        min_fps = Config.VIDEO_MIN_FPS if min_fps is None else min_fps
+        if frame_count <= 0 or frame_count <= max_frames:
+            return list(range(max_frames if frame_count <= 0 else frame_count)), fps
+        step = max(frame_count / max_frames, 1.0)
+        if min_fps and fps / step < min_fps:
+            step = max(fps / min_fps, 1.0)
+        indices = sorted({int(i * step) for i in range(max_frames) if int(i * step) < frame_count})
+        return indices, fps / step
+    
+    @staticmethod
+    def extract_frames(video_bytes, max_frames=None, max_size=None, stats=None):
+        """
+        Decode the frames chosen by sample_plan, downscaled to max_size on the long side
+        
+        Only sampled frames are retrieved (converted to BGR and copied out of
+        the decoder). Frames in between are skipped with grab(), which leaves
+        out that conversion, or, when a gap costs more to grab through than a
+        seek, by seeking; seek and grab costs are measured as the clip is read.
+        `stats`, if given, receives the frame counts per action.
+        """
+        max_frames = max_frames or Config.MAX_VIDEO_FRAMES
         # Save bytes to temp file
         with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as tmp:
             tmp.write(video_bytes)
             tmp_path = tmp.name
         
+        counts = {"retrieved": 0, "grabbed": 0, "seeked": 0, "seeks": 0}
         try:
             # Read video
             cap = cv2.VideoCapture(tmp_path)
             fps = cap.get(cv2.CAP_PROP_FPS)
+            fps = fps if fps and fps > 0 else DEFAULT_VIDEO_FPS
             frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            
-            # Limit frames to prevent memory issues
-            if frame_count > max_frames:
-                frame_skip = frame_count // max_frames
-            else:
-                frame_skip = 1
-            
-            # ✅ FIX: Adjust FPS based on frame skipping
-            adjusted_fps = fps / frame_skip
+            indices, output_fps = VideoProcessor.sample_plan(frame_count, fps, max_frames)
             
             frames = []
-            frame_idx = 0
-            
-            while True:
-                ret, frame = cap.read()
-                if not ret:
+            position = 0      # index of the frame the next grab() returns
+            grab_ms = None    # measured cost of grabbing one frame
+            seek_ms = None    # measured cost of a seek plus grab
+            for target in indices:
+                gap = target - position
+                with stage("decode"):
+                    if gap >= SEEK_MIN_GAP and (seek_ms is None or grab_ms is None or seek_ms < gap * grab_ms):
+                        started = time.perf_counter()
+                        cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+                        ok = cap.grab()
+                        seek_ms = _ewma(seek_ms, (time.perf_counter() - started) * 1000.0)
+                        counts["seeks"] += 1
+                        counts["seeked"] += gap
+                    else:
+                        ok = True
+                        while ok and position <= target:
+                            started = time.perf_counter()
+                            ok = cap.grab()
+                            grab_ms = _ewma(grab_ms, (time.perf_counter() - started) * 1000.0)
+                            position += 1
+                        counts["grabbed"] += gap
+                    if not ok:
+                        break
+                    position = target + 1
+                    
+                    ok, frame = cap.retrieve()
+                if not ok:
                     break
+                counts["retrieved"] += 1
                 
-                if frame_idx % frame_skip == 0:
-                    # Convert BGR to RGB
+                # Shrink right after decode so later stages touch fewer pixels
+                frame = VideoProcessor._shrink(frame, max_size)
+                
+                # Convert BGR to RGB
+                with stage("cvtcolor"):
                     frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
                     frames.append(Image.fromarray(frame_rgb))
-                
-                frame_idx += 1
             
             cap.release()
             
-            # ✅ Return adjusted FPS
-            return frames, adjusted_fps
+            for action in ("retrieved", "grabbed", "seeked"):
+                metrics.VIDEO_DECODE_FRAMES.inc(counts[action], action=action)
+            if stats is not None:
+                stats.update(counts)
+            return frames, output_fps
             
         finally:
             os.unlink(tmp_path)
     
     @staticmethod
-    def extract_gif_frames(gif_bytes):
-        """Extract frames from GIF bytes"""
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.gif') as tmp:
-            tmp.write(gif_bytes)
-            tmp_path = tmp.name
+    def extract_gif_frames(gif_bytes, max_size=None, max_frames=None):
+        """
+        Decode GIF bytes in one pass from memory
         
-        try:
-            gif = imageio.mimread(tmp_path)
-            frames = [Image.fromarray(frame) for frame in gif]
-            
-            # Get duration (FPS) from GIF metadata
-            reader = imageio.get_reader(tmp_path)
-            meta = reader.get_meta_data()
-            duration = meta.get('duration', 100) / 1000.0  # Convert ms to seconds
-            fps = 1.0 / duration if duration > 0 else 10
+        Returns (frames, fps, timing): RGB frames downscaled to max_size on
+        the long side, the average frame rate, and {"durations", "loop"} with
+        each frame's display time in ms for create_video. Decoding stops after
+        max_frames frames.
+        """
+        frames = []
+        durations = []
+        with Image.open(io.BytesIO(gif_bytes)) as gif:
+            loop = gif.info.get('loop', 0)
+            for frame in ImageSequence.Iterator(gif):
+                if max_frames and len(frames) >= max_frames:
+                    break
+                with stage("decode"):
+                    # Later frames are composited onto the canvas by Pillow
+                    frame_rgb = np.asarray(frame.convert('RGB'))
+                durations.append(VideoProcessor._gif_duration(frame.info.get('duration')))
+                frames.append(Image.fromarray(VideoProcessor._shrink(frame_rgb, max_size)))
+        
+        fps = 1000.0 * len(durations) / sum(durations) if durations else 10
+        return frames, fps, {"durations": durations, "loop": loop}
+    
+    @staticmethod
+    def _gif_duration(duration):
+        """Frame delay in ms as browsers play it (0 and 10 ms mean 100 ms)"""
+        return duration if duration and duration > 10 else 100
+    
+    @staticmethod
+    def _shrink(frame, max_size):
+        """Area-resize a decoded frame array to max_size on the long side"""
+        height, width = frame.shape[:2]
+        if not max_size or max(width, height) <= max_size:
+            return frame
+        with stage("resize"):
+            return cv2.resize(frame, fit_within((width, height), max_size), interpolation=cv2.INTER_AREA)
+    
+    @staticmethod
+    def encode_gif(frames, durations, loop=0, palette=None, delta=None):
+        """
+        Encode RGB frames as an animated GIF in memory
+        
+        palette="global" quantizes every frame against one palette built from
+        a sample of the clip, which is much faster than a median cut per frame
+        and lets frames be compared by palette index. With delta, pixels that
+        did not change since the previous frame are written as the transparent
+        index (on disposal 1, "keep"), so only changes are encoded; Pillow
+        also crops each frame to the box that changed. Frames that do not
+        change at all are merged into the previous frame's duration.
+        palette="per_frame" quantizes each frame on its own (no delta).
+        """
+        palette = palette or Config.GIF_PALETTE
+        delta = Config.GIF_FRAME_DELTA if delta is None else delta
+        if not frames:
+            return None
+        
+        buffer = io.BytesIO()
+        with stage("encode"):
+            if palette == 'per_frame':
+                images = [Image.fromarray(np.asarray(frame)).quantize(colors=256) for frame in frames]
+                images[0].save(buffer, 'GIF', save_all=True, append_images=images[1:],
+                               duration=list(durations), loop=loop, optimize=False)
+                return buffer.getvalue()
             
-            return frames, fps
+            palette_image, palette_bytes = VideoProcessor._global_palette(frames)
+            images = []
+            kept_durations = []
+            previous = None
+            for frame, duration in zip(frames, durations):
+                indices = np.asarray(Image.fromarray(np.asarray(frame)).quantize(
+                    palette=palette_image, dither=Image.Dither.NONE))
+                written = indices
+                if previous is not None:
+                    unchanged = indices == previous
+                    if unchanged.all():
+                        kept_durations[-1] += duration
+                        continue
+                    if delta and unchanged.mean() >= GIF_DELTA_MIN_UNCHANGED:
+                        written = np.where(unchanged, GIF_TRANSPARENT_INDEX, indices).astype(np.uint8)
+                previous = indices
+                image = Image.fromarray(written, 'P')
+                image.putpalette(palette_bytes)
+                images.append(image)
+                kept_durations.append(duration)
             
-        finally:
-            os.unlink(tmp_path)
+            images[0].save(buffer, 'GIF', save_all=True, append_images=images[1:],
+                           duration=kept_durations, loop=loop, optimize=False,
+                           transparency=GIF_TRANSPARENT_INDEX, disposal=1)
+        return buffer.getvalue()
+    
+    @staticmethod
+    def _global_palette(frames):
+        """
+        255-color palette from a subsample of up to GIF_PALETTE_SAMPLE_FRAMES
+        frames; the last entry is a spare color used as the transparent index
+        """
+        step = max(1, len(frames) // GIF_PALETTE_SAMPLE_FRAMES)
+        sample = np.concatenate([np.asarray(frame)[::4, ::4] for frame in frames[::step]], axis=0)
+        palette_image = Image.fromarray(np.ascontiguousarray(sample)).quantize(colors=GIF_TRANSPARENT_INDEX)
+        
+        palette_bytes = palette_image.getpalette()[:GIF_TRANSPARENT_INDEX * 3]
+        palette_bytes += [0] * (GIF_TRANSPARENT_INDEX * 3 - len(palette_bytes))
+        # The transparent slot needs a color of its own, or Pillow merges it
+        # with a duplicate while normalizing the palette
+        used = {tuple(palette_bytes[i:i + 3]) for i in range(0, len(palette_bytes), 3)}
+        spare = next((v, v, 1) for v in range(256) if (v, v, 1) not in used)
+        return palette_image, palette_bytes + list(spare)
     
     @staticmethod
-    def create_video(frames, fps, output_format='mp4'):
-        """Create video from styled frames"""
+    def create_video(frames, fps, output_format='mp4', durations=None, loop=0):
+        """Create video from styled frames (GIFs keep per-frame durations in ms)"""
+        if output_format == 'gif':
+            durations = durations or [1000.0 / fps] * len(frames)
+            return VideoProcessor.encode_gif(frames, [int(round(d)) for d in durations[:len(frames)]], loop)
+        
         with tempfile.NamedTemporaryFile(delete=False, suffix=f'.{output_format}') as tmp:
             tmp_path = tmp.name
         
         try:
-            if output_format == 'gif':
-                # Create GIF
-                frames_np = [np.array(frame) for frame in frames]
-                duration = 1.0 / fps
-                imageio.mimsave(tmp_path, frames_np, duration=duration, loop=0)
-            else:
-                # Create MP4
-                if not frames:
-                    return None
-                
-                height, width = np.array(frames[0]).shape[:2]
-                
-                fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-                out = cv2.VideoWriter(tmp_path, fourcc, fps, (width, height))
-                
-                for frame in frames:
+            # Create MP4
+            if not frames:
+                return None
+            
+            height, width = np.array(frames[0]).shape[:2]
+            
+            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+            out = cv2.VideoWriter(tmp_path, fourcc, fps, (width, height))
+            
+            for frame in frames:
+                with stage("cvtcolor"):
                     frame_np = np.array(frame)
                     frame_bgr = cv2.cvtColor(frame_np, cv2.COLOR_RGB2BGR)
+                with stage("encode"):
                     out.write(frame_bgr)
-                
+            
+            with stage("mux"):
                 out.release()
             
             # Read the created file
-            with open(tmp_path, 'rb') as f:
-                video_bytes = f.read()
+            with stage("mux"):
+                with open(tmp_path, 'rb') as f:
+                    video_bytes = f.read()
             
             return video_bytes
             
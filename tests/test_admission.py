@@ -0,0 +1,58 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from utils import metrics  # noqa: E402
+from utils.admission import AdmissionController, AdmissionRejected, conversion_lane  # noqa: E402
+
+LANES = {"instant": (2, 4), "model": (1, 4), "video": (1, 1)}
+
+
+def test_conversion_lanes():
+    assert conversion_lane("sepia", is_video=False) == "instant"
+    assert conversion_lane("candy", is_video=False) == "model"
+    assert conversion_lane("shinkai", is_video=False) == "model"
+    assert conversion_lane("sepia", is_video=True) == "video"
+
+
+def test_image_does_not_queue_behind_video():
+    async def scenario():
+        admission = AdmissionController(budget_bytes=1000, lanes=LANES)
+        video = await admission.acquire(100, "video", seconds=60)
+        # The video lane is full: the next video waits...
+        queued = asyncio.ensure_future(admission.acquire(100, "video", seconds=60))
+        await asyncio.sleep(0)
+        assert not queued.done()
+        # ...but an image starts right away
+        image = await asyncio.wait_for(admission.acquire(10, "instant", seconds=0.05), 1)
+        admission.release(image)
+
+        # A full lane queue is rejected with that lane's backlog as Retry-After
+        with pytest.raises(AdmissionRejected) as rejected:
+            await admission.acquire(100, "video", seconds=60)
+        assert rejected.value.status_code == 503 and rejected.value.retry_after == 120
+
+        admission.release(video)
+        admission.release(await asyncio.wait_for(queued, 1))
+        assert admission.running == 0 and admission.committed == 0
+
+    asyncio.run(scenario())
+
+
+def test_memory_still_shared_across_lanes():
+    async def scenario():
+        admission = AdmissionController(budget_bytes=100, lanes=LANES)
+        video = await admission.acquire(90, "video")
+        image = asyncio.ensure_future(admission.acquire(20, "instant"))
+        await asyncio.sleep(0)
+        assert not image.done()
+        admission.release(video)
+        admission.release(await asyncio.wait_for(image, 1))
+
+    asyncio.run(scenario())
+    rendered = metrics.registry.render()
+    assert 'style_queue_wait_seconds_count{lane="instant"}' in rendered
@@ -0,0 +1,76 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from utils.cancellation import CancelToken, ConversionCancelled, check_cancelled  # noqa: E402
+from utils.jobs import JobRegistry  # noqa: E402
+from utils.style_loader import StyleLoader  # noqa: E402
+
+
+def test_token_runs_callbacks_once():
+    token = CancelToken()
+    calls = []
+    token.on_cancel(lambda: calls.append("early"))
+    unregister = token.on_cancel(lambda: calls.append("gone"))
+    unregister()
+
+    assert token.cancel("delete")
+    assert not token.cancel("disconnect")
+    assert token.reason == "delete" and calls == ["early"]
+    # Registering after the fact calls back right away
+    token.on_cancel(lambda: calls.append("late"))
+    assert calls == ["early", "late"]
+
+
+def test_check_cancelled_uses_the_active_token():
+    check_cancelled()  # no token: never cancelled
+    token = CancelToken()
+    context = token.activate()
+    try:
+        check_cancelled("decode")
+        token.cancel("disconnect")
+        with pytest.raises(ConversionCancelled) as raised:
+            check_cancelled("style")
+        assert (raised.value.reason, raised.value.stage) == ("disconnect", "style")
+    finally:
+        CancelToken.deactivate(context)
+    check_cancelled()
+
+
+def test_style_frames_stops_between_batches(monkeypatch):
+    style_loader = StyleLoader(lite=True)
+    token = CancelToken()
+    apply_batch = style_loader.opencv_styler.apply_batch
+    batches = []
+
+    def cancel_after_first_batch(style, stack):
+        batches.append(len(stack))
+        token.cancel("delete")
+        return apply_batch(style, stack)
+
+    monkeypatch.setattr(style_loader.opencv_styler, "apply_batch", cancel_after_first_batch)
+    frames = [np.full((24, 32, 3), i, dtype=np.uint8) for i in range(40)]
+    context = token.activate()
+    try:
+        with pytest.raises(ConversionCancelled):
+            style_loader.style_frames(frames, "sepia")
+    finally:
+        CancelToken.deactivate(context)
+    # One batch ran, the other two were skipped and the decoded frames released
+    assert batches == [16]
+    assert all(frame is None for frame in frames)
+
+
+def test_only_running_jobs_can_be_cancelled():
+    jobs = JobRegistry(max_jobs=4)
+    job = jobs.create("media", "sepia", "video")
+    assert not job.cancel("delete")  # no token yet
+    job.cancel_token = CancelToken()
+    assert job.cancel("delete") and job.cancel_token.reason == "delete"
+
+    job.finish("cancelled", "Conversion cancelled")
+    assert not job.cancel("delete")
@@ -0,0 +1,59 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from config import Config  # noqa: E402
+from utils.admission import AdmissionController  # noqa: E402
+from utils.cost_model import StyleCostModel  # noqa: E402
+from utils.style_loader import StyleLoader  # noqa: E402
+
+
+def test_estimates_fall_back_and_follow_live_timings(tmp_path):
+    model = StyleCostModel(str(tmp_path / "costs.json"))
+    assert model.ms_per_megapixel("candy") == Config.COST_PRIOR_MS_PER_MEGAPIXEL["neural"]
+
+    model.record("candy", "image", 1.0, 0.25, source="calibrated")
+    assert model.ms_per_megapixel("candy") == 4000
+    # Videos borrow the image cost until they have their own timings
+    assert model.snapshot()["candy"]["video"] == {"ms_per_megapixel": 4000, "samples": 0, "source": "image"}
+    assert model.estimate_seconds("candy", "video", 0.5, frames=10) == pytest.approx(20)
+
+    model.record("candy", "image", 2.0, 0.25)
+    assert model.ms_per_megapixel("candy") == pytest.approx(4000 + 0.3 * 4000)
+    assert model.snapshot()["candy"]["image"]["source"] == "measured"
+
+    model.save()
+    reloaded = StyleCostModel(model.path)
+    assert reloaded.load() == 1
+    assert reloaded.ms_per_megapixel("candy") == pytest.approx(5200)
+    assert not reloaded.has("candy", "video")
+
+
+def test_unreadable_file_is_ignored(tmp_path):
+    path = tmp_path / "costs.json"
+    path.write_text('{"costs": {"sepia": {"image": {"ms_per_megapixel": "fast", "source": "measured"}}}}')
+    model = StyleCostModel(str(path))
+    assert model.load() == 0
+    assert model.snapshot()["sepia"]["image"]["source"] == "default"
+
+
+def test_calibrate_times_servable_styles(tmp_path):
+    model = StyleCostModel(str(tmp_path / "costs.json"))
+    results = model.calibrate(StyleLoader(lite=True), ["sepia", "candy"], size=64, repeat=1)
+    assert list(results) == ["sepia"]
+    assert results["sepia"]["image"] > 0 and results["sepia"]["video"] > 0
+    assert model.snapshot()["sepia"]["video"]["source"] == "calibrated"
+
+
+def test_retry_after_uses_expected_seconds():
+    async def scenario():
+        admission = AdmissionController(budget_bytes=100, lanes={"instant": (1, 0)})
+        reservation = await admission.acquire(100, "instant", seconds=30)
+        assert 29 <= admission.retry_after("instant") <= 30
+        admission.release(reservation)
+
+    asyncio.run(scenario())
@@ -0,0 +1,132 @@
+import math
+import os
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from PIL import Image
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from config import Config  # noqa: E402
+from utils import deadline  # noqa: E402
+from utils.deadline import plan_scale, plan_frame_step, style_within_budget  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def budget_config(monkeypatch):
+    monkeypatch.setattr(Config, "BUDGET_MIN_SCALE", 0.25)
+    monkeypatch.setattr(Config, "BUDGET_MIN_FPS", 4.0)
+    monkeypatch.setattr(Config, "BUDGET_PROBE_FRAMES", 3)
+    monkeypatch.setattr(Config, "BUDGET_CHUNK_FRAMES", 10)
+
+
+def test_plan_scale_full_size_when_budget_allows():
+    assert plan_scale(100.0, 10, 1.0, 1.0) == 1.0
+    assert plan_scale(10.0, 10, 1.0, 1.0) == 1.0
+    assert plan_scale(5.0, 0, 1.0, 1.0) == 1.0
+
+
+def test_plan_scale_shrinks_with_pixel_cost():
+    # 10 frames of 1MP at 1s/MP need 10s; 4s allows sqrt(0.4) = 0.63 per side
+    assert plan_scale(4.0, 10, 1.0, 1.0) == pytest.approx(0.6)
+    assert plan_scale(4.0, 10, 0.5, 2.0) == pytest.approx(0.6)
+    # Rounded down, so the planned frames fit
+    scale = plan_scale(7.0, 10, 1.0, 1.0)
+    assert 10 * scale ** 2 <= 7.0
+    assert scale == pytest.approx(0.8)
+
+
+def test_plan_scale_floors_at_min_scale_when_budget_cannot_be_met():
+    assert plan_scale(0.1, 10, 1.0, 1.0) == 0.25
+    assert plan_scale(0.0, 10, 1.0, 1.0) == 0.25
+    assert plan_scale(-3.0, 10, 1.0, 1.0) == 0.25
+    # Free styles always run at full size
+    assert plan_scale(-3.0, 10, 0.0, 1.0) == 1.0
+
+
+def test_plan_frame_step():
+    assert plan_frame_step(10.0, 30, 0.1, 30) == 1
+    # 30 frames at 0.1s need 3s; 1.05s holds 10 frames -> every 3rd frame
+    assert plan_frame_step(1.05, 30, 0.1, 30) == 3
+    assert plan_frame_step(1.6, 30, 0.1, 30) == 2
+
+
+def test_plan_frame_step_keeps_min_fps_when_budget_cannot_be_met(monkeypatch):
+    # 30fps never drops below 4fps: at most every 7th frame
+    assert plan_frame_step(0.01, 30, 0.1, 30) == 7
+    assert plan_frame_step(-1.0, 30, 0.1, 30) == 7
+    assert plan_frame_step(0.01, 30, 0.1, 5) == 1
+    monkeypatch.setattr(Config, "BUDGET_MIN_FPS", 0)
+    assert plan_frame_step(0.01, 30, 0.1, 30) == 30
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TimedStyler:
+    """Styling that advances a fake clock by a fixed cost per megapixel"""
+
+    def __init__(self, clock, seconds_per_megapixel):
+        self.clock = clock
+        self.seconds_per_megapixel = seconds_per_megapixel
+        self.sizes = []
+
+    def style_frames(self, frames, style):
+        styled = []
+        for frame in frames:
+            frame = np.asarray(frame)
+            self.sizes.append(frame.shape[1::-1])
+            self.clock.now += self.seconds_per_megapixel * frame.shape[0] * frame.shape[1] / 1e6
+            styled.append(255 - frame)
+        return styled
+
+
+def run_budget(monkeypatch, budget, count=33, fps=30, durations=None):
+    clock = FakeClock()
+    monkeypatch.setattr(deadline, "time", SimpleNamespace(perf_counter=clock, monotonic=clock))
+    monkeypatch.setattr(deadline, "ENCODE_SECONDS_PER_MEGAPIXEL", {"mp4": 0.0})
+    styler = TimedStyler(clock, seconds_per_megapixel=100.0)
+    frames = [Image.fromarray(np.full((48, 64, 3), i, dtype=np.uint8)) for i in range(count)]
+    result = style_within_budget(styler, frames, "sepia", fps, clock() + budget, budget, durations)
+    return clock, styler, frames, result
+
+
+def test_style_within_budget_full_size_when_budget_allows(monkeypatch):
+    # 33 frames of 64x48 at 100s/MP take ~10.1s
+    clock, styler, frames, (styled, fps, _, settings) = run_budget(monkeypatch, 20.0)
+    assert len(styled) == 33 and fps == 30
+    assert settings["frame_step"] == 1 and settings["scale"] == 1.0
+    assert all(size == (64, 48) for size in styler.sizes)
+    assert np.array_equal(styled[5], np.full((48, 64, 3), 250, dtype=np.uint8))
+    assert all(frame is None for frame in frames)
+
+
+def test_style_within_budget_lowers_scale_to_meet_deadline(monkeypatch):
+    clock, styler, _, (styled, fps, _, settings) = run_budget(monkeypatch, 5.0)
+    assert len(styled) == 33 and fps == 30
+    assert settings["frame_step"] == 1
+    assert 0.25 <= settings["scale_min"] < 1.0
+    assert settings["inference_size"][0] < 64
+    assert clock.now - 1000.0 <= 5.0 * 1.05
+    # Styled at a lower resolution, delivered at the input size
+    assert all(np.asarray(frame).shape == (48, 64, 3) for frame in styled)
+
+
+def test_style_within_budget_drops_frames_when_budget_cannot_be_met(monkeypatch):
+    durations = [0.1] * 33
+    _, styler, _, (styled, fps, durations, settings) = run_budget(monkeypatch, 0.5, durations=durations)
+    # Even the probe overruns: every 7th frame (30fps -> 4.3fps) at the minimum scale
+    assert settings["frame_step"] == 7
+    assert fps == pytest.approx(30 / 7)
+    assert len(styled) == math.ceil(33 / 7) == settings["frames"]
+    assert settings["scale_min"] == 0.25
+    assert styler.sizes[3:] == [(16, 12)] * 4
+    assert durations == pytest.approx([0.7, 0.7, 0.7, 0.7, 0.5])
+    assert all(np.asarray(frame).shape == (48, 64, 3) for frame in styled)
@@ -0,0 +1,89 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from config import Config  # noqa: E402
+from utils.admission import AdmissionController, AdmissionRejected  # noqa: E402
+from utils.fair_share import ClientBudgets, FairQueue, client_identity  # noqa: E402
+
+LANES = {"instant": (1, 100)}
+
+
+def test_fair_queue_interleaves_clients():
+    queue = FairQueue()
+    for i in range(4):
+        queue.push(("flood", i), "flood")
+    queue.push(("light", 0), "light")
+    queue.push(("heavy", 0), "heavy", cost=1.0, weight=4.0)
+    queue.push(("heavy", 1), "heavy", cost=1.0, weight=4.0)
+    order = [queue.pop() for _ in range(len(queue))]
+    # The light client goes second, not after the whole flood; the weighted client twice as often
+    assert order[:4] == [("heavy", 0), ("heavy", 1), ("flood", 0), ("light", 0)]
+    assert order[4:] == [("flood", 1), ("flood", 2), ("flood", 3)]
+
+
+def test_unknown_api_key_falls_back_to_address(monkeypatch):
+    monkeypatch.setattr(Config, "CLIENT_WEIGHTS", {"partner": 3.0})
+    client, weight = client_identity("partner", "10.0.0.1")
+    assert client.startswith("key:") and "partner" not in client and weight == 3.0
+    assert client_identity("made-up", "10.0.0.1") == ("ip:10.0.0.1", 1.0)
+    assert client_identity(None, "10.0.0.1", "1.2.3.4") == ("ip:10.0.0.1", 1.0)
+    monkeypatch.setattr(Config, "TRUST_FORWARDED_FOR", True)
+    assert client_identity(None, "10.0.0.1", "1.2.3.4, 10.0.0.1") == ("ip:1.2.3.4", 1.0)
+
+
+def test_budget_refills_over_window():
+    budgets = ClientBudgets(capacity=10, window=100)
+    assert budgets.retry_after("a") == 0
+    budgets.charge("a", 15)
+    # 5 seconds in debt, refilled at 0.1 s/s
+    assert 50 <= budgets.retry_after("a") <= 52
+    assert budgets.retry_after("b") == 0
+    assert budgets.remaining("a", weight=2.0) == pytest.approx(-5, abs=0.01)
+
+
+def test_client_over_budget_gets_429():
+    async def scenario():
+        admission = AdmissionController(lanes=LANES, client_budgets=ClientBudgets(capacity=10, window=100))
+        first = await admission.acquire(1, "instant", seconds=8, client="a")
+        second = asyncio.ensure_future(admission.acquire(1, "instant", seconds=8, client="a"))
+        await asyncio.sleep(0)
+        # Both estimates are charged up front, so a third request is turned away at once
+        with pytest.raises(AdmissionRejected) as rejected:
+            await admission.acquire(1, "instant", seconds=8, client="a")
+        assert rejected.value.status_code == 429 and rejected.value.retry_after >= 60
+        # Another client is unaffected and queues behind the running job
+        other = asyncio.ensure_future(admission.acquire(1, "instant", seconds=8, client="b"))
+        await asyncio.sleep(0)
+
+        # Settled to the measured duration (near zero here), a's budget is back
+        admission.release(first)
+        admission.release(await asyncio.wait_for(second, 1))
+        admission.release(await asyncio.wait_for(other, 1))
+        assert admission.client_budgets.remaining("a") == pytest.approx(10, abs=0.1)
+
+    asyncio.run(scenario())
+
+
+def test_client_queue_share_and_refund_on_timeout():
+    async def scenario():
+        admission = AdmissionController(lanes=LANES, queue_timeout=0.05, client_max_queued=1,
+                                        client_budgets=ClientBudgets(capacity=100, window=100))
+        running = await admission.acquire(1, "instant", seconds=1, client="b")
+        queued = asyncio.ensure_future(admission.acquire(1, "instant", seconds=5, client="a"))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await admission.acquire(1, "instant", seconds=5, client="a")
+        assert rejected.value.status_code == 429
+        # The queued job times out and its charge is returned
+        with pytest.raises(AdmissionRejected) as timed_out:
+            await queued
+        assert timed_out.value.status_code == 503
+        assert admission.client_budgets.remaining("a") == pytest.approx(100, abs=0.1)
+        admission.release(running)
+
+    asyncio.run(scenario())
@@ -0,0 +1,40 @@
+import os
+import sys
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from utils.guided_filter import guided_upsample  # noqa: E402
+from utils.style_loader import StyleLoader  # noqa: E402
+from benchmarks.synthetic import make_frame  # noqa: E402
+from benchmarks.tiers import psnr  # noqa: E402
+
+
+def half(image):
+    return cv2.resize(image, (image.shape[1] // 2, image.shape[0] // 2), interpolation=cv2.INTER_AREA)
+
+
+def test_recovers_a_tone_curve_of_the_guide():
+    guide = make_frame(256, 192, seed=3)
+    gray = cv2.cvtColor(guide, cv2.COLOR_RGB2GRAY).astype(np.float32)
+    # A "style" that maps luminance to colors linearly: the filter should recover its full-size result
+    expected = np.clip(np.stack([0.5 * gray + 40, 255 - gray, 0.8 * gray], axis=2), 0, 255).astype(np.uint8)
+    low = half(guide)
+    upsampled = guided_upsample(guide, low, half(expected), radius=2, eps=1e-4)
+
+    assert upsampled.shape == expected.shape and upsampled.dtype == np.uint8
+    bilinear = cv2.resize(half(expected), (256, 192), interpolation=cv2.INTER_LINEAR)
+    assert psnr(upsampled, expected) > psnr(bilinear, expected) + 3
+
+
+def test_low_res_styling_keeps_the_size():
+    style_loader = StyleLoader(lite=True)
+    frame = make_frame(200, 150, seed=1)
+
+    styled = style_loader.apply_style_low_res(frame[:, :, ::-1].copy(), "sepia", scale=0.5)
+    assert styled.size == (200, 150) and styled.mode == "RGB"
+    # At full scale it is plain apply_style
+    full = style_loader.apply_style_low_res(frame[:, :, ::-1].copy(), "sepia", scale=1.0)
+    assert np.array_equal(np.asarray(full), np.asarray(style_loader.apply_style(frame[:, :, ::-1].copy(), "sepia")))
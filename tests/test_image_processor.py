@@ -0,0 +1,114 @@
+import io
+import os
+import sys
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+import app as app_module  # noqa: E402
+from config import Config  # noqa: E402
+from utils.image_processor import ImageProcessor, OUTPUT_MIME_TYPES  # noqa: E402
+from utils.results import ResultStore  # noqa: E402
+from benchmarks.synthetic import make_frame  # noqa: E402
+
+negotiate = ImageProcessor.negotiate_format
+
+
+def test_default_without_accept():
+    assert negotiate() == "jpeg"
+    assert negotiate("text/html, application/json") == "jpeg"
+    assert negotiate("*/*") == "jpeg"
+
+
+def test_accept_q_values():
+    assert negotiate("image/webp") == "webp"
+    assert negotiate("image/png;q=0.5, image/webp;q=0.8") == "webp"
+    assert negotiate("image/png; q=0.9, image/webp;q=0.8, image/jpeg;q=0.1") == "png"
+    # Ties go to the type listed first; bad q values count as 0
+    assert negotiate("image/png, image/webp") == "png"
+    assert negotiate("image/webp;q=high, image/png;q=0.2") == "png"
+    assert negotiate("IMAGE/WEBP") == "webp"
+
+
+def test_q_zero_rules_a_type_out():
+    assert negotiate("image/webp;q=0") == "jpeg"
+    assert negotiate("image/webp;q=0, image/png;q=0.1") == "png"
+    # The default is not picked once it is ruled out
+    assert negotiate("image/jpeg;q=0") == "webp"
+    assert negotiate("image/jpeg;q=0, image/webp;q=0") == "png"
+    assert negotiate("image/*, image/jpeg;q=0") == "webp"
+    assert negotiate("image/jpeg;q=0, image/webp;q=0, image/png;q=0") == "jpeg"
+
+
+def test_wildcards_cover_types_not_listed():
+    # Browsers: WebP listed, everything else through */*
+    assert negotiate("image/avif,image/webp,image/apng,*/*;q=0.8") == "webp"
+    assert negotiate("image/png;q=0.5, image/*") == "jpeg"
+    assert negotiate("image/png;q=0.5, image/*;q=0.4") == "png"
+    # image/* is more specific than */*
+    assert negotiate("image/png;q=0.5, image/*;q=0.4, */*;q=0.9") == "png"
+    assert negotiate("*/*;q=0.1, image/png;q=0.05") == "jpeg"
+
+
+def test_requested_format_overrides_accept():
+    assert negotiate("image/webp", "png") == "png"
+    assert negotiate("image/webp", "JPG") == "jpeg"
+    assert negotiate("image/webp", "auto") == "webp"
+    with pytest.raises(ValueError):
+        negotiate("image/webp", "avif")
+
+
+def test_every_format_has_every_encoder_profile():
+    profiles = set(Config.ENCODER_PROFILES[Config.DEFAULT_OUTPUT_FORMAT])
+    assert Config.DEFAULT_ENCODER_PROFILE in profiles
+    assert set(Config.ENCODER_PROFILES) == set(OUTPUT_MIME_TYPES)
+    img = Image.fromarray(make_frame(64, 48, seed=1))
+    for fmt, by_profile in Config.ENCODER_PROFILES.items():
+        assert set(by_profile) == profiles
+        for profile in by_profile:
+            data = ImageProcessor.image_to_bytes(img, fmt, profile)
+            with Image.open(io.BytesIO(data)) as decoded:
+                assert decoded.format.lower() == fmt and decoded.size == (64, 48)
+
+
+@pytest.mark.parametrize("fmt, mode", [("jpeg", "L"), ("png", "L"), ("webp", "RGB")])
+def test_grayscale_styles_encode_single_channel(fmt, mode):
+    gray = np.repeat(make_frame(64, 48, seed=2)[:, :, :1], 3, axis=2)
+    data = ImageProcessor.image_to_bytes(Image.fromarray(gray), fmt, grayscale=True)
+    with Image.open(io.BytesIO(data)) as decoded:
+        assert decoded.mode == mode
+    data = ImageProcessor.image_to_bytes(Image.fromarray(gray), fmt)
+    with Image.open(io.BytesIO(data)) as decoded:
+        assert decoded.mode == "RGB"
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "CANCEL_ON_DISCONNECT", False)
+    monkeypatch.setattr(app_module, "result_store", ResultStore(directory=str(tmp_path)))
+    client = TestClient(app_module.app)
+    buffer = io.BytesIO()
+    Image.fromarray(make_frame(48, 32, seed=3)).save(buffer, 'PNG')
+    response = client.post("/api/upload", files={"file": ("photo.png", buffer.getvalue(), "image/png")})
+    client.media_id = response.json()["media_id"]
+    return client
+
+
+def test_convert_negotiates_the_output_format(client):
+    def convert(accept, **fields):
+        return client.post("/api/convert", data={"media_id": client.media_id, "style": "emboss", **fields},
+                           headers={"Accept": accept})
+
+    response = convert("image/webp,*/*;q=0.8")
+    assert response.headers["content-type"] == "image/webp" and "Accept" in response.headers["vary"]
+    # The form field wins over Accept
+    response = convert("image/webp", output_format="png")
+    assert response.headers["content-type"] == "image/png"
+    with Image.open(io.BytesIO(response.content)) as decoded:
+        assert decoded.mode == "L"
+    assert convert("image/webp", output_format="gif").status_code == 400
+    assert convert("image/webp", encoder_profile="lossless").status_code == 400
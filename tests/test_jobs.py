@@ -0,0 +1,164 @@
+import io
+import os
+import sys
+import threading
+import time
+import uuid
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+import app as app_module  # noqa: E402
+from config import Config  # noqa: E402
+from utils.admission import AdmissionController  # noqa: E402
+from utils.cancellation import CancelToken  # noqa: E402
+from utils.jobs import JobRegistry, SharedJobs  # noqa: E402
+from utils import metrics  # noqa: E402
+from utils.media_store import FileMediaStore  # noqa: E402
+from utils.profiler import ProfileCapture, ProfileSession  # noqa: E402
+from utils.results import ResultStore  # noqa: E402
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+def upload(client, seed):
+    pixels = (np.random.default_rng(seed).random((32, 48, 3)) * 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, 'PNG')
+    response = client.post("/api/upload", files={"file": ("photo.png", buffer.getvalue(), "image/png")})
+    assert response.status_code == 200
+    return response.json()["media_id"]
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "CANCEL_ON_DISCONNECT", False)
+    monkeypatch.setattr(app_module, "result_store", ResultStore(directory=str(tmp_path)))
+    monkeypatch.setattr(app_module, "job_registry", JobRegistry())
+    # One conversion at a time, so the second one queues
+    monkeypatch.setattr(app_module, "admission", AdmissionController(
+        lanes={"instant": (1, 4), "model": (1, 4), "video": (1, 4)}))
+    return TestClient(app_module.app)
+
+
+def test_delete_cancels_queued_and_running_jobs(client, monkeypatch):
+    styling = threading.Event()
+    release = threading.Event()
+    apply_style = app_module.style_loader.apply_style
+
+    def blocking_apply_style(img, style):
+        styling.set()
+        release.wait(10)
+        return apply_style(img, style)
+
+    monkeypatch.setattr(app_module.style_loader, "apply_style", blocking_apply_style)
+    running_id, queued_id = str(uuid.uuid4()), str(uuid.uuid4())
+    responses = {}
+
+    def convert(media_id, job_id):
+        responses[job_id] = client.post("/api/convert", data={"media_id": media_id, "style": "sepia",
+                                                              "job_id": job_id})
+
+    threads = [threading.Thread(target=convert, args=(upload(client, 1), running_id))]
+    threads[0].start()
+    styling.wait(10)
+    threads.append(threading.Thread(target=convert, args=(upload(client, 2), queued_id)))
+    threads[1].start()
+    lane = app_module.admission.lanes["instant"]
+    wait_for(lambda: len(lane.waiters) == 1)
+
+    # The queued job is known by the ID its client chose and leaves the queue
+    assert client.get(f"/api/jobs/{queued_id}").json()["status"] == "queued"
+    response = client.delete(f"/api/jobs/{queued_id}")
+    assert response.status_code == 200
+    assert response.json() == {"job_id": queued_id, "status": "cancelling", "was": "queued"}
+    threads[1].join(10)
+    assert responses[queued_id].status_code == 409
+    assert responses[queued_id].headers["x-job-id"] == queued_id
+    assert len(lane.waiters) == 0
+    assert client.get(f"/api/jobs/{queued_id}").json()["status"] == "cancelled"
+
+    # The running job stops before encoding
+    assert client.get(f"/api/jobs/{running_id}").json()["status"] == "running"
+    response = client.delete(f"/api/jobs/{running_id}")
+    assert response.json()["was"] == "running"
+    release.set()
+    threads[0].join(10)
+    assert responses[running_id].status_code == 409
+    job = client.get(f"/api/jobs/{running_id}").json()
+    assert job["status"] == "cancelled" and job["started_at"] is not None
+    assert lane.running == 0
+
+    assert client.delete(f"/api/jobs/{running_id}").status_code == 409
+    assert client.delete(f"/api/jobs/{uuid.uuid4()}").status_code == 404
+
+
+def test_client_job_id_is_validated(client):
+    media_id = upload(client, 3)
+    response = client.post("/api/convert", data={"media_id": media_id, "style": "sepia", "job_id": "../x"})
+    assert response.status_code == 400
+    job_id = str(uuid.uuid4())
+    response = client.post("/api/convert", data={"media_id": media_id, "style": "sepia", "job_id": job_id})
+    assert response.status_code == 200 and response.headers["x-job-id"] == job_id
+    assert client.get(f"/api/jobs/{job_id}").json()["status"] == "ok"
+
+
+def test_delete_reaches_the_worker_running_the_job(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "JOB_CANCEL_POLL_SECONDS", 0.05)
+
+    def shared():
+        return SharedJobs(FileMediaStore(str(tmp_path / "jobs")), FileMediaStore(str(tmp_path / "cancels")))
+
+    owner, other = JobRegistry(shared=shared()), JobRegistry(shared=shared())
+    token = CancelToken()
+    job = owner.create("media", "sepia", "image", cancel_token=token)
+    assert other.lookup(job.job_id)["status"] == "queued"
+
+    job.start()
+    owner.update(job)
+    record = other.cancel(job.job_id, "delete")
+    assert record["cancelling"] and record["status"] == "running"
+    wait_for(lambda: token.cancelled)
+    assert token.reason == "delete"
+
+    job.finish("cancelled")
+    owner.update(job)
+    assert other.cancel(job.job_id, "delete") == {**job.to_dict(), "cancelling": False}
+    assert other.cancel(str(uuid.uuid4()), "delete") is None
+
+
+def test_failed_profiler_start_finishes_the_job(client, tmp_path, monkeypatch):
+    capture = ProfileCapture(str(tmp_path / "profiles"))
+    monkeypatch.setattr(app_module, "profile_capture", capture)
+    media_id = upload(client, 4)
+    in_flight = metrics.IN_FLIGHT.value()
+
+    def failing_start(self):
+        raise RuntimeError("profiler busy")
+
+    capture.arm("sepia", count=2, with_torch=False)
+    with monkeypatch.context() as patch:
+        patch.setattr(ProfileSession, "start", failing_start)
+        job_id = str(uuid.uuid4())
+        response = client.post("/api/convert", data={"media_id": media_id, "style": "sepia", "job_id": job_id})
+    assert response.status_code == 500
+    job = client.get(f"/api/jobs/{job_id}").json()
+    assert job["status"] == "error" and "profile" not in job["meta"]
+    assert metrics.IN_FLIGHT.value() == in_flight
+
+    # The next armed conversion is profiled as usual
+    job_id = str(uuid.uuid4())
+    response = client.post("/api/convert", data={"media_id": media_id, "style": "sepia", "job_id": job_id})
+    assert response.status_code == 200
+    assert [name.rsplit(".", 1)[1] for name in client.get(f"/api/jobs/{job_id}").json()["meta"]["profile"]] == \
+        ["prof", "txt"]
+    assert metrics.IN_FLIGHT.value() == in_flight
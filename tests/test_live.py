@@ -0,0 +1,68 @@
+import io
+import os
+import sys
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+from starlette.websockets import WebSocketDisconnect
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+import app as app_module  # noqa: E402
+from utils.admission import AdmissionController  # noqa: E402
+
+
+def jpeg_frame(seed=0):
+    pixels = (np.random.default_rng(seed).random((48, 64, 3)) * 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(app_module, "admission", AdmissionController(
+        lanes={"instant": (1, 4), "model": (1, 4), "video": (1, 4)}))
+    return TestClient(app_module.app)
+
+
+@pytest.mark.parametrize("first", [b"\xff\xd8 not a settings message", "{not json", "[1, 2]", '{"fps": 10}'])
+def test_bad_first_message_closes_with_policy_violation(client, first):
+    with client.websocket_connect("/api/live") as websocket:
+        if isinstance(first, bytes):
+            websocket.send_bytes(first)
+        else:
+            websocket.send_text(first)
+        assert websocket.receive_json()["type"] == "error"
+        with pytest.raises(WebSocketDisconnect) as closed:
+            websocket.receive_json()
+    assert closed.value.code == 1008
+
+
+def test_frames_are_admitted_to_the_style_lane(client):
+    lane = app_module.admission.lanes["instant"]
+    with client.websocket_connect("/api/live") as websocket:
+        websocket.send_json({"style": "sepia"})
+        assert websocket.receive_json()["type"] == "ready"
+        websocket.send_bytes(jpeg_frame())
+        styled = Image.open(io.BytesIO(websocket.receive_bytes()))
+        assert styled.size == (64, 48)
+        assert lane.running == 0 and app_module.admission.committed == 0
+
+
+def test_frames_over_the_memory_budget_are_dropped(client, monkeypatch):
+    monkeypatch.setattr(app_module, "admission", AdmissionController(budget_bytes=1024))
+    with client.websocket_connect("/api/live") as websocket:
+        websocket.send_json({"style": "sepia"})
+        assert websocket.receive_json()["type"] == "ready"
+        websocket.send_bytes(jpeg_frame())
+        error = websocket.receive_json()
+        assert error["type"] == "error" and "memory budget" in error["detail"]
+        assert "retry_after" in error
+
+        # The session goes on: settings still apply
+        websocket.send_json({"fps": 5})
+        stats = websocket.receive_json()
+        assert stats["type"] == "stats" and stats["dropped"] == 1 and stats["styled"] == 0
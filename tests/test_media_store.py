@@ -0,0 +1,217 @@
+import os
+import socket
+import socketserver
+import sys
+import threading
+import uuid
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from utils.media_store import (  # noqa: E402
+    FileMediaStore, LocalMediaStore, MediaStoreError, RedisMediaStore, RespClient, read_reply
+)
+
+
+class RespStandIn:
+    """Local TCP server answering the RESP commands the media store uses"""
+
+    def __init__(self, password=None):
+        self.data = {}
+        self.commands = []
+        self.password = password
+        self.lock = threading.Lock()
+        self.connections = set()
+        stand_in = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                stand_in.connections.add(self.connection)
+                authed = stand_in.password is None
+                while True:
+                    try:
+                        command = read_reply(self.rfile)
+                    except (ConnectionError, OSError):
+                        return
+                    name = command[0].decode().upper()
+                    args = command[1:]
+                    stand_in.commands.append(name)
+                    if name == "AUTH":
+                        authed = args[-1].decode() == stand_in.password
+                        self.wfile.write(b"+OK\r\n" if authed else b"-WRONGPASS invalid password\r\n")
+                    elif not authed:
+                        self.wfile.write(b"-NOAUTH Authentication required\r\n")
+                    else:
+                        with stand_in.lock:
+                            self.wfile.write(stand_in.run(name, args))
+
+        self.server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"redis://127.0.0.1:{self.server.server_address[1]}/0"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @staticmethod
+    def bulk(value):
+        return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def run(self, name, args):
+        if name == "SELECT":
+            return b"+OK\r\n"
+        if name == "HSET":
+            fields = self.data.setdefault(args[0], {})
+            for field, value in zip(args[1::2], args[2::2]):
+                fields[field] = value
+            return b":%d\r\n" % (len(args) // 2)
+        if name == "HMGET":
+            fields = self.data.get(args[0], {})
+            return b"*%d\r\n" % (len(args) - 1) + b"".join(self.bulk(fields.get(field)) for field in args[1:])
+        if name == "HSTRLEN":
+            return b":%d\r\n" % len(self.data.get(args[0], {}).get(args[1], b""))
+        if name == "DEL":
+            return b":%d\r\n" % sum(self.data.pop(key, None) is not None for key in args)
+        if name in ("SADD", "SREM"):
+            members = self.data.setdefault(args[0], set())
+            before = len(members)
+            members.update(args[1:]) if name == "SADD" else members.difference_update(args[1:])
+            return b":%d\r\n" % abs(len(members) - before)
+        if name == "SCARD":
+            return b":%d\r\n" % len(self.data.get(args[0], set()))
+        if name in ("INCRBY", "DECRBY"):
+            delta = int(args[1]) * (1 if name == "INCRBY" else -1)
+            value = int(self.data.get(args[0], b"0")) + delta
+            self.data[args[0]] = str(value).encode()
+            return b":%d\r\n" % value
+        if name == "GET":
+            return self.bulk(self.data.get(args[0]))
+        return b"-ERR unknown command '%s'\r\n" % name.encode()
+
+    def drop_connections(self):
+        """Simulate a server restart: existing client connections break"""
+        for connection in list(self.connections):
+            connection.shutdown(socket.SHUT_RDWR)
+        self.connections.clear()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stand_in():
+    server = RespStandIn()
+    yield server
+    server.close()
+
+
+def upload(size=1000, seed=1):
+    return {
+        "data": bytes([seed]) * size,
+        "filename": "clip.mp4",
+        "is_video": True,
+        "probe": {"width": 640, "height": 360, "frames": 90},
+        "sha256": "ab" * 32,
+    }
+
+
+@pytest.fixture(params=["local", "file", "redis"])
+def store(request, tmp_path):
+    if request.param == "local":
+        yield LocalMediaStore()
+    elif request.param == "file":
+        yield FileMediaStore(str(tmp_path / "media"))
+    else:
+        server = RespStandIn()
+        yield RedisMediaStore(server.url, prefix="test:")
+        server.close()
+
+
+def test_round_trip(store):
+    media_id = str(uuid.uuid4())
+    store.put(media_id, upload())
+
+    assert store.get(media_id) == upload()
+    assert len(store) == 1
+    assert store.total_bytes() == 1000
+
+    assert store.delete(media_id) is True
+    assert store.get(media_id) is None
+    assert store.delete(media_id) is False
+    assert len(store) == 0
+    assert store.total_bytes() == 0
+
+
+def test_unknown_media_is_none(store):
+    assert store.get(str(uuid.uuid4())) is None
+    assert store.get("../../etc/passwd") is None
+
+
+def test_file_store_is_shared_between_workers(tmp_path):
+    media_id = str(uuid.uuid4())
+    FileMediaStore(str(tmp_path / "media")).put(media_id, upload())
+
+    other_worker = FileMediaStore(str(tmp_path / "media"))
+    assert other_worker.get(media_id) == upload()
+    assert other_worker.delete(media_id) is True
+    assert not os.listdir(tmp_path / "media")
+
+
+def test_redis_store_is_shared_between_workers(stand_in):
+    media_id = str(uuid.uuid4())
+    RedisMediaStore(stand_in.url, prefix="test:").put(media_id, upload(size=300_000, seed=7))
+
+    other_worker = RedisMediaStore(stand_in.url, prefix="test:")
+    assert other_worker.get(media_id) == upload(size=300_000, seed=7)
+    assert len(other_worker) == 1
+
+
+def test_redis_put_is_one_round_trip(stand_in):
+    store = RedisMediaStore(stand_in.url, prefix="test:")
+    store.put(str(uuid.uuid4()), upload())
+    # Pipelined: every command of the put arrived before any reply was read
+    assert stand_in.commands == ["HSET", "SADD", "INCRBY"]
+
+
+def test_redis_reconnects_after_server_restart(stand_in):
+    store = RedisMediaStore(stand_in.url, prefix="test:")
+    media_id = str(uuid.uuid4())
+    store.put(media_id, upload())
+
+    stand_in.drop_connections()
+
+    assert store.get(media_id) == upload()
+
+
+def test_redis_auth_and_errors():
+    server = RespStandIn(password="s3cret")
+    try:
+        port = server.server.server_address[1]
+        store = RedisMediaStore(f"redis://:s3cret@127.0.0.1:{port}/0", prefix="test:")
+        media_id = str(uuid.uuid4())
+        store.put(media_id, upload())
+        assert store.get(media_id) == upload()
+        assert "AUTH" in server.commands
+
+        with pytest.raises(MediaStoreError):
+            RedisMediaStore(f"redis://:wrong@127.0.0.1:{port}/0", prefix="test:").get(media_id)
+    finally:
+        server.close()
+
+
+def test_redis_unreachable_raises():
+    client = RespClient("redis://127.0.0.1:1/0", timeout=1)
+    with pytest.raises(MediaStoreError):
+        RedisMediaStore(client=client).get(str(uuid.uuid4()))
+
+
+def test_result_written_by_another_worker_is_served(tmp_path):
+    from utils.results import ResultStore
+
+    writer = ResultStore(str(tmp_path / "results"))
+    reader = ResultStore(str(tmp_path / "results"))
+    result_id = uuid.uuid4().hex
+    writer.put(result_id, b"styled", "image/png", "styled.png")
+
+    result = reader.get(result_id)
+    assert result is not None and result.size == 6
+    assert reader.get("../" + result_id) is None
@@ -0,0 +1,241 @@
+import hashlib
+import io
+import os
+import sys
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from utils.model_provisioning import ModelProvisioner, write_manifest  # noqa: E402
+
+
+def make_checkpoint(seed, size=200_000):
+    """Zip-format bytes, like torch.save output"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+        archive.writestr("archive/data.pkl", os.urandom(size) if seed is None else bytes([seed]) * size)
+    return buffer.getvalue()
+
+
+class StandIn:
+    """Local HTTP server with Range support that can cut transfers short"""
+
+    def __init__(self, files):
+        self.files = files
+        self.requests = []
+        self.cut_after = {}  # name -> bytes sent before dropping the first transfer
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                name = self.path.lstrip("/")
+                stand_in.requests.append((name, self.headers.get("Range")))
+                data = stand_in.files.get(name)
+                if data is None:
+                    self.send_error(404)
+                    return
+
+                start = 0
+                status = 200
+                if self.headers.get("Range"):
+                    start = int(self.headers["Range"].split("=")[1].split("-")[0])
+                    if start >= len(data):
+                        self.send_response(416)
+                        self.send_header("Content-Range", f"bytes */{len(data)}")
+                        self.end_headers()
+                        return
+                    status = 206
+
+                body = data[start:]
+                self.send_response(status)
+                self.send_header("Content-Type", "application/octet-stream")
+                self.send_header("Content-Length", str(len(body)))
+                if status == 206:
+                    self.send_header("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")
+                self.end_headers()
+
+                cut = stand_in.cut_after.pop(name, None)
+                if cut is not None:
+                    self.wfile.write(body[:cut])
+                    self.wfile.flush()
+                    self.connection.shutdown(2)
+                    return
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def files():
+    return {f"model_{i}.pth": make_checkpoint(i) for i in range(4)}
+
+
+@pytest.fixture
+def stand_in(files):
+    server = StandIn(files)
+    yield server
+    server.close()
+
+
+def manifest_for(files, with_checksums=True):
+    return {
+        name: {
+            "gdrive_id": None,
+            "sha256": hashlib.sha256(data).hexdigest() if with_checksums else None,
+            "size": len(data) if with_checksums else None,
+        }
+        for name, data in files.items()
+    }
+
+
+def provisioner(tmp_path, manifest, **kwargs):
+    kwargs.setdefault("mirror_url", "")
+    kwargs.setdefault("source_dir", "")
+    return ModelProvisioner(models_dir=str(tmp_path / "pretrained"), manifest=manifest,
+                            workers=4, timeout=5, retries=3, **kwargs)
+
+
+def test_downloads_from_mirror_and_verifies(tmp_path, files, stand_in):
+    results = provisioner(tmp_path, manifest_for(files), mirror_url=stand_in.url).provision()
+
+    assert {result["status"] for result in results.values()} == {"downloaded"}
+    for name, data in files.items():
+        assert (tmp_path / "pretrained" / name).read_bytes() == data
+        assert not (tmp_path / "pretrained" / f"{name}.part").exists()
+
+
+def test_present_files_are_not_fetched_again(tmp_path, files, stand_in):
+    manifest = manifest_for(files)
+    provisioner(tmp_path, manifest, mirror_url=stand_in.url).provision()
+    stand_in.requests.clear()
+
+    results = provisioner(tmp_path, manifest, mirror_url=stand_in.url).provision()
+
+    assert {result["status"] for result in results.values()} == {"present"}
+    assert stand_in.requests == []
+
+
+def test_checksum_mismatch_is_rejected(tmp_path, files, stand_in):
+    manifest = manifest_for(files)
+    manifest["model_0.pth"]["sha256"] = "0" * 64
+
+    results = provisioner(tmp_path, manifest, mirror_url=stand_in.url).provision()
+
+    assert results["model_0.pth"]["status"] == "failed"
+    assert not (tmp_path / "pretrained" / "model_0.pth").exists()
+    assert not (tmp_path / "pretrained" / "model_0.pth.part").exists()
+
+
+def test_truncated_file_is_replaced(tmp_path, files, stand_in):
+    (tmp_path / "pretrained").mkdir()
+    (tmp_path / "pretrained" / "model_1.pth").write_bytes(files["model_1.pth"][:1000])
+
+    results = provisioner(tmp_path, manifest_for(files), mirror_url=stand_in.url).provision(["model_1.pth"])
+
+    assert results["model_1.pth"]["status"] == "downloaded"
+    assert (tmp_path / "pretrained" / "model_1.pth").read_bytes() == files["model_1.pth"]
+
+
+def test_truncated_file_without_checksum_is_replaced(tmp_path, files, stand_in):
+    (tmp_path / "pretrained").mkdir()
+    (tmp_path / "pretrained" / "model_1.pth").write_bytes(files["model_1.pth"][:1000])
+
+    manifest = manifest_for(files, with_checksums=False)
+    results = provisioner(tmp_path, manifest, mirror_url=stand_in.url).provision(["model_1.pth"])
+
+    assert results["model_1.pth"]["status"] == "downloaded"
+    assert (tmp_path / "pretrained" / "model_1.pth").read_bytes() == files["model_1.pth"]
+
+
+def test_interrupted_download_resumes(tmp_path, files, stand_in):
+    stand_in.files["model_2.pth"] = files["model_2.pth"] = make_checkpoint(None, size=600_000)
+    stand_in.cut_after["model_2.pth"] = 400_000
+
+    results = provisioner(tmp_path, manifest_for(files), mirror_url=stand_in.url).provision(["model_2.pth"])
+
+    assert results["model_2.pth"]["status"] == "downloaded"
+    assert (tmp_path / "pretrained" / "model_2.pth").read_bytes() == files["model_2.pth"]
+    ranges = [header for name, header in stand_in.requests if name == "model_2.pth"]
+    assert ranges[0] is None
+    resumed_at = int(ranges[1].split("=")[1].rstrip("-"))
+    assert 0 < resumed_at <= 400_000
+
+
+def test_partial_file_from_earlier_run_resumes(tmp_path, files, stand_in):
+    (tmp_path / "pretrained").mkdir()
+    (tmp_path / "pretrained" / "model_3.pth.part").write_bytes(files["model_3.pth"][:120_000])
+
+    results = provisioner(tmp_path, manifest_for(files), mirror_url=stand_in.url).provision(["model_3.pth"])
+
+    assert results["model_3.pth"]["status"] == "downloaded"
+    assert (tmp_path / "pretrained" / "model_3.pth").read_bytes() == files["model_3.pth"]
+    assert stand_in.requests == [("model_3.pth", "bytes=120000-")]
+
+
+def test_local_directory_source_is_tried_first(tmp_path, files, stand_in):
+    source = tmp_path / "volume"
+    source.mkdir()
+    (source / "model_0.pth").write_bytes(files["model_0.pth"])
+
+    results = provisioner(tmp_path, manifest_for(files), mirror_url=stand_in.url,
+                          source_dir=str(source)).provision()
+
+    assert results["model_0.pth"]["source"] == "local"
+    assert results["model_1.pth"]["source"] == "mirror"
+    assert "model_0.pth" not in [name for name, _ in stand_in.requests]
+
+
+def test_html_error_page_is_not_saved(tmp_path, files):
+    class HtmlHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            body = b"<html>quota exceeded</html>"
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), HtmlHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        results = provisioner(tmp_path, manifest_for(files), mirror_url=url).provision(["model_0.pth"])
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert results["model_0.pth"]["status"] == "failed"
+    assert not (tmp_path / "pretrained" / "model_0.pth").exists()
+
+
+def test_write_manifest_records_checksums(tmp_path, files):
+    import json
+
+    models_dir = tmp_path / "pretrained"
+    models_dir.mkdir()
+    (models_dir / "model_0.pth").write_bytes(files["model_0.pth"])
+    manifest_path = tmp_path / "manifest.json"
+    manifest_path.write_text(json.dumps({"models": manifest_for(files, with_checksums=False)}))
+
+    manifest = write_manifest(str(models_dir), str(manifest_path))
+
+    assert manifest["model_0.pth"]["sha256"] == hashlib.sha256(files["model_0.pth"]).hexdigest()
+    assert manifest["model_1.pth"]["sha256"] is None
+    assert json.loads(manifest_path.read_text())["models"] == manifest
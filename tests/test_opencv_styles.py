@@ -0,0 +1,56 @@
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from models import opencv_styles  # noqa: E402
+from models.opencv_styles import OpenCVStyler, SEPIA_FILTER  # noqa: E402
+from benchmarks.synthetic import make_frame  # noqa: E402
+
+BATCH_STYLES = sorted(name[len("_batch_"):] for name in vars(OpenCVStyler) if name.startswith("_batch_"))
+
+
+def frame_stack(count=5, width=37, height=29):
+    return np.stack([make_frame(width, height, seed=i) for i in range(count)])
+
+
+def per_frame(style, frames):
+    styled = [np.asarray(getattr(OpenCVStyler, style)(frame)) for frame in frames]
+    return np.stack([frame if frame.ndim == 3 else cv2.cvtColor(frame, cv2.COLOR_GRAY2RGB) for frame in styled])
+
+
+def test_every_batch_style_has_a_per_frame_method():
+    assert BATCH_STYLES == ["emboss", "pop_art", "rough_paper", "sepia", "vintage"]
+    for style in BATCH_STYLES:
+        assert callable(getattr(OpenCVStyler, style))
+
+
+@pytest.mark.parametrize("style", BATCH_STYLES)
+def test_apply_batch_matches_per_frame_style(monkeypatch, style):
+    frames = frame_stack()
+    # The same noise for every frame, however many frames one call draws
+    pattern = np.arange(frames.shape[1] * frames.shape[2], dtype=np.uint8).reshape(frames.shape[1:3]) % 50
+    monkeypatch.setattr(opencv_styles.np.random, "randint",
+                        lambda low, high, shape, dtype: np.broadcast_to(pattern, shape).astype(dtype))
+
+    styled = OpenCVStyler.apply_batch(style, frames.copy())
+    assert styled.shape == frames.shape and styled.dtype == np.uint8
+    assert np.array_equal(styled, per_frame(style, frames))
+
+
+def test_apply_batch_runs_other_styles_frame_by_frame(monkeypatch):
+    monkeypatch.setattr(opencv_styles.Config, "OPENCV_WORKERS", 2)
+    frames = frame_stack(3)
+    assert np.array_equal(OpenCVStyler.apply_batch("pencil_sketch", frames), per_frame("pencil_sketch", frames))
+
+
+def test_sepia_rounds_within_one_of_the_float_path():
+    frame = make_frame(64, 48, seed=3)
+    # The float path (before uint8 cv2.transform) truncated instead of rounding
+    truncated = np.clip(cv2.transform(frame.astype(np.float32), SEPIA_FILTER), 0, 255).astype(np.uint8)
+    styled = np.asarray(OpenCVStyler.sepia(frame)).astype(np.int16)
+    assert 0 <= (styled - truncated).min() and (styled - truncated).max() <= 1
@@ -0,0 +1,71 @@
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+import app as app_module  # noqa: E402
+from config import Config  # noqa: E402
+from utils.style_loader import StyleLoader, LOADING, PENDING, READY, UNAVAILABLE, WARMING  # noqa: E402
+
+
+@pytest.fixture
+def loader(monkeypatch):
+    loader = StyleLoader(lite=False)
+    monkeypatch.setattr(app_module, "style_loader", loader)
+    return loader
+
+
+@pytest.fixture
+def client():
+    return TestClient(app_module.app)
+
+
+def test_opencv_is_ready_while_models_load(client, loader):
+    loader.family_status.update(neural=LOADING, anime=PENDING)
+    response = client.get("/ready")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["ready"] and body["loading"] and not body["lite"]
+    assert body["families"] == {"opencv": READY, "neural": LOADING, "anime": PENDING}
+    assert body["styles"] == Config.OPENCV_STYLES
+    assert "shards" not in body
+
+
+def test_family_is_not_ready_until_warmed_up(client, loader):
+    loader.family_status.update(neural=LOADING, anime=PENDING)
+    response = client.get("/ready", params={"family": "neural"})
+    assert response.status_code == 503
+    assert not response.json()["ready"]
+
+    # A warming family already serves its loaded styles
+    loader.family_status["neural"] = WARMING
+    loader.neural_models["candy"] = object()
+    response = client.get("/ready", params={"family": "neural"})
+    assert response.status_code == 503
+    assert response.json()["styles"] == Config.OPENCV_STYLES + ["candy"]
+
+    loader.family_status.update(neural=READY, anime=UNAVAILABLE)
+    response = client.get("/ready", params={"family": "neural"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["ready"] and not body["loading"]
+    assert client.get("/ready", params={"family": "anime"}).status_code == 503
+
+
+def test_unknown_family_is_rejected(client, loader):
+    response = client.get("/ready", params={"family": "impressionist"})
+    assert response.status_code == 400
+    assert "impressionist" in response.json()["detail"]
+
+
+def test_lite_mode_serves_opencv_only(client, monkeypatch):
+    monkeypatch.setattr(Config, "LITE_MODE", True)
+    monkeypatch.setattr(app_module, "style_loader", StyleLoader())
+    body = client.get("/ready").json()
+    assert body["ready"] and body["lite"] and not body["loading"]
+    assert body["families"] == {"opencv": "ready", "neural": "disabled", "anime": "disabled"}
+    assert body["styles"] == Config.OPENCV_STYLES
+    assert client.get("/ready", params={"family": "neural"}).status_code == 503
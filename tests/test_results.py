@@ -0,0 +1,130 @@
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+import app as app_module  # noqa: E402
+from utils.results import ResultStore, parse_range, etag_matches  # noqa: E402
+
+BODY = bytes(range(256)) * 4
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 1023)),
+    ("bytes=-100", (924, 1023)),
+    ("bytes=-5000", (0, 1023)),
+    ("bytes=1000-5000", (1000, 1023)),
+    ("bytes=10-5", None),
+    ("bytes=0-1,5-9", None),
+    ("items=0-9", None),
+    ("bytes=-", None),
+    ("bytes=a-9", None),
+    (None, None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1024) == expected
+
+
+@pytest.mark.parametrize("header, size", [
+    ("bytes=1024-", 1024),
+    ("bytes=2000-3000", 1024),
+    ("bytes=-0", 1024),
+    ("bytes=-10", 0),
+])
+def test_parse_range_unsatisfiable(header, size):
+    with pytest.raises(ValueError):
+        parse_range(header, size)
+
+
+@pytest.mark.parametrize("header, expected", [
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"xyz", W/"abc"', True),
+    ('"xyz" , "abc"', True),
+    ('*', True),
+    ('"xyz"', False),
+    ('"ab"', False),
+    ('', False),
+    (None, False),
+])
+def test_etag_matches(header, expected):
+    assert etag_matches(header, '"abc"') is expected
+
+
+@pytest.fixture
+def stored(tmp_path, monkeypatch):
+    store = ResultStore(directory=str(tmp_path))
+    monkeypatch.setattr(app_module, "result_store", store)
+    result = store.put("0123456789abcdef0123456789abcdef", BODY, "image/png", "styled_sepia.png")
+    return TestClient(app_module.app), result
+
+
+def test_result_full_body_and_etag(stored):
+    client, result = stored
+    response = client.get(f"/api/results/{result.result_id}")
+    assert response.status_code == 200
+    assert response.content == BODY
+    assert response.headers["etag"] == result.etag
+    assert response.headers["accept-ranges"] == "bytes"
+
+
+@pytest.mark.parametrize("if_none_match", ["{etag}", "W/{etag}", '"other", {etag}', "*"])
+def test_result_not_modified(stored, if_none_match):
+    client, result = stored
+    response = client.get(f"/api/results/{result.result_id}",
+                          headers={"If-None-Match": if_none_match.format(etag=result.etag)})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == result.etag
+
+
+def test_result_changed_etag_sends_body(stored):
+    client, result = stored
+    response = client.get(f"/api/results/{result.result_id}", headers={"If-None-Match": '"other"'})
+    assert response.status_code == 200
+    assert response.content == BODY
+
+
+@pytest.mark.parametrize("header, start, end", [
+    ("bytes=0-99", 0, 99),
+    ("bytes=1000-", 1000, 1023),
+    ("bytes=-24", 1000, 1023),
+    ("bytes=512-99999", 512, 1023),
+])
+def test_result_range(stored, header, start, end):
+    client, result = stored
+    response = client.get(f"/api/results/{result.result_id}", headers={"Range": header})
+    assert response.status_code == 206
+    assert response.content == BODY[start:end + 1]
+    assert response.headers["content-range"] == f"bytes {start}-{end}/{len(BODY)}"
+    assert response.headers["content-length"] == str(end - start + 1)
+
+
+@pytest.mark.parametrize("header", ["bytes=1024-", "bytes=-0"])
+def test_result_range_not_satisfiable(stored, header):
+    client, result = stored
+    response = client.get(f"/api/results/{result.result_id}", headers={"Range": header})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(BODY)}"
+
+
+def test_result_if_range(stored):
+    client, result = stored
+    url = f"/api/results/{result.result_id}"
+    response = client.get(url, headers={"Range": "bytes=0-9", "If-Range": result.etag})
+    assert response.status_code == 206
+    assert response.content == BODY[:10]
+    # A stale or weak validator gets the whole result
+    for if_range in ('"other"', f"W/{result.etag}"):
+        response = client.get(url, headers={"Range": "bytes=0-9", "If-Range": if_range})
+        assert response.status_code == 200
+        assert response.content == BODY
+
+
+def test_result_unknown(stored):
+    client, _ = stored
+    assert client.get("/api/results/ffffffffffffffffffffffffffffffff").status_code == 404
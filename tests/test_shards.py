@@ -0,0 +1,117 @@
+import os
+import signal
+import sys
+import time
+
+import numpy as np
+import pytest
+from PIL import Image
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from config import Config  # noqa: E402
+from utils.shards import ShardRouter, parse_shards  # noqa: E402
+from utils.style_loader import DISABLED, PENDING, READY, StyleLoader, StylerUnavailable  # noqa: E402
+
+
+def test_parse_shards_expands_families():
+    assert parse_shards("neural;anime") == [Config.NEURAL_STYLES, Config.CARTOON_STYLES]
+    assert parse_shards(" candy, mosaic ; shinkai ;") == [["candy", "mosaic"], ["shinkai"]]
+    assert parse_shards("") == []
+
+
+@pytest.mark.parametrize("spec", ["sepia", "candy;neural", "nope"])
+def test_parse_shards_rejects(spec):
+    with pytest.raises(ValueError):
+        parse_shards(spec)
+
+
+def test_style_subset_disables_other_family():
+    loader = StyleLoader(lite=False, styles=["candy"])
+    assert loader.family_status == {"opencv": READY, "neural": PENDING, "anime": DISABLED}
+
+
+def test_router_before_start():
+    router = ShardRouter("candy")
+    assert router.family_status["neural"] == PENDING
+    assert router.family_status["anime"] == DISABLED
+    assert router.style_status("sepia") == READY
+    # OpenCV styles never leave the process
+    assert router.apply_style(np.zeros((8, 8, 3), dtype=np.uint8), "sepia").size == (8, 8)
+    with pytest.raises(StylerUnavailable):
+        router.apply_style(np.zeros((8, 8, 3), dtype=np.uint8), "candy")
+
+
+def candy_reference():
+    pytest.importorskip("torch")
+    if not os.path.exists(Config.NEURAL_MODEL_PATHS["candy"]):
+        pytest.skip("candy model not downloaded")
+
+    img = Image.fromarray((np.random.default_rng(0).random((96, 128, 3)) * 255).astype(np.uint8))
+    local = StyleLoader(lite=False, styles=["candy"])
+    local.load_neural_models()
+    return img, np.asarray(local.apply_style(img.copy(), "candy"))
+
+
+def test_shard_matches_in_process_model(tmp_path):
+    img, expected = candy_reference()
+    router = ShardRouter("candy", directory=str(tmp_path))
+    try:
+        router.load_models()
+        assert router.style_status("candy") == READY
+        styled = router.apply_style(img.copy(), "candy")
+        assert np.array_equal(np.asarray(styled), expected)
+
+        # A killed shard is reported as unavailable, then replaced by its owner
+        os.kill(router.shards[0].pid, signal.SIGKILL)
+        with pytest.raises(StylerUnavailable):
+            router.apply_style(img.copy(), "candy")
+        deadline = time.monotonic() + 120
+        while router.style_status("candy") != READY and time.monotonic() < deadline:
+            time.sleep(0.2)
+        assert np.array_equal(np.asarray(router.apply_style(img.copy(), "candy")), expected)
+    finally:
+        router.close()
+
+
+def test_routers_share_the_hosts_shards(tmp_path):
+    img, expected = candy_reference()
+    # Two API workers on one host: the first starts the shards, the second attaches
+    first = ShardRouter("candy", directory=str(tmp_path))
+    second = ShardRouter("candy", directory=str(tmp_path))
+    try:
+        first.load_models()
+        second.load_models()
+        assert first.host is not None and second.host is None
+        assert len(first.host.processes) == 1
+        assert second.shards[0].pid == first.shards[0].pid == first.host.processes[0].pid
+        assert second.style_status("candy") == READY
+        for router in (first, second, first):
+            assert np.array_equal(np.asarray(router.apply_style(img.copy(), "candy")), expected)
+    finally:
+        second.close()
+        first.close()
+
+
+def test_router_takes_over_when_the_owner_stops(tmp_path):
+    img, expected = candy_reference()
+    first = ShardRouter("candy", directory=str(tmp_path))
+    second = ShardRouter("candy", directory=str(tmp_path))
+    try:
+        first.load_models()
+        second.load_models()
+        old_pid = second.shards[0].pid
+        first.close()
+
+        # The shards stopped with their owner; the next request fails and the
+        # reconnect starts them again in the remaining worker
+        with pytest.raises(StylerUnavailable):
+            second.apply_style(img.copy(), "candy")
+        deadline = time.monotonic() + 120
+        while second.style_status("candy") != READY and time.monotonic() < deadline:
+            time.sleep(0.2)
+        assert second.host is not None and second.shards[0].pid != old_pid
+        assert np.array_equal(np.asarray(second.apply_style(img.copy(), "candy")), expected)
+    finally:
+        second.close()
+        first.close()
@@ -0,0 +1,44 @@
+import os
+import sys
+
+import numpy as np
+from PIL import Image
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from utils import style_loader as style_loader_module  # noqa: E402
+from utils.style_loader import StyleLoader  # noqa: E402
+from utils.video_processor import VideoProcessor  # noqa: E402
+from benchmarks.synthetic import make_frame  # noqa: E402
+
+
+def decoded_frames(count=40):
+    return [Image.fromarray(make_frame(32, 24, seed=i)) for i in range(count)]
+
+
+def test_failed_batch_falls_back_from_the_first_unstyled_frame(monkeypatch):
+    style_loader = StyleLoader(lite=True)
+    expected = style_loader.style_frames(decoded_frames(), "sepia")
+
+    apply_batch = style_loader.opencv_styler.apply_batch
+    batches = []
+
+    def fail_second_batch(style, stack):
+        batches.append(len(stack))
+        if len(batches) == 2:
+            raise RuntimeError("batch failed")
+        return apply_batch(style, stack)
+
+    reported = []
+    monkeypatch.setattr(style_loader.opencv_styler, "apply_batch", fail_second_batch)
+    monkeypatch.setattr(style_loader_module, "report_frame", reported.append)
+    frames = decoded_frames()
+    styled = style_loader.style_frames(frames, "sepia")
+
+    # The first batch is kept, the rest is styled frame by frame; each frame is reported once
+    assert batches == [16, 16]
+    assert len(styled) == len(reported) == 40
+    for output, reference in zip(styled, expected):
+        assert np.array_equal(np.asarray(output), np.asarray(reference))
+    assert all(frame is None for frame in frames)
+    assert VideoProcessor.create_video(styled, 10, 'mp4')
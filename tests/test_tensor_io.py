@@ -0,0 +1,54 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+import torch.nn.functional as F  # noqa: E402
+from models.tensor_io import BufferPool, TensorIO, pad_in_place  # noqa: E402
+
+
+@pytest.mark.parametrize("height,width,full_height,full_width", [
+    (5, 7, 8, 8), (5, 7, 5, 12), (3, 3, 8, 8), (6, 4, 8, 8), (2, 9, 8, 12), (8, 8, 8, 8),
+])
+def test_pad_in_place_matches_f_pad(height, width, full_height, full_width):
+    region = torch.rand(1, 3, height, width)
+    mode = 'reflect' if full_height - height < height and full_width - width < width else 'replicate'
+    expected = F.pad(region, (0, full_width - width, 0, full_height - height), mode=mode)
+
+    tensor = torch.zeros(1, 3, full_height, full_width)
+    tensor[..., :height, :width] = region
+    pad_in_place(tensor, height, width)
+    assert torch.equal(tensor, expected)
+
+
+def test_round_trip_reuses_buffers():
+    pixels = np.random.default_rng(0).integers(0, 256, (30, 50, 3), dtype=np.uint8)
+    tensor_io = TensorIO(pool=BufferPool())
+
+    for _ in range(3):
+        # A channel-reversed view goes in without a copy
+        tensor, size = tensor_io.to_tensor(pixels[:, :, ::-1], buckets=[32, 64])
+        assert tuple(tensor.shape) == (1, 3, 32, 64) and size == (30, 50)
+        assert torch.equal(tensor[0, :, :30, :50], torch.from_numpy(pixels[:, :, ::-1].transpose(2, 0, 1).copy()).float())
+        output = tensor.clone()
+        tensor_io.release(tensor)
+        image = tensor_io.to_image(output, size)
+        assert np.array_equal(np.asarray(image), pixels[:, :, ::-1])
+
+    # One float input buffer and one uint8 output buffer, allocated on the first call only
+    assert tensor_io.pool.allocations == 2
+
+
+def test_scaling_and_channel_swap():
+    pixels = np.array([[[0, 128, 255]]], dtype=np.uint8)
+    tensor_io = TensorIO(scale=2 / 255, offset=-1.0, out_scale=127.5, out_offset=127.5, swap_output=True)
+
+    tensor, size = tensor_io.to_tensor(pixels, buckets=[])
+    assert torch.allclose(tensor.flatten(), torch.tensor([-1.0, 128 * 2 / 255 - 1, 1.0]), atol=1e-6)
+    image = tensor_io.to_image(tensor.clone(), size)
+    assert np.asarray(image).tolist() == [[[255, 128, 0]]]
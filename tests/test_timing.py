@@ -0,0 +1,145 @@
+import asyncio
+import io
+import os
+import re
+import sys
+import threading
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+import app as app_module  # noqa: E402
+from config import Config  # noqa: E402
+from utils import timing  # noqa: E402
+from utils.results import ResultStore  # noqa: E402
+from utils.timing import StageTimer, current_timer, stage  # noqa: E402
+from benchmarks.synthetic import make_frame  # noqa: E402
+
+SERVER_TIMING = re.compile(r"^([a-z_]+;dur=\d+\.\d)(, [a-z_]+;dur=\d+\.\d)*$")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def perf_counter(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(timing, "time", clock)
+    return clock
+
+
+def test_stages_accumulate_in_canonical_order(clock):
+    timer = StageTimer()
+    token = timer.activate()
+    try:
+        for seconds in (0.25, 0.5):
+            with stage("upsample"):
+                clock.now += 0.125
+            with stage("encode"):
+                clock.now += seconds
+        with pytest.raises(RuntimeError):
+            with stage("decode"):
+                clock.now += 0.0015
+                raise RuntimeError("bad frame")
+    finally:
+        StageTimer.deactivate(token)
+
+    # Canonical stages first, then the others as they were first seen
+    assert timer.as_dict() == {
+        "decode": {"ms": 1.5, "count": 1},
+        "encode": {"ms": 750.0, "count": 2},
+        "upsample": {"ms": 250.0, "count": 2},
+    }
+    assert timer.total_ms() == pytest.approx(1001.5)
+    assert current_timer() is None
+
+
+def test_stage_is_a_no_op_without_a_timer():
+    assert current_timer() is None
+    with stage("decode") as block:
+        pass
+    assert block is stage("encode")
+
+
+def test_server_timing_header(clock):
+    timer = StageTimer()
+    timer.add("encode", 0.01234)
+    timer.add("decode", 0.002)
+    clock.now += 0.5
+    assert timer.server_timing() == "decode;dur=2.0, encode;dur=12.3, total;dur=500.0"
+    assert StageTimer().server_timing() == "total;dur=0.0"
+
+
+def test_timers_of_concurrent_threads_are_isolated():
+    barrier = threading.Barrier(4)
+    timers = {}
+
+    def convert(name):
+        timer = StageTimer()
+        token = timer.activate()
+        try:
+            barrier.wait(5)
+            with stage(name):
+                barrier.wait(5)
+            timers[name] = timer
+        finally:
+            StageTimer.deactivate(token)
+
+    threads = [threading.Thread(target=convert, args=(f"stage{i}",)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    for name, timer in timers.items():
+        assert list(timer.as_dict()) == [name]
+    assert len(timers) == 4
+
+
+def test_timers_of_concurrent_tasks_are_isolated():
+    async def convert(name, entered, others_entered):
+        timer = StageTimer()
+        token = timer.activate()
+        try:
+            with stage(name):
+                entered.set()
+                await others_entered.wait()
+            return timer
+        finally:
+            StageTimer.deactivate(token)
+
+    async def main():
+        first, second = asyncio.Event(), asyncio.Event()
+        return await asyncio.gather(convert("a", first, second), convert("b", second, first))
+
+    timers = asyncio.run(main())
+    assert [list(timer.as_dict()) for timer in timers] == [["a"], ["b"]]
+    assert current_timer() is None
+
+
+def test_convert_reports_server_timing(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "STAGE_TIMING", True)
+    monkeypatch.setattr(Config, "CANCEL_ON_DISCONNECT", False)
+    monkeypatch.setattr(app_module, "result_store", ResultStore(directory=str(tmp_path)))
+    client = TestClient(app_module.app)
+    buffer = io.BytesIO()
+    Image.fromarray(make_frame(48, 32, seed=1)).save(buffer, 'PNG')
+    response = client.post("/api/upload", files={"file": ("photo.png", buffer.getvalue(), "image/png")})
+    media_id = response.json()["media_id"]
+
+    job_id = str(uuid.uuid4())
+    response = client.post("/api/convert", data={"media_id": media_id, "style": "sepia", "job_id": job_id})
+    header = response.headers["server-timing"]
+    assert SERVER_TIMING.match(header)
+    names = [part.split(";")[0] for part in header.split(", ")]
+    assert names[0] == "decode" and "encode" in names and names[-1] == "total"
+    # The job record keeps the same stages
+    assert list(client.get(f"/api/jobs/{job_id}").json()["timings"]) == names[:-1]
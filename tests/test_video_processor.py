@@ -0,0 +1,158 @@
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from config import Config  # noqa: E402
+from utils.video_processor import VideoProcessor, GIF_TRANSPARENT_INDEX, SEEK_MIN_GAP  # noqa: E402
+from benchmarks.synthetic import make_frame  # noqa: E402
+
+
+def moving_square_frames(count=8, width=64, height=48):
+    """A static textured background with a square moving across it"""
+    background = make_frame(width, height, seed=1)
+    frames = []
+    for i in range(count):
+        frame = background.copy()
+        frame[10:26, 4 + 6 * i:20 + 6 * i] = (255, 32, 32)
+        frames.append(frame)
+    return frames
+
+
+def psnr(a, b):
+    mse = np.mean((np.asarray(a, dtype=np.float64) - np.asarray(b, dtype=np.float64)) ** 2)
+    return float('inf') if mse == 0 else 10 * np.log10(255 ** 2 / mse)
+
+
+@pytest.mark.parametrize("palette, delta", [("global", True), ("global", False), ("per_frame", False)])
+def test_encode_gif_round_trip(palette, delta):
+    frames = moving_square_frames()
+    durations = [40, 80, 120, 40, 60, 100, 40, 200]
+    gif = VideoProcessor.encode_gif(frames, durations, loop=0, palette=palette, delta=delta)
+
+    decoded, fps, timing = VideoProcessor.extract_gif_frames(gif)
+    palette_image, _ = VideoProcessor._global_palette(frames)
+    assert len(decoded) == len(frames)
+    assert timing["durations"] == durations
+    assert timing["loop"] == 0
+    assert fps == pytest.approx(1000.0 * len(frames) / sum(durations))
+    for i, (frame, original) in enumerate(zip(decoded, frames)):
+        assert np.asarray(frame).shape == original.shape
+        # 255 colors for a noisy texture: about 26dB
+        assert psnr(frame, original) > 25
+        if palette == "global":
+            # Every pixel decodes to its nearest color in the shared palette
+            quantized = Image.fromarray(original).quantize(palette=palette_image, dither=Image.Dither.NONE)
+            assert np.array_equal(np.asarray(frame), np.asarray(quantized.convert('RGB')))
+        # The moving square is where it was drawn on every frame
+        square = np.asarray(frame, dtype=np.int16)[10:26, 4 + 6 * i:20 + 6 * i]
+        assert np.abs(square - (255, 32, 32)).max() <= 16
+
+
+def test_encode_gif_delta_keeps_unchanged_pixels():
+    frames = moving_square_frames()
+    decoded, _, _ = VideoProcessor.extract_gif_frames(VideoProcessor.encode_gif(frames, [100] * 8, delta=True))
+    reference, _, _ = VideoProcessor.extract_gif_frames(VideoProcessor.encode_gif(frames, [100] * 8, delta=False))
+    # Transparent pixels show the previous frame, which held the same palette color
+    for frame, expected in zip(decoded, reference):
+        assert np.array_equal(np.asarray(frame), np.asarray(expected))
+
+
+def test_encode_gif_merges_unchanged_frames():
+    frames = moving_square_frames(3)
+    frames = [frames[0], frames[1], frames[1].copy(), frames[1].copy(), frames[2]]
+    gif = VideoProcessor.encode_gif(frames, [100, 50, 60, 70, 100], loop=2)
+
+    decoded, _, timing = VideoProcessor.extract_gif_frames(gif)
+    assert len(decoded) == 3
+    assert timing["durations"] == [100, 180, 100]
+    assert timing["loop"] == 2
+    for frame, original in zip(decoded, [frames[0], frames[1], frames[4]]):
+        assert psnr(frame, original) > 25
+
+
+def test_global_palette_reserves_a_unique_transparent_color():
+    palette_image, palette_bytes = VideoProcessor._global_palette(moving_square_frames())
+    colors = [tuple(palette_bytes[i:i + 3]) for i in range(0, len(palette_bytes), 3)]
+    assert len(colors) == GIF_TRANSPARENT_INDEX + 1
+    assert colors[GIF_TRANSPARENT_INDEX] not in colors[:GIF_TRANSPARENT_INDEX]
+
+
+def test_create_video_gif_defaults_durations_from_fps():
+    frames = [Image.fromarray(frame) for frame in moving_square_frames(4)]
+    _, _, timing = VideoProcessor.extract_gif_frames(VideoProcessor.create_video(frames, 20, 'gif'))
+    assert timing["durations"] == [50] * 4
+
+
+@pytest.fixture(scope="module")
+def clip_100(tmp_path_factory):
+    """A 100-frame 25fps mp4 and its frames decoded in order with cap.read()"""
+    path = str(tmp_path_factory.mktemp("clip") / "clip.mp4")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), 25, (96, 64))
+    for i in range(100):
+        frame = make_frame(96, 64, seed=2, t=i / 25)
+        frame[:8, :] = 0
+        frame[:8, i % 96] = 255
+        writer.write(frame)
+    writer.release()
+
+    cap = cv2.VideoCapture(path)
+    sequential = []
+    while True:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        sequential.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    cap.release()
+    with open(path, 'rb') as f:
+        return f.read(), sequential
+
+
+def test_sample_plan():
+    assert VideoProcessor.sample_plan(50, 25, 100, min_fps=8) == (list(range(50)), 25)
+    assert VideoProcessor.sample_plan(0, 25, 4, min_fps=8) == ([0, 1, 2, 3], 25)
+    # Evenly over the whole clip
+    indices, fps = VideoProcessor.sample_plan(300, 30, 100, min_fps=8)
+    assert indices == list(range(0, 300, 3)) and fps == 10
+    indices, fps = VideoProcessor.sample_plan(250, 25, 100, min_fps=0)
+    assert indices == [int(i * 2.5) for i in range(100)] and fps == 10
+    # Not below min_fps: the first 100 / 8 seconds at 8fps
+    indices, fps = VideoProcessor.sample_plan(3000, 24, 100, min_fps=8)
+    assert indices == list(range(0, 300, 3)) and fps == 8
+
+
+@pytest.mark.parametrize("max_frames", [100, 50, 34, 10, 7])
+def test_extract_frames_matches_sequential_decode(monkeypatch, clip_100, max_frames):
+    monkeypatch.setattr(Config, "VIDEO_MIN_FPS", 0)
+    data, sequential = clip_100
+    assert len(sequential) == 100
+    indices, expected_fps = VideoProcessor.sample_plan(100, 25, max_frames, min_fps=0)
+
+    stats = {}
+    frames, fps = VideoProcessor.extract_frames(data, max_frames=max_frames, stats=stats)
+    assert fps == pytest.approx(expected_fps)
+    assert len(frames) == len(indices) == stats["retrieved"]
+    for frame, index in zip(frames, indices):
+        assert np.array_equal(np.asarray(frame), sequential[index])
+    assert stats["grabbed"] + stats["seeked"] == indices[-1] + 1 - len(indices)
+
+
+def test_extract_frames_seeks_over_long_gaps(monkeypatch, clip_100):
+    monkeypatch.setattr(Config, "VIDEO_MIN_FPS", 0)
+    data, sequential = clip_100
+    stats = {}
+    # Every 10th frame: gaps of 9 frames reach SEEK_MIN_GAP, so the first is seeked
+    frames, _ = VideoProcessor.extract_frames(data, max_frames=10, stats=stats)
+    assert stats["seeks"] >= 1 and stats["seeked"] >= SEEK_MIN_GAP
+    for frame, index in zip(frames, range(0, 100, 10)):
+        assert np.array_equal(np.asarray(frame), sequential[index])
+
+    # Short gaps are always grabbed through
+    stats = {}
+    VideoProcessor.extract_frames(data, max_frames=50, stats=stats)
+    assert stats["seeks"] == 0 and stats["grabbed"] == 49